@@ -1,24 +1,47 @@
 # campussathi_prod.py
 import os
 import json
-import sqlite3
+import asyncio
+import shutil
+import threading
+from types import MappingProxyType
 from datetime import datetime
-import gradio as gr
+import time
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 
-# LangChain / embeddings / vectorstore / LLM
-from langchain_huggingface import HuggingFaceEmbeddings
+# LangChain / LLM. Embedding models, Chroma, PDF loading and Gradio are imported
+# where they are first used so the API can answer /health while they load.
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
-from langchain_community.vectorstores import Chroma
-from langchain_ollama import OllamaLLM
+import llm_clients
 from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
-from langchain.retrievers import EnsembleRetriever, ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import EmbeddingsFilter
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from intent_classifier import IntentClassifier, normalize_query
+from response_cache import SemanticResponseCache
+from campus_db import ConnectionPool
+from log_writer import BatchedLogWriter
+from ttl_cache import TTLCache, MISSING
+from admission import AdmissionGate, Overloaded
+from singleflight import SingleFlight
+import tracing
+from tracing import span
+import index_sync
+import ingestion
+from knowledge import KnowledgeSnapshot, SnapshotManager, JobRunner
+from retrieval import QueryEmbeddingCache, SharedEmbeddingRetriever, HybridRetriever
+from bm25_index import BM25Index
+from doc_store import DocStore
+import mmap_index
+from timetable_index import TimetableIndex, TimetableQuery, parse_timetable_query
+import timetable_extract
+import context_builder
+from embedding_service import EmbeddingBatcher
+from embedding_backends import EMBED_BACKEND, load_embeddings, loaded_backends
 
 # ---------- Config ----------
 DATA_DIR = "data"
@@ -31,219 +54,468 @@ DB_PATH = "campus.db"
 CHROMA_ENG_DIR = "./chroma_eng"
 CHROMA_INDIC_DIR = "./chroma_indic"
 CHROMA_TIMETABLE_DIR = "./chroma_timetable"
+INDEX_MANIFEST_PATH = "./index_manifest.json"
+BM25_DIR = "./bm25_index"
+# Chunk text + metadata, stored once and shared by every collection (which keep only vectors).
+DOC_STORE_PATH = "./doc_store.sqlite3"
+# Refreshed indexes are built side by side in versioned dirs; CURRENT names the live one.
+CHROMA_VERSIONS_DIR = "./chroma_versions"
+# Read-only vector export for reader processes (legacy layout; versions keep it in <version>/mmap).
+MMAP_DIR = "./mmap_index"
+
+# "single": one process owns and serves the indexes (default).
+# "writer": owns Chroma and all KB mutations, and exports vectors for readers after each one.
+# "reader": serves from the exported, memory-mapped vectors (serve_multi.py workers); no KB writes.
+CAMPUS_ROLE = os.getenv("CAMPUS_ROLE", "single")
+# How often a reader checks CURRENT / the latest vector export / the structured timetable for changes.
+KB_POLL_SECONDS = float(os.getenv("KB_POLL_SECONDS", "2"))
+# The writer waits this long before deleting a replaced version, so readers can move off it first.
+KB_RETIRE_GRACE_SECONDS = float(os.getenv("KB_RETIRE_GRACE_SECONDS", "60"))
+
+# Indexed sources: (stable key, file, collections it feeds). Admin-approved answers
+# come from the approved_answers table and feed the two retrieval collections.
+INDEX_SOURCES = [
+    ("faq.pdf", FAQ_PDF_PATH, ["English_Collection", "Indic_Collection"]),
+    ("timetable.pdf", TIMETABLE_PDF_PATH, ["English_Collection", "Indic_Collection", "Timetable_Collection"]),
+]
+APPROVED_SOURCE = "admin_approved"
+APPROVED_TARGETS = ["English_Collection", "Indic_Collection"]
+# Collections mirrored into a BM25 index (persisted beside the Chroma dirs).
+LEXICAL_COLLECTIONS = ["English_Collection", "Timetable_Collection"]
 
 HF_TOKEN = os.getenv("HF_TOKEN") or None
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+
+STUDENT_CACHE_TTL = float(os.getenv("STUDENT_CACHE_TTL", "600"))
+# UIDs per json_each lookup, and the most (uid, message) pairs one batch request may carry.
+STUDENT_BATCH_QUERY_SIZE = 5000
+STUDENT_BATCH_MAX_ITEMS = int(os.getenv("STUDENT_BATCH_MAX_ITEMS", "20000"))
+ANNOUNCEMENT_CACHE_TTL = float(os.getenv("ANNOUNCEMENT_CACHE_TTL", "30"))
+
+# Per-stage timeouts (seconds) for the async request path.
+INTENT_LLM_TIMEOUT = float(os.getenv("INTENT_LLM_TIMEOUT", "10"))
+DB_STAGE_TIMEOUT = float(os.getenv("DB_STAGE_TIMEOUT", "5"))
+RAG_TIMEOUT = float(os.getenv("RAG_TIMEOUT", "90"))
 
 # ---------- Utilities: DB ----------
+db = ConnectionPool(DB_PATH)
+# Chat-path log rows are written in the background so a busy disk never delays an answer.
+log_writer = BatchedLogWriter(db)
+
+# Hot rows read on every chat turn. Writes in this process go through the cache;
+# the TTLs bound staleness from writes made elsewhere.
+STUDENT_COLUMNS = "uid,name,section,nationality,department,hod_contact,admin_contact,fees_status"
+student_cache = TTLCache(ttl=STUDENT_CACHE_TTL)
+announcement_cache = TTLCache(ttl=ANNOUNCEMENT_CACHE_TTL)
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS students (
-            uid TEXT PRIMARY KEY, name TEXT, section TEXT, nationality TEXT,
-            department TEXT, hod_contact TEXT, admin_contact TEXT, fees_status TEXT
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS query_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            uid TEXT, query TEXT, bot_response TEXT, fallback_needed INTEGER, timestamp TEXT
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS unanswered_queries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            uid TEXT, query TEXT, timestamp TEXT, status TEXT DEFAULT 'pending'
-        )
-    """)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS announcements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            message TEXT, is_active INTEGER, created_at TEXT
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with db.transaction() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS students (
+                uid TEXT PRIMARY KEY, name TEXT, section TEXT, nationality TEXT,
+                department TEXT, hod_contact TEXT, admin_contact TEXT, fees_status TEXT
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS query_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT, query TEXT, bot_response TEXT, fallback_needed INTEGER, timestamp TEXT
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS unanswered_queries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT, query TEXT, timestamp TEXT, status TEXT DEFAULT 'pending'
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS announcements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                message TEXT, is_active INTEGER, created_at TEXT
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS approved_answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                unanswered_id INTEGER, question TEXT, answer TEXT, created_at TEXT
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_unanswered_status ON unanswered_queries(status)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_announcements_active ON announcements(is_active, id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_query_logs_uid_ts ON query_logs(uid, timestamp)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_students_section ON students(section)")
+        # One approved answer per unanswered query (older DBs may hold repeats: keep the latest).
+        cur.execute("""
+            DELETE FROM approved_answers WHERE unanswered_id IS NOT NULL AND id NOT IN (
+                SELECT MAX(id) FROM approved_answers WHERE unanswered_id IS NOT NULL GROUP BY unanswered_id)
+        """)
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_approved_unanswered ON approved_answers(unanswered_id)")
 
 def add_sample_students():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
     students = [
         ("24MCI10030", "Yash Singh", "24MAM-4", "Domestic", "Computer Applications", "hod_ca@college.ac.in", "admin@college.ac.in", "Paid"),
         ("24MCI10050", "Priya Sharma", "24MAM-2", "International", "Computer Science", "hod_cs@college.ac.in", "admin@college.ac.in", "Pending"),
         ("24MCI10020", "Riya Sharma", "24MAM-1", "Domestic", "Hotel management", "hod_cs@college.ac.in", "admin@college.ac.in", "Pending"),
     ]
-    cur.executemany("""
+    db.executemany("""
         INSERT OR REPLACE INTO students (uid,name,section,nationality,department,hod_contact,admin_contact,fees_status)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
     """, students)
-    conn.commit()
-    conn.close()
+    student_cache.set_many((s[0], s) for s in students)
+
+def get_student(uid):
+    row = student_cache.get(uid)
+    if row is MISSING:
+        row = db.fetchone(f"SELECT {STUDENT_COLUMNS} FROM students WHERE uid=?", (uid,))
+        if row:
+            student_cache.set(uid, row)
+    return row
+
+def get_students(uids, cached=True):
+    """``{uid: row}`` for many UIDs with one query for the cache misses; unknown UIDs are left out.
+
+    With ``cached=False`` every row is read from the DB (and refreshes the cache).
+    """
+    found, missing = {}, []
+    for uid in dict.fromkeys(uids):
+        row = student_cache.get(uid) if cached else MISSING
+        if row is MISSING:
+            missing.append(uid)
+        else:
+            found[uid] = row
+    for start in range(0, len(missing), STUDENT_BATCH_QUERY_SIZE):
+        rows = db.fetchall(f"SELECT {STUDENT_COLUMNS} FROM students WHERE uid IN (SELECT value FROM json_each(?))",
+                           (json.dumps(missing[start:start + STUDENT_BATCH_QUERY_SIZE]),))
+        student_cache.set_many((r[0], r) for r in rows)
+        found.update((r[0], r) for r in rows)
+    return found
+
+def get_section_students(section, fees_status=None):
+    sql = f"SELECT {STUDENT_COLUMNS} FROM students WHERE section=?"
+    params = (section,)
+    if fees_status:
+        sql += " AND fees_status=? COLLATE NOCASE"
+        params += (fees_status,)
+    rows = db.fetchall(sql + " ORDER BY uid", params)
+    student_cache.set_many((r[0], r) for r in rows)
+    return rows
+
+def warm_student_cache(batch_size=5000):
+    loaded = 0
+    with db.connection() as conn:
+        cur = conn.execute(f"SELECT {STUDENT_COLUMNS} FROM students")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            student_cache.set_many((r[0], r) for r in rows)
+            loaded += len(rows)
+    print(f"Student cache warmed with {loaded} rows")
+    return loaded
 
 def log_query(uid, query, response, fallback=False):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
+    log_writer.submit("""
         INSERT INTO query_logs (uid, query, bot_response, fallback_needed, timestamp)
         VALUES (?, ?, ?, ?, ?)
     """, (uid or "Guest", query, response, int(bool(fallback)), datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
 
 def log_unanswered(uid, query):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
+    log_writer.submit("""
         INSERT INTO unanswered_queries (uid, query, timestamp)
         VALUES (?, ?, ?)
-    """, (uid or "Guest", query, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+    """, (uid or "Guest", query, datetime.now().isoformat()), durable=True)
 
 def get_pending_unanswered():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, uid, query, timestamp FROM unanswered_queries WHERE status='pending' ORDER BY id ASC")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    log_writer.flush()
+    return db.fetchall("SELECT id, uid, query, timestamp FROM unanswered_queries WHERE status='pending' ORDER BY id ASC")
 
 def get_pending_count():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM unanswered_queries WHERE status='pending'")
-    count = cur.fetchone()[0]
-    conn.close()
-    return count
+    log_writer.flush()
+    return db.fetchone("SELECT COUNT(*) FROM unanswered_queries WHERE status='pending'")[0]
 
 def mark_unanswered_resolved(qid):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("UPDATE unanswered_queries SET status='resolved' WHERE id=?", (qid,))
-    conn.commit()
-    conn.close()
+    db.execute("UPDATE unanswered_queries SET status='resolved' WHERE id=?", (qid,))
 
 def set_active_announcement(message):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("UPDATE announcements SET is_active = 0")
-    cur.execute("INSERT INTO announcements (message, is_active, created_at) VALUES (?, 1, ?)", (message, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+    with db.transaction() as conn:
+        conn.execute("UPDATE announcements SET is_active = 0 WHERE is_active = 1")
+        conn.execute("INSERT INTO announcements (message, is_active, created_at) VALUES (?, 1, ?)", (message, datetime.now().isoformat()))
+    announcement_cache.set("active", message)
     return f"Announcement posted: '{message}'"
 
 def get_active_announcement():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT message FROM announcements WHERE is_active = 1 ORDER BY id DESC LIMIT 1")
-    row = cur.fetchone()
-    conn.close()
-    return row[0] if row else None
+    message = announcement_cache.get("active")
+    if message is MISSING:
+        row = db.fetchone("SELECT message FROM announcements WHERE is_active = 1 ORDER BY id DESC LIMIT 1")
+        message = row[0] if row else None
+        announcement_cache.set("active", message)
+    return message
 
 def clear_active_announcement():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("UPDATE announcements SET is_active = 0")
-    conn.commit()
-    conn.close()
+    db.execute("UPDATE announcements SET is_active = 0 WHERE is_active = 1")
+    announcement_cache.set("active", None)
     return "All announcements cleared."
 
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-
-def build_or_load_chroma_collection(docs, embedding, persist_directory, collection_name):
-    if (not docs or len(docs) == 0):
-        if os.path.exists(persist_directory) and os.listdir(persist_directory):
-            try:
-                vs = Chroma(persist_directory=persist_directory, embedding_function=embedding, collection_name=collection_name)
-                return vs
-            except Exception as e:
-                print("Could not load existing Chroma collection:", persist_directory, e)
-                return None
-        else:
-            return None
+# Part of the ingestion cache key: changing these re-parses and re-chunks every PDF.
+SPLITTER_SETTINGS = {"chunk_size": 500, "chunk_overlap": 50}
+text_splitter = RecursiveCharacterTextSplitter(**SPLITTER_SETTINGS)
+# Serializes manifest/collection writes between refreshes and approvals.
+index_lock = threading.Lock()
+
+def open_chroma_collection(embedding, persist_directory, collection_name):
+    from langchain_community.vectorstores import Chroma
+    os.makedirs(persist_directory, exist_ok=True)
     try:
-        if os.path.exists(persist_directory) and os.listdir(persist_directory):
-            vs = Chroma(persist_directory=persist_directory, embedding_function=embedding, collection_name=collection_name)
-            try:
-                count = vs._collection.count()
-            except Exception:
-                count = 0
-            if count == 0:
-                vs.add_documents(docs)
-            return vs
-        else:
-            vs = Chroma.from_documents(documents=docs, embedding=embedding, persist_directory=persist_directory, collection_name=collection_name)
-            return vs
+        return Chroma(persist_directory=persist_directory, embedding_function=embedding, collection_name=collection_name)
     except Exception as e:
-        print("Error building/loading Chroma:", e)
+        print("Error building/loading Chroma:", persist_directory, e)
         return None
 
-def load_vectorstores(force_refresh=False):
-    faq_chunks = []
-    timetable_chunks = []
-    if os.path.exists(FAQ_PDF_PATH):
-        try:
-            faq_docs = PyPDFLoader(FAQ_PDF_PATH).load()
-            faq_chunks = text_splitter.split_documents(faq_docs)
-        except Exception as e:
-            print("Error loading faq.pdf:", e)
-    if os.path.exists(TIMETABLE_PDF_PATH):
-        try:
-            tt_docs = PyPDFLoader(TIMETABLE_PDF_PATH).load()
-            timetable_chunks = text_splitter.split_documents(tt_docs)
-        except Exception as e:
-            print("Error loading timetable.pdf:", e)
+def collection_count(vs):
+    try:
+        return vs._collection.count() if vs else 0
+    except Exception:
+        return 0
+
+def load_pdf_chunks(path, sha=None):
+    """Re-iterable chunks of a PDF, parsed in parallel once per file version (see ingestion.py)."""
+    try:
+        return ingestion.cached_chunks(path, SPLITTER_SETTINGS, sha=sha)
+    except Exception as e:
+        print(f"Error loading {os.path.basename(path)}:", e)
+        return None
+
+def approved_answer_chunks(rows=None):
+    """Chunks of every approved answer, or of the given ``(question, answer)`` rows."""
+    if rows is None:
+        rows = db.fetchall("SELECT question, answer FROM approved_answers ORDER BY id ASC")
+    docs = [Document(page_content=f"Q: {q}\nA: {a}", metadata={"source": APPROVED_SOURCE}) for q, a in rows]
+    return text_splitter.split_documents(docs)
+
+def sync_indexes(collections, manifest_path, force_refresh=False, lexical=None, store=None):
+    """Diff each source against the manifest and upsert/delete only what changed.
+
+    ``lexical`` maps collection name -> BM25Index kept in step with the collection;
+    ``store`` is the DocStore holding the chunk text for all of them. A collection
+    whose embedding model or backend changed is embedded again in full first.
+    """
+    lexical = lexical or {}
+    manifest = index_sync.load_manifest(manifest_path)
+    report = {name: {"added": 0, "removed": 0, "skipped": 0} for name in collections}
+    for name, vs in collections.items():
+        if vs is not None:
+            dropped = index_sync.drop_untracked(vs, name, manifest, keep_sources=(APPROVED_SOURCE,))
+            report[name]["removed"] += dropped
+            fingerprint = embedding_fingerprint(COLLECTION_EMBEDDINGS[name])
+            if index_sync.embedding_changed(manifest, name, fingerprint):
+                print(f"{name}: embeddings changed to {fingerprint}, re-embedding every chunk ...")
+                print(f"{name}: re-embedded {index_sync.reembed_collection(vs, store=store)} chunks")
+
+    def merge(name, r):
+        for k, v in r.items():
+            report[name][k] += v
+
+    for source_key, path, targets in INDEX_SOURCES:
+        targets = [t for t in targets if collections.get(t) is not None]
+        sha = index_sync.file_sha256(path) if os.path.exists(path) else None
+        if sha and not force_refresh and all(index_sync.is_current(manifest, t, source_key, sha) for t in targets):
+            for t in targets:
+                merge(t, index_sync.skip_source(manifest, t, source_key))
+            continue
+        chunks = load_pdf_chunks(path, sha) if sha else []
+        if chunks is None:
+            # Unreadable file: keep what is indexed rather than deleting it.
+            continue
+        for t in targets:
+            merge(t, index_sync.sync_source(collections[t], t, manifest, source_key, chunks, sha=sha,
+                                            verify=force_refresh, lexical=lexical.get(t), store=store))
+
+    for t, r in sync_approved(collections, manifest, verify=force_refresh, lexical=lexical, store=store).items():
+        merge(t, r)
+    indexed = set()
+    if store is not None:
+        for vs in collections.values():
+            if vs is not None:
+                ids = index_sync.collection_ids(vs)
+                index_sync.backfill_store(vs, store, ids)
+                indexed |= ids
+    for name, lex in lexical.items():
+        if collections.get(name) is not None:
+            index_sync.reconcile_lexical(collections[name], name, manifest, lex, store=store)
+    if store is not None:
+        index_sync.prune_store(manifest, store, keep_ids=indexed)
+    index_sync.save_manifest(manifest_path, manifest)
+    save_lexical(lexical)
+    return report
+
+def sync_approved(collections, manifest, verify=False, lexical=None, store=None):
+    approved = approved_answer_chunks()
+    lexical = lexical or {}
+    return {
+        t: index_sync.sync_source(collections[t], t, manifest, APPROVED_SOURCE, approved, verify=verify,
+                                  lexical=lexical.get(t), store=store)
+        for t in APPROVED_TARGETS if collections.get(t) is not None
+    }
+
+def load_lexical(paths, store=None):
+    return {name: BM25Index.load(os.path.join(paths["bm25"], f"{name}.json"), store=store)
+            for name in LEXICAL_COLLECTIONS}
+
+def save_lexical(lexical):
+    for lex in (lexical or {}).values():
+        lex.save()
+
+def stores_collections(stores):
+    return {"English_Collection": stores.get("eng_vs"), "Indic_Collection": stores.get("indic_vs"),
+            "Timetable_Collection": stores.get("timetable_vs")}
+
+EMBEDDING_MODELS = {"eng": "Qwen/Qwen3-Embedding-0.6B", "indic": "l3cube-pune/indic-sentence-bert-nli"}
+COLLECTION_EMBEDDINGS = {"English_Collection": "eng", "Indic_Collection": "indic", "Timetable_Collection": "eng"}
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+def get_embeddings():
+    """The two embedding models, loaded once (in parallel) and shared by every snapshot.
 
-    eng_embeddings = HuggingFaceEmbeddings(model_name="Qwen/Qwen3-Embedding-0.6B") 
-    indic_embeddings = HuggingFaceEmbeddings(model_name="l3cube-pune/indic-sentence-bert-nli")
+    Each is wrapped in an EmbeddingBatcher so concurrent queries share forward passes.
+    """
+    with _embeddings_lock:
+        if not _embeddings:
+            with ThreadPoolExecutor(max_workers=len(EMBEDDING_MODELS)) as pool:
+                futures = {
+                    key: pool.submit(timed_component, f"{key}_embeddings", load_embeddings, name, EMBED_BACKEND)
+                    for key, name in EMBEDDING_MODELS.items()
+                }
+                loaded = {key: f.result() for key, f in futures.items()}
+            _embeddings.update({key: EmbeddingBatcher(emb, name=key) for key, emb in loaded.items()})
+        return _embeddings["eng"], _embeddings["indic"]
 
-    docs_all = faq_chunks + timetable_chunks
+def embedding_fingerprint(key):
+    """Model and backend in use for ``key``, as recorded in the index manifest."""
+    name = EMBEDDING_MODELS[key]
+    return f"{name}@{loaded_backends.get(name, EMBED_BACKEND)}"
 
-    if force_refresh:
-        for d in [CHROMA_ENG_DIR, CHROMA_INDIC_DIR, CHROMA_TIMETABLE_DIR]:
-            if os.path.exists(d):
-                try:
-                    import shutil
-                    shutil.rmtree(d)
-                except Exception as e:
-                    print(f"Error removing directory {d}: {e}")
-    
-    os.makedirs(CHROMA_ENG_DIR, exist_ok=True)
-    os.makedirs(CHROMA_INDIC_DIR, exist_ok=True)
-    os.makedirs(CHROMA_TIMETABLE_DIR, exist_ok=True)
+def embedding_stats():
+    return {key: {**emb.stats(), "backend": loaded_backends.get(EMBEDDING_MODELS[key])}
+            for key, emb in _embeddings.items()}
 
+def index_paths(root=None):
+    """Chroma dirs, doc store + manifest of one index version; root=None is the original top-level layout."""
+    if root is None:
+        return {"root": None, "eng": CHROMA_ENG_DIR, "indic": CHROMA_INDIC_DIR,
+                "timetable": CHROMA_TIMETABLE_DIR, "bm25": BM25_DIR, "docs": DOC_STORE_PATH,
+                "mmap": MMAP_DIR, "manifest": INDEX_MANIFEST_PATH}
+    return {"root": root, "eng": os.path.join(root, "chroma_eng"), "indic": os.path.join(root, "chroma_indic"),
+            "timetable": os.path.join(root, "chroma_timetable"), "bm25": os.path.join(root, "bm25"),
+            "docs": os.path.join(root, "doc_store.sqlite3"), "mmap": os.path.join(root, "mmap"),
+            "manifest": os.path.join(root, "index_manifest.json")}
 
-    eng_vs = build_or_load_chroma_collection(docs_all, eng_embeddings, CHROMA_ENG_DIR, "English_Collection")
-    indic_vs = build_or_load_chroma_collection(docs_all, indic_embeddings, CHROMA_INDIC_DIR, "Indic_Collection")
-    timetable_vs = build_or_load_chroma_collection(timetable_chunks, eng_embeddings, CHROMA_TIMETABLE_DIR, "Timetable_Collection")
+def current_index_version():
+    pointer = os.path.join(CHROMA_VERSIONS_DIR, "CURRENT")
+    if os.path.exists(pointer):
+        with open(pointer, "r", encoding="utf-8") as f:
+            version = f.read().strip()
+        root = os.path.join(CHROMA_VERSIONS_DIR, version)
+        if version and os.path.isdir(root):
+            return version, index_paths(root)
+    return "legacy", index_paths(None)
 
-    retrievers = []
-    if eng_vs:
-        retrievers.append(eng_vs.as_retriever(search_kwargs={"k": 5}))
-    if indic_vs:
-        retrievers.append(indic_vs.as_retriever(search_kwargs={"k": 5}))
+def publish_index_version(version):
+    os.makedirs(CHROMA_VERSIONS_DIR, exist_ok=True)
+    pointer = os.path.join(CHROMA_VERSIONS_DIR, "CURRENT")
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
 
-    if not retrievers:
-        return {"retriever": None, "eng_vs": eng_vs, "indic_vs": indic_vs, "timetable_vs": timetable_vs}
+# Query vectors are computed once per model and shared by retrieval, the
+# similarity filter and the response cache.
+query_embeddings = QueryEmbeddingCache()
 
-    ensemble_retriever = EnsembleRetriever(retrievers=retrievers, weights=[0.5, 0.5])
-    
-    embeddings_filter = EmbeddingsFilter(
-        embeddings=eng_embeddings, 
-        similarity_threshold=0.7
-    )
+def load_vectorstores(paths, force_refresh=False):
+    eng_embeddings, indic_embeddings = get_embeddings()
 
-    compression_retriever = ContextualCompressionRetriever(
-        base_compressor=embeddings_filter,
-        base_retriever=ensemble_retriever
-    )
+    eng_vs = open_chroma_collection(eng_embeddings, paths["eng"], "English_Collection")
+    indic_vs = open_chroma_collection(indic_embeddings, paths["indic"], "Indic_Collection")
+    timetable_vs = open_chroma_collection(eng_embeddings, paths["timetable"], "Timetable_Collection")
+    collections = {"English_Collection": eng_vs, "Indic_Collection": indic_vs, "Timetable_Collection": timetable_vs}
 
-    return {"retriever": compression_retriever, "eng_vs": eng_vs, "indic_vs": indic_vs, "timetable_vs": timetable_vs}
+    store = DocStore(paths["docs"])
+    lexical = load_lexical(paths, store)
+    with index_lock:
+        report = sync_indexes(collections, paths["manifest"], force_refresh=force_refresh, lexical=lexical,
+                              store=store)
+    print("Index sync:", index_sync.format_report(report))
 
-stores = load_vectorstores(force_refresh=False)
+    stores = {
+        "retriever": None, "eng_vs": eng_vs, "indic_vs": indic_vs,
+        "timetable_vs": timetable_vs if collection_count(timetable_vs) else None,
+        "eng_embeddings": eng_embeddings, "indic_embeddings": indic_embeddings, "index_report": report,
+        "lexical": lexical, "docs": store,
+    }
+    return attach_retriever(stores)
+
+def load_mmap_stores(paths):
+    """Reader-side stores: the writer's latest vector export, mapped read-only, plus the shared doc store."""
+    eng_embeddings, indic_embeddings = get_embeddings()
+    generation = mmap_index.latest_generation(paths["mmap"])
+    gen_dir = os.path.join(paths["mmap"], generation) if generation else paths["mmap"]
+    eng_vs = mmap_index.MmapVectorStore.load(gen_dir, "English_Collection", eng_embeddings)
+    indic_vs = mmap_index.MmapVectorStore.load(gen_dir, "Indic_Collection", indic_embeddings)
+    timetable_vs = mmap_index.MmapVectorStore.load(gen_dir, "Timetable_Collection", eng_embeddings)
+    store = DocStore(paths["docs"], read_only=True)
+    stores = {
+        "retriever": None, "eng_vs": eng_vs, "indic_vs": indic_vs,
+        "timetable_vs": timetable_vs if collection_count(timetable_vs) else None,
+        "eng_embeddings": eng_embeddings, "indic_embeddings": indic_embeddings, "index_report": None,
+        "lexical": load_lexical(paths, store), "docs": store, "mmap_generation": generation,
+    }
+    print(f"Mapped vector export {generation or '(none yet)'}: {collection_count(eng_vs)} chunks")
+    return attach_retriever(stores)
+
+def export_for_readers(stores, paths):
+    """Writer only: publish the collections' current vectors as a new mapped generation."""
+    if CAMPUS_ROLE != "writer":
+        return None
+    generation = mmap_index.export_collections(stores_collections(stores), paths["mmap"])
+    print(f"Exported vectors for readers: {paths['mmap']}/{generation}")
+    return generation
+
+def attach_retriever(stores):
+    eng_vs, indic_vs = stores["eng_vs"], stores["indic_vs"]
+    eng_embeddings, indic_embeddings = stores["eng_embeddings"], stores["indic_embeddings"]
+    store, lexical = stores["docs"], stores["lexical"]
+    # The English collection always comes first: the 0.7 filter scores every hit
+    # against its stored Qwen vectors (Indic hits share chunk IDs with it).
+    sources = []
+    if collection_count(eng_vs):
+        sources.append(("eng", eng_vs, eng_embeddings))
+    if collection_count(indic_vs):
+        sources.append(("indic", indic_vs, indic_embeddings))
+
+    dense = None
+    if sources:
+        if sources[0][0] != "eng":
+            sources.insert(0, ("eng", eng_vs, eng_embeddings))
+            weights = [0.0, 1.0]
+        else:
+            weights = [1 / len(sources)] * len(sources)
+        dense = SharedEmbeddingRetriever(
+            sources=[(key, vs, emb, w) for (key, vs, emb), w in zip(sources, weights)],
+            query_cache=query_embeddings,
+            store=store,
+            k=5,
+            similarity_threshold=0.7,
+        )
+
+    eng_lexical = lexical["English_Collection"]
+    if dense is None and not len(eng_lexical):
+        return stores
+    stores["retriever"] = HybridRetriever(lexical=eng_lexical, dense=dense, k=5)
+    return stores
 
 # ---------- LLM & RAG ----------
-llm = OllamaLLM(model="llama3.1:8b")
+llm = llm_clients.get_llm("llama3.1:8b", OLLAMA_BASE_URL)
 system_prompt = """
 You are "CampusSathi", a multilingual college assistant for Rajasthan students.
 Answer ONLY from the retrieved context (FAQ or Timetable) or from Student DB when requested.
@@ -253,16 +525,217 @@ Rules:
 - Reply in the language of the user's query (English, Hindi, Marwari, Marathi).
 - Keep answers short, clear and student-friendly.
 - Mention "Source: Student DB" or "Source: College FAQ/Timetable" appropriately.
-Context:
-{context}
 """
-prompt = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", "{input}")])
-document_chain = create_stuff_documents_chain(llm, prompt)
-rag_chain = create_retrieval_chain(stores["retriever"], document_chain) if stores.get("retriever") else None
+# The instructions never change, so they form a prefix Ollama can reuse from its
+# prompt cache; the per-request context goes after them, with the question.
+prompt = ChatPromptTemplate.from_messages([
+    ("system", system_prompt),
+    ("human", "Context:\n{context}\n\nQuestion: {input}"),
+])
+RAG_PROMPT_PREFIX = prompt.format(context="", input="").rpartition("Context:")[0]
+SYSTEM_PROMPT_TOKENS = context_builder.estimate_tokens(system_prompt)
+
+def assemble_context(inputs):
+    """Retrieved chunks -> compact context within CONTEXT_TOKEN_BUDGET; logs the prompt size."""
+    with span("context"):
+        context, report = context_builder.assemble(inputs["docs"])
+    prompt_tokens = SYSTEM_PROMPT_TOKENS + report["context_tokens"] + context_builder.estimate_tokens(inputs["input"])
+    tracing.prompt_tokens.observe(prompt_tokens, source="estimate")
+    tracing.annotate(context_chunks=report["used"], prompt_tokens_est=prompt_tokens)
+    print(f"Context: {report['used']}/{report['retrieved']} chunks ({report['deduplicated']} duplicate, "
+          f"{report['merged']} merged, {report['dropped_for_budget']} over budget), ~{prompt_tokens} prompt tokens")
+    return context
+
+def build_rag_chain(retriever):
+    """retrieve -> assemble -> llama3.1; streams dicts whose "answer" key carries the tokens."""
+    document_chain = prompt | llm | StrOutputParser()
+    return (RunnablePassthrough.assign(docs=itemgetter("input") | retriever)
+            .assign(context=RunnableLambda(assemble_context))
+            .assign(answer=document_chain))
+
+# ---------- Knowledge snapshots ----------
+def build_snapshot(version, paths, force_refresh=False):
+    if CAMPUS_ROLE == "reader":
+        stores = load_mmap_stores(paths)
+    else:
+        stores = load_vectorstores(paths, force_refresh=force_refresh)
+        export_for_readers(stores, paths)
+    rag_chain = build_rag_chain(stores["retriever"]) if stores.get("retriever") else None
+    return KnowledgeSnapshot(version=version, paths=MappingProxyType(paths), stores=MappingProxyType(stores), rag_chain=rag_chain)
+
+def smoke_test_snapshot(snap):
+    sources_present = any(os.path.exists(path) for _, path, _ in INDEX_SOURCES)
+    eng_vs = snap.stores.get("eng_vs")
+    if sources_present and not collection_count(eng_vs):
+        raise RuntimeError("new index is empty although source files exist")
+    if collection_count(eng_vs):
+        vec = snap.stores["eng_embeddings"].embed_query("college")
+        ids = eng_vs._collection.query(query_embeddings=[vec], n_results=1, include=[])["ids"][0]
+        if not snap.stores["docs"].get_many(ids):
+            raise RuntimeError("smoke query returned no documents")
+    if snap.stores.get("retriever"):
+        snap.stores["retriever"].invoke("college timings")
+
+def retire_snapshot(snap):
+    if snap.stores.get("docs") is not None:
+        snap.stores["docs"].close()
+    # Readers never delete: the version dirs belong to the writer.
+    if CAMPUS_ROLE == "reader":
+        return
+    # Only versions we created are deleted; the original top-level dirs are left alone.
+    root = snap.paths.get("root")
+    if root and os.path.abspath(root).startswith(os.path.abspath(CHROMA_VERSIONS_DIR) + os.sep):
+        if CAMPUS_ROLE == "writer":
+            # Give reader processes a few polls to remap before the files go.
+            timer = threading.Timer(KB_RETIRE_GRACE_SECONDS, remove_version_dir, args=(snap.version, root))
+            timer.daemon = True
+            timer.start()
+        else:
+            remove_version_dir(snap.version, root)
+
+def remove_version_dir(version, root):
+    print(f"Removing drained knowledge snapshot {version}")
+    shutil.rmtree(root, ignore_errors=True)
+
+snapshots = SnapshotManager(on_retire=retire_snapshot)
+refresh_jobs = JobRunner()
+# Held while a timetable upload checks for a running extraction and replaces the PDF.
+timetable_upload_lock = threading.Lock()
+
+def current_snapshot():
+    return snapshots.current()
+
+# ---------- Startup / readiness ----------
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "600"))
+
+readiness = {"state": "cold", "components": {}, "error": None, "models": []}
+_readiness_lock = threading.Lock()
+_warmup_future = None
+
+def timed_component(name, fn, *args, **kwargs):
+    with _readiness_lock:
+        readiness["components"][name] = {"status": "loading", "seconds": None}
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception:
+        with _readiness_lock:
+            readiness["components"][name] = {"status": "failed", "seconds": round(time.perf_counter() - start, 3)}
+        raise
+    with _readiness_lock:
+        readiness["components"][name] = {"status": "ready", "seconds": round(time.perf_counter() - start, 3)}
+    return result
+
+_writer_lock_file = None
+def acquire_writer_lock():
+    """Writer only: hold an exclusive lock on the index dir so a second writer cannot start."""
+    global _writer_lock_file
+    import fcntl
+    os.makedirs(CHROMA_VERSIONS_DIR, exist_ok=True)
+    f = open(os.path.join(CHROMA_VERSIONS_DIR, "writer.lock"), "a+")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        raise RuntimeError("another CAMPUS_ROLE=writer process is already running") from None
+    _writer_lock_file = f
+
+def writer_only(action):
+    """Refusal message when a reader process is asked to change the knowledge base, else None."""
+    if CAMPUS_ROLE == "reader":
+        return f"{action} must be done in the writer process (CAMPUS_ROLE=writer, the admin app)."
+    return None
+
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def watch_knowledge(interval=KB_POLL_SECONDS):
+    """Reader loop: remap when the writer publishes a new version or vector export,
+    and reload the structured timetable when its file changes."""
+    snap = current_snapshot()
+    attempted = (snap.version, snap.stores.get("mmap_generation")) if snap else None
+    timetable_mtime = _file_mtime(TIMETABLE_JSON_PATH)
+    while True:
+        time.sleep(interval)
+        try:
+            mtime = _file_mtime(TIMETABLE_JSON_PATH)
+            if mtime != timetable_mtime:
+                timetable_mtime = mtime
+                reload_timetable_structured()
+            version, paths = current_index_version()
+            marker = (version, mmap_index.latest_generation(paths["mmap"]))
+            if marker == attempted:
+                continue
+            attempted = marker
+            print(f"Knowledge changed ({marker[0]}/{marker[1]}); remapping")
+            snapshots.swap(build_snapshot(version, paths))
+            response_cache.invalidate()
+        except Exception as e:
+            print(f"Knowledge watcher: {e}")
+
+def _warm_up():
+    start = time.perf_counter()
+    # Loading the Ollama models is independent of (and not required for) the rest.
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-preload").submit(preload_models)
+    try:
+        if CAMPUS_ROLE == "writer":
+            timed_component("writer_lock", acquire_writer_lock)
+        timed_component("db", init_db)
+        # Needs neither models nor indexes, so timetable answers work even if those fail.
+        timed_component("structured_timetable", reload_timetable_structured)
+        timed_component("embeddings", get_embeddings)
+        snap = timed_component("knowledge_snapshot", build_snapshot, *current_index_version())
+        snapshots.swap(snap)
+    except Exception as e:
+        print(f"Knowledge warm-up failed: {e}")
+        with _readiness_lock:
+            readiness.update(state="failed", error=str(e))
+        # Serve DB/timetable answers without RAG rather than failing every request.
+        if snapshots.current() is None:
+            snapshots.swap(KnowledgeSnapshot(version="unavailable", paths=MappingProxyType(index_paths(None)),
+                                             stores=MappingProxyType({}), rag_chain=None))
+        raise
+    finally:
+        # Readers keep polling even after a failed warm-up: the next export retries it.
+        if CAMPUS_ROLE == "reader":
+            threading.Thread(target=watch_knowledge, name="kb-watch", daemon=True).start()
+    with _readiness_lock:
+        readiness.update(state="ready", total_seconds=round(time.perf_counter() - start, 3))
+
+def initialize_rag_chain():
+    """Start loading models and the knowledge snapshot in the background (once); returns the Future."""
+    global _warmup_future
+    with _readiness_lock:
+        if _warmup_future is None:
+            readiness["state"] = "warming"
+            _warmup_future = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup").submit(_warm_up)
+        return _warmup_future
+
+def wait_until_ready(timeout=WARMUP_TIMEOUT):
+    """Block until warm-up has finished; a failed warm-up still leaves an (empty) snapshot."""
+    try:
+        initialize_rag_chain().result(timeout)
+    except Exception:
+        pass  # reported by _warm_up and in get_readiness()
+
+async def await_ready(timeout=WARMUP_TIMEOUT):
+    try:
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(initialize_rag_chain())), timeout)
+    except Exception:
+        pass  # reported by _warm_up and in get_readiness()
+
+def get_readiness():
+    with _readiness_lock:
+        return {**readiness, "components": dict(readiness["components"])}
 
 timetable_structured = {}
+# Compiled from timetable_structured on every reload; replaced whole, never mutated.
+timetable_index = TimetableIndex.from_structured({})
 def reload_timetable_structured():
-    global timetable_structured
+    global timetable_structured, timetable_index
     if os.path.exists(TIMETABLE_JSON_PATH):
         try:
             with open(TIMETABLE_JSON_PATH, "r", encoding="utf-8") as f:
@@ -272,18 +745,17 @@ def reload_timetable_structured():
             timetable_structured = {}
     else:
         timetable_structured = {}
+    timetable_index = TimetableIndex.from_structured(timetable_structured)
 
 def fetch_from_db(uid, query):
     if not uid:
         return None
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT uid,name,section,nationality,department,hod_contact,admin_contact,fees_status FROM students WHERE uid=?", (uid,))
-    row = cur.fetchone()
-    conn.close()
+    row = get_student(uid)
     if not row:
         return "❌ UID not found in student database."
-    
+    return answer_from_student_row(row, query)
+
+def answer_from_student_row(row, query):
     uid_db, name, section, nationality, department, hod_contact, admin_contact, fees_status = row
     q = query.lower()
     query_words = ["what", "what's", "show", "tell", "my", "is my", "do i have"]
@@ -300,160 +772,456 @@ def fetch_from_db(uid, query):
         return f"📌 {name}, your section is: {section}. (Source: Student DB)"
     return None
 
-def get_timetable_by_uid(uid, day=None):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT section,name FROM students WHERE uid=?", (uid,))
-    row = cur.fetchone()
-    conn.close()
+def batch_personal_answers(items=(), section=None, message=None, fees_status=None):
+    """Student-DB answers for many (uid, message) pairs, or for ``message`` asked by every
+    student of ``section``, with one set-based query instead of one per student.
+
+    Replies are ``None`` where the message is not a question the student DB answers.
+    Both modes read the DB directly, so a batch never mixes cached and fresh rows.
+    """
+    if section:
+        rows = get_section_students(section, fees_status)
+        return [{"uid": r[0], "reply": answer_from_student_row(r, message or "")} for r in rows]
+    students = get_students([uid for uid, _ in items], cached=False)
+    results = []
+    for uid, text in items:
+        row = students.get(uid)
+        reply = answer_from_student_row(row, text) if row else "❌ UID not found in student database."
+        results.append({"uid": uid, "reply": reply})
+    return results
+
+def get_timetable_by_uid(uid, day=None, snapshot=None, tq=None, now=None):
+    """Timetable reply for the student's section; never calls the LLM or an embedder.
+
+    ``tq`` is a parsed TimetableQuery (next class, class now, a day, the week).
+    """
+    row = get_student(uid)
     if not row:
         return "❌ UID not found in student DB."
-    section, name = row
-    if timetable_structured and section in timetable_structured:
-        schedule = timetable_structured[section]
-        if day:
-            dkey = day.capitalize()
-            if dkey in schedule:
-                entries = schedule[dkey]
-                resp = f"📅 {name} — Timetable for {section} ({dkey}):\n"
-                for e in entries:
-                    resp += f"- {e.get('time','')} | {e.get('subject','')} | {e.get('faculty','')} | {e.get('room','')}\n"
-                return resp + "\n(Source: Structured Timetable)"
-            else:
-                return f"⚠️ No entries for {dkey} in structured timetable."
-        else:
-            resp = f"📅 {name} — Timetable for {section} (Mon–Fri):\n\n"
-            for d in ["Monday","Tuesday","Wednesday","Thursday","Friday"]:
-                if d in schedule:
-                    resp += f"▶️ {d}:\n"
-                    for e in schedule[d]:
-                        resp += f"   - {e.get('time','')} | {e.get('subject','')} | {e.get('faculty','')} | {e.get('room','')}\n"
-                    resp += "\n"
-            return resp + "(Source: Structured Timetable)"
-    timetable_vs = stores.get("timetable_vs")
-    if not timetable_vs:
+    name, section = row[1], row[2]
+    if tq is None:
+        tq = TimetableQuery("day" if day else "week", day=day)
+    index = timetable_index
+    resp = index.answer(section, name, tq, now)
+    if resp is not None:
+        return resp
+    # Section missing from the structured JSON: BM25 over the timetable PDF chunks.
+    lexical = ((snapshot or current_snapshot()).stores.get("lexical") or {}).get("Timetable_Collection")
+    if not lexical or not len(lexical):
         return "⚠️ Timetable not available (no PDF indexed)."
-    q_text = section if not day else f"{section} {day}"
-    results = timetable_vs.similarity_search(q_text, k=6)
-    if not results:
+    q_text = section if not tq.day else f"{section} {tq.day}"
+    hits, _ = lexical.search(q_text, k=6)
+    if not hits:
         return f"⚠️ No timetable chunks found for section {section}."
     resp = f"📅 {name} — Timetable for {section} (best-effort):\n"
     seen = set()
-    for r in results:
-        text = r.page_content.strip()
+    for doc_id, _ in hits:
+        # The chunk may have been removed (or its text pruned) since the search.
+        found = lexical.document(doc_id)
+        if found is None: continue
+        text = found[0].strip()
         if text in seen: continue
         seen.add(text)
         resp += f"- {text}\n"
+    if not seen:
+        return f"⚠️ No timetable chunks found for section {section}."
     return resp + "\n(Source: Timetable PDF)"
 
-def classify_intent(query: str) -> str:
-    fast_llm = OllamaLLM(model="qwen:7b")
-    intent_prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an intent classifier. Your job is to determine the user's primary goal.
-        Respond with one of the following categories ONLY:
-        - timetable_request: The user is asking to see their class schedule or timetable.
-        - personal_query: The user is asking about their personal data like fees, HOD contact, section, etc.
-        - general_faq: The user is asking a general knowledge question or a question about the college that is not personal.
-        Examples:
-        - "what is my schedule tomorrow" -> timetable_request
-        - "fees due date" -> personal_query
-        - "hod email" -> personal_query
-        - "when is the library open" -> general_faq
-        - "the timetable has a mistake" -> general_faq
-        - "why is my class not in the timetable" -> general_faq
-        """),
-        ("human", "{user_query}")
-    ])
-    intent_chain = intent_prompt | fast_llm
+intent_llm = llm_clients.get_llm("qwen:7b", OLLAMA_BASE_URL)
+intent_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are an intent classifier. Your job is to determine the user's primary goal.
+    Respond with one of the following categories ONLY:
+    - timetable_request: The user is asking to see their class schedule or timetable.
+    - personal_query: The user is asking about their personal data like fees, HOD contact, section, etc.
+    - general_faq: The user is asking a general knowledge question or a question about the college that is not personal.
+    Examples:
+    - "what is my schedule tomorrow" -> timetable_request
+    - "fees due date" -> personal_query
+    - "hod email" -> personal_query
+    - "when is the library open" -> general_faq
+    - "the timetable has a mistake" -> general_faq
+    - "why is my class not in the timetable" -> general_faq
+    - "my timetable is wrong" -> general_faq
+    - "what is the admission fee" -> general_faq
+    """),
+    ("human", "{user_query}")
+])
+intent_chain = intent_prompt | intent_llm
+
+def preload_models():
+    """Load both Ollama models (and the RAG instructions into its prompt cache) before the first question."""
     try:
-        response = intent_chain.invoke({"user_query": query}).strip()
-        if response in ["timetable_request", "personal_query", "general_faq"]:
-            return response
-        else:
-            return "general_faq"
+        timed_component("intent_llm_preload", llm_clients.preload, intent_llm.model, OLLAMA_BASE_URL)
+        timed_component("rag_llm_preload", llm_clients.preload, llm.model, OLLAMA_BASE_URL, prompt=RAG_PROMPT_PREFIX)
+        models = llm_clients.residency(OLLAMA_BASE_URL)
     except Exception as e:
-        print(f"Intent classification failed: {e}")
-        return "general_faq"
+        print(f"Ollama preload failed (models load on first use): {e}")
+        return []
+    for m in models:
+        print(f"Ollama model resident: {m['name']} ({m['vram_mb']}/{m['size_mb']} MB in VRAM, until {m['expires_at']})")
+    missing = {intent_llm.model, llm.model} - {m["name"] for m in models}
+    if missing:
+        print(f"Ollama models not resident after preload: {', '.join(sorted(missing))}")
+    with _readiness_lock:
+        readiness["models"] = models
+    return models
+
+# Bounds concurrent Ollama generations on the async path; waiting past the queue timeout raises Overloaded.
+llm_gate = AdmissionGate()
+
+# Identical questions asked at the same time (e.g. right after an announcement)
+# share one qwen call and one RAG generation; each caller still gets its own log rows.
+intent_flights = SingleFlight("intent")
+rag_flights = SingleFlight("rag")
+
+def flight_key(query, snap=None):
+    # The API folds ChatRequest.language into the query ("Please answer in ..."),
+    # so the language hint is part of the key.
+    return (snap.version if snap else None, normalize_query(query))
+
+def llm_classify_intent(query: str) -> str:
+    def run():
+        with span("intent_llm"):
+            return intent_chain.invoke({"user_query": query})
+    return intent_flights.call(flight_key(query), run)
+
+async def allm_classify_intent(query: str) -> str:
+    async def run():
+        async with llm_gate.slot():
+            with span("intent_llm"):
+                return await asyncio.wait_for(intent_chain.ainvoke({"user_query": query}), INTENT_LLM_TIMEOUT)
+    return await intent_flights.acall(flight_key(query), run)
+
+# Rules / n-gram tiers answer most queries locally; qwen:7b only sees the ambiguous ones.
+# Overloaded propagates so the API answers 503 instead of guessing an intent.
+intent_classifier = IntentClassifier(llm_classify=llm_classify_intent, allm_classify=allm_classify_intent,
+                                     reraise=(Overloaded,))
+
+def classify_intent(query: str) -> str:
+    return intent_classifier.classify(query)
 
 FALLBACK_PHRASE = "Sorry, I don’t have this information right now. Please check with the college administration."
 
-def campus_sathi_router(query, uid=None):
-    active_announcement = get_active_announcement()
-    core_response = ""
-    intent = classify_intent(query)
-    print(f"Detected Intent: {intent}")
+def embed_for_cache(text):
+    return query_embeddings.embed("eng", get_embeddings()[0], text)
+
+# general_faq answers only; invalidated whenever the knowledge base changes.
+response_cache = SemanticResponseCache(embed_fn=embed_for_cache)
+
+def format_announcement(active_announcement):
+    return f"📢 **Announcement:** {active_announcement}\n\n---\n\n"
+
+def route_without_rag(query, uid, snap):
+    """Answer from the timetable/student DB when possible; returns "" if the query needs RAG."""
+    with span("intent"):
+        intent, tier = intent_classifier.classify_with_tier(query)
+    print(f"Detected Intent: {intent} (tier: {tier})")
+    tracing.annotate(intent=intent, tier=tier)
+    with span("db"):
+        return answer_without_rag(query, uid, intent, snap)
+
+class StageTicket:
+    """Decides, once, whether a worker thread's result is still wanted.
 
+    The worker ``commit()``s before its side effects (log rows); a caller that gave
+    up waiting ``abandon()``s. Whichever comes first wins, and the other sees False.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def _claim(self, state):
+        with self._lock:
+            if self._state is None:
+                self._state = state
+            return self._state == state
+
+    def commit(self):
+        return self._claim("committed")
+
+    def abandon(self):
+        return self._claim("abandoned")
+
+def answer_without_rag(query, uid, intent, snap, ticket=None):
+    """Timetable/student-DB answer, or "" if the query needs RAG.
+
+    With a ``ticket``, nothing is logged (and None is returned) once the caller abandoned it.
+    """
+    core_response = ""
+    logs = []
     if intent == "timetable_request":
-        if not uid:
+        tq = parse_timetable_query(query)
+        if tq.kind == "room":
+            core_response = timetable_index.render_room(tq.room)
+        elif not uid:
             core_response = "❌ Please provide your UID so I can fetch your timetable."
         else:
-            day_found = None
-            q_lower = query.lower()
-            for d in ["monday", "tuesday", "wednesday", "thursday", "friday"]:
-                if d in q_lower:
-                    day_found = d
-                    break
-            core_response = get_timetable_by_uid(uid, day=day_found)
-        log_query(uid, query, core_response, fallback=False)
+            core_response = get_timetable_by_uid(uid, snapshot=snap, tq=tq)
+        logs.append((log_query, (uid, query, core_response, False)))
 
     elif intent == "personal_query" and uid:
         db_r = fetch_from_db(uid, query)
         if db_r:
             core_response = db_r
-            log_query(uid, query, core_response, fallback=False)
-        else:
-            intent = "general_faq"
+            logs.append((log_query, (uid, query, core_response, False)))
+
+    if not core_response and not snap.rag_chain:
+        logs.append((log_unanswered, (uid, query)))
+        core_response = "⚠️ Knowledge base not available. Admin: please upload FAQ/timetable and refresh indexes."
+    if ticket is not None and not ticket.commit():
+        return None
+    for log, args in logs:
+        log(*args)
+    return core_response
+
+def is_fallback(response_text):
+    return FALLBACK_PHRASE.lower() in response_text.lower()
 
-    if intent == "general_faq" and not core_response:
-        if not rag_chain:
+def rag_tokens(query, snap, cache_generation):
+    """The RAG answer token by token (run once per flight); the full answer is cached."""
+    parts = []
+    for chunk in snap.rag_chain.stream({"input": query}, config=tracing.chain_config()):
+        token = chunk.get("answer") if isinstance(chunk, dict) else None
+        if token:
+            parts.append(token)
+            yield token
+    cache_rag_answer(query, "".join(parts), cache_generation)
+
+async def arag_tokens(query, snap, cache_generation):
+    queued = time.perf_counter()
+    async with llm_gate.slot():
+        tracing.record("llm_queue", time.perf_counter() - queued)
+        parts = []
+        async with asyncio.timeout(RAG_TIMEOUT):
+            async for chunk in snap.rag_chain.astream({"input": query}, config=tracing.chain_config()):
+                token = chunk.get("answer") if isinstance(chunk, dict) else None
+                if token:
+                    parts.append(token)
+                    yield token
+    await asyncio.to_thread(cache_rag_answer, query, "".join(parts), cache_generation)
+
+def cache_rag_answer(query, response_text, cache_generation):
+    if not is_fallback(response_text):
+        with span("response_cache_put"):
+            response_cache.put(query, response_text, generation=cache_generation)
+
+def finish_rag_answer(query, uid, response_text):
+    """Per-caller logging of a RAG answer (also for callers that shared another's flight)."""
+    if is_fallback(response_text):
+        tracing.annotate(outcome="fallback")
+        with span("log"):
             log_unanswered(uid, query)
-            core_response = "⚠️ Knowledge base not available. Admin: please upload FAQ/timetable and refresh indexes."
-        else:
-            try:
-                result = rag_chain.invoke({"input": query})
-                response_text = result.get("answer") if isinstance(result, dict) else str(result)
-                if FALLBACK_PHRASE.lower() in response_text.lower():
-                    log_unanswered(uid, query)
-                    log_query(uid or "Guest", query, response_text, fallback=True)
-                else:
-                    log_query(uid or "Guest", query, response_text, fallback=False)
-                core_response = response_text
-            except Exception as e:
-                core_response = f"⚠️ Error querying RAG: {e}"
+            log_query(uid or "Guest", query, response_text, fallback=True)
+    else:
+        tracing.annotate(outcome="rag")
+        with span("log"):
+            log_query(uid or "Guest", query, response_text, fallback=False)
 
+def campus_sathi_router_stream(query, uid=None):
+    """Yield the reply in pieces: announcement and DB answers at once, RAG answers token by token."""
+    # One snapshot for the whole request, so an index swap mid-answer can't pull it out from under us.
+    wait_until_ready()
+    trace = tracing.begin("stream")
+    try:
+        with snapshots.acquire() as snap:
+            yield from _router_stream(query, uid, snap)
+    finally:
+        tracing.finish(trace)
+
+def _router_stream(query, uid, snap):
+    with span("announcement"):
+        active_announcement = get_active_announcement()
     if active_announcement:
-        return f"📢 **Announcement:** {active_announcement}\n\n---\n\n{core_response}"
-    else:
-        return core_response
+        yield format_announcement(active_announcement)
+
+    core_response = route_without_rag(query, uid, snap)
+    if core_response:
+        tracing.annotate(outcome="direct")
+        yield core_response
+        return
+
+    with span("response_cache"):
+        cached, cache_kind = response_cache.get(query)
+    if cached:
+        print(f"Response cache hit ({cache_kind})")
+        tracing.annotate(outcome="cached")
+        log_query(uid or "Guest", query, cached, fallback=False)
+        yield cached
+        return
+
+    try:
+        cache_generation = response_cache.generation
+        parts = []
+        with span("rag"):
+            for token in rag_flights.stream(flight_key(query, snap),
+                                            lambda: rag_tokens(query, snap, cache_generation)):
+                if not parts:
+                    tracing.first_token()
+                parts.append(token)
+                yield token
+        finish_rag_answer(query, uid, "".join(parts))
+    except Exception as e:
+        tracing.annotate(outcome="error")
+        yield f"⚠️ Error querying RAG: {e}"
+
+def campus_sathi_router(query, uid=None):
+    return "".join(campus_sathi_router_stream(query, uid))
+
+async def campus_sathi_router_astream(query, uid=None):
+    """Async counterpart of campus_sathi_router_stream for the API server.
+
+    Raises Overloaded before yielding anything when no LLM slot frees up in time,
+    so callers can still answer with a 503.
+    """
+    trace = tracing.begin("async")
+    try:
+        with span("warmup_wait"):
+            await await_ready()
+        with snapshots.acquire() as snap:
+            async for chunk in _router_astream(query, uid, snap):
+                yield chunk
+    except Overloaded:
+        tracing.annotate(outcome="overloaded")
+        raise
+    finally:
+        tracing.finish(trace)
+
+async def _router_astream(query, uid, snap):
+    # Every DB touch runs off the event loop: a cache miss queries the pool, and a
+    # log write can block on a full log queue.
+    with span("announcement"):
+        active_announcement = await asyncio.to_thread(get_active_announcement)
+    header = format_announcement(active_announcement) if active_announcement else ""
+
+    with span("intent"):
+        intent, tier = await intent_classifier.aclassify_with_tier(query)
+    print(f"Detected Intent: {intent} (tier: {tier})")
+    tracing.annotate(intent=intent, tier=tier, outcome="direct")
+    ticket = StageTicket()
+    with span("db"):
+        db_stage = asyncio.ensure_future(asyncio.to_thread(answer_without_rag, query, uid, intent, snap, ticket))
+        try:
+            core_response = await asyncio.wait_for(asyncio.shield(db_stage), DB_STAGE_TIMEOUT)
+        except asyncio.TimeoutError:
+            if ticket.abandon():
+                # The thread runs on, but will neither log nor answer.
+                tracing.annotate(outcome="db_timeout")
+                core_response = "⚠️ The student database is busy right now. Please try again in a moment."
+            else:
+                # It finished just as the timeout fired and has already logged.
+                core_response = await db_stage
+    if not core_response:
+        with span("response_cache"):
+            cached, cache_kind = await asyncio.to_thread(response_cache.get, query)
+        if cached:
+            print(f"Response cache hit ({cache_kind})")
+            tracing.annotate(outcome="cached")
+            await asyncio.to_thread(log_query, uid or "Guest", query, cached, fallback=False)
+            core_response = cached
+    if core_response:
+        yield header + core_response
+        return
+
+    cache_generation = response_cache.generation
+    parts = []
+    try:
+        with span("rag"):
+            async for token in rag_flights.astream(flight_key(query, snap),
+                                                   lambda: arag_tokens(query, snap, cache_generation)):
+                if not parts:
+                    # Held back until the LLM is admitted, so Overloaded can still become a 503.
+                    tracing.first_token()
+                    if header:
+                        yield header
+                parts.append(token)
+                yield token
+    except Overloaded:
+        raise
+    except TimeoutError:
+        tracing.annotate(outcome="rag_timeout")
+        yield ("" if parts else header) + "\n\n⚠️ This answer is taking too long. Please try again shortly."
+        return
+    except Exception as e:
+        tracing.annotate(outcome="error")
+        yield ("" if parts else header) + f"⚠️ Error querying RAG: {e}"
+        return
+    await asyncio.to_thread(finish_rag_answer, query, uid, "".join(parts))
+
+async def campus_sathi_router_async(query, uid=None):
+    return "".join([chunk async for chunk in campus_sathi_router_astream(query, uid)])
 
 def admin_approve_unanswered(qid, answer_text):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT query, uid FROM unanswered_queries WHERE id=?", (qid,))
-    row = cur.fetchone()
-    conn.close()
+    refused = writer_only("Approving answers")
+    if refused:
+        return refused
+    row = db.fetchone("SELECT query, uid FROM unanswered_queries WHERE id=?", (qid,))
     if not row:
         return "Unanswered ID not found."
     question_text, uid = row
-    doc_text = f"Q: {question_text}\nA: {answer_text}"
-    new_doc = Document(page_content=doc_text, metadata={"source":"admin_approved"})
-    chunks = text_splitter.split_documents([new_doc])
-    eng_vs = stores.get("eng_vs")
-    indic_vs = stores.get("indic_vs")
-    added = 0
-    try:
-        if eng_vs:
-            eng_vs.add_documents(chunks)
-            added += 1
-        if indic_vs:
-            indic_vs.add_documents(chunks)
-            added += 1
-    except Exception as e:
-        return f"Error adding to vectorstores: {e}"
+    wait_until_ready()
+    # The approved_answers row and the index sync succeed or fail together: a row left
+    # behind by a failed sync would be published by the next refresh.
+    with index_lock:
+        previous = db.fetchone("SELECT question, answer, created_at FROM approved_answers WHERE unanswered_id=?",
+                               (qid,))
+        db.execute("""
+            INSERT INTO approved_answers (unanswered_id, question, answer, created_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(unanswered_id) DO UPDATE SET
+                question=excluded.question, answer=excluded.answer, created_at=excluded.created_at
+        """, (qid, question_text, answer_text, datetime.now().isoformat()))
+        snap = current_snapshot()
+        try:
+            # Approved answers are kept in the DB, so only the new chunks are embedded here
+            # and any rebuild (including one running right now) re-creates them.
+            manifest = index_sync.load_manifest(snap.paths["manifest"])
+            added = len(sync_approved(stores_collections(snap.stores), manifest, lexical=snap.stores.get("lexical"),
+                                      store=snap.stores.get("docs")))
+            index_sync.save_manifest(snap.paths["manifest"], manifest)
+            save_lexical(snap.stores.get("lexical"))
+            export_for_readers(snap.stores, snap.paths)
+        except Exception as e:
+            revert_approval(qid, previous, snap, question_text, answer_text)
+            return f"Error adding to vectorstores: {e}"
     mark_unanswered_resolved(qid)
+    response_cache.invalidate()
     return f"Approved and added to vectorstores (added to {added} stores)."
 
+def revert_approval(qid, previous, snap, question_text, answer_text):
+    """Undo a failed approval: restore the earlier answer (or none), drop whatever chunks of
+    the new one the failed sync got into the collections, lexical indexes or manifest, and
+    re-sync (verifying) so chunks it already removed for the earlier answer come back."""
+    if previous:
+        db.execute("UPDATE approved_answers SET question=?, answer=?, created_at=? WHERE unanswered_id=?",
+                   (*previous, qid))
+    else:
+        db.execute("DELETE FROM approved_answers WHERE unanswered_id=?", (qid,))
+    def ids(chunks):
+        return {index_sync.chunk_id(APPROVED_SOURCE, d.page_content) for d in chunks}
+
+    stray = sorted(ids(approved_answer_chunks([(question_text, answer_text)])) - ids(approved_answer_chunks()))
+    collections = stores_collections(snap.stores)
+    lexical = snap.stores.get("lexical") or {}
+    try:
+        manifest = index_sync.load_manifest(snap.paths["manifest"])
+        for t in APPROVED_TARGETS:
+            if collections.get(t) is not None:
+                collections[t].delete(ids=stray)
+            if lexical.get(t) is not None:
+                lexical[t].remove_many(stray)
+            entry = index_sync.manifest_entry(manifest, t, APPROVED_SOURCE)
+            if entry:
+                entry["ids"] = [i for i in entry["ids"] if i not in set(stray)]
+        sync_approved(collections, manifest, verify=True, lexical=lexical, store=snap.stores.get("docs"))
+        index_sync.save_manifest(snap.paths["manifest"], manifest)
+        save_lexical(lexical)
+    except Exception as e:
+        print(f"Could not restore the indexes after a failed approval: {e}")
+
 def admin_upload_file_bytes(file_bytes, kind):
+    refused = writer_only("Uploading files")
+    if refused:
+        return refused
     if kind == "faq": dest = FAQ_PDF_PATH
     elif kind == "timetable": dest = TIMETABLE_PDF_PATH
     elif kind == "structured_timetable":
@@ -462,22 +1230,124 @@ def admin_upload_file_bytes(file_bytes, kind):
         reload_timetable_structured()
         return "Structured timetable JSON uploaded and reloaded."
     else: return "Unknown kind"
+    if kind == "timetable":
+        with timetable_upload_lock:
+            # The running extraction still reads the previous PDF; replacing it now would
+            # mix the two files and the new one would never be extracted.
+            running = refresh_jobs.active("timetable_extract")
+            if running is not None:
+                return (f"⚠️ Timetable extraction job #{running.id} is still in progress, so the new PDF was not "
+                        "saved. Wait for it to finish (use 'Check Timetable Extraction'), then upload again.")
+            with open(dest, "wb") as f: f.write(file_bytes)
+            job = refresh_jobs.start("timetable_extract", extract_structured_timetable, dest)
+        return (f"{os.path.basename(dest)} uploaded. Structured extraction job #{job.id} started "
+                "(use 'Check Timetable Extraction'). Click Refresh Indexes to apply the PDF.")
     with open(dest, "wb") as f: f.write(file_bytes)
     return f"{os.path.basename(dest)} uploaded. Click Refresh Indexes to apply."
 
-def admin_refresh_indexes(force=False):
-    global stores, rag_chain, llm, prompt, document_chain
-    stores = load_vectorstores(force_refresh=force)
-    document_chain = create_stuff_documents_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(stores["retriever"], document_chain) if stores.get("retriever") else None
+def extract_structured_timetable(job, pdf_path):
+    """Background job: timetable.pdf -> timetable_structured.json, validated and diffed first."""
+    known_sections = [r[0] for r in db.fetchall("SELECT DISTINCT section FROM students")]
+    report = timetable_extract.run_extraction(pdf_path, TIMETABLE_JSON_PATH, known_sections=known_sections,
+                                              progress=job.report)
+    if report["published"]:
+        reload_timetable_structured()
+    summary = timetable_extract.format_report(report)
+    for line in summary.splitlines():
+        job.report(line)
+    if report["errors"]:
+        raise RuntimeError("Extraction not published: " + "; ".join(report["errors"]))
+    return summary.splitlines()[0]
+
+def copy_chroma_collections(stores, paths):
+    """Copy the live collections into new Chroma dirs at ``paths``; returns rows per collection."""
+    eng_embeddings, indic_embeddings = get_embeddings()
+    copied = {}
+    for key, name, embeddings in (("eng", "English_Collection", eng_embeddings),
+                                  ("indic", "Indic_Collection", indic_embeddings),
+                                  ("timetable", "Timetable_Collection", eng_embeddings)):
+        src = stores_collections(stores).get(name)
+        if src is None:
+            continue
+        dst = open_chroma_collection(embeddings, paths[key], name)
+        if dst is None:
+            raise RuntimeError(f"Could not create {name} in {paths[key]}")
+        copied[name] = index_sync.copy_collection(src, dst)
+    return copied
+
+def refresh_knowledge(job, force=False):
+    """Build a new index version beside the live one, smoke-test it, then swap it in."""
+    job.report("Waiting for startup warm-up")
+    wait_until_ready()
+    live = current_snapshot()
+    version = datetime.now().strftime("v%Y%m%d-%H%M%S-%f")
+    paths = index_paths(os.path.join(CHROMA_VERSIONS_DIR, version))
+    job.report(f"Copying index {live.version} to {version}")
+    with index_lock:
+        # Chroma dirs are copied through the client, not as files: the live client keeps
+        # HNSW segments in memory and SQLite in WAL mode, so its files may be mid-write.
+        copy_chroma_collections(live.stores, paths)
+        if os.path.isdir(live.paths["bm25"]):
+            shutil.copytree(live.paths["bm25"], paths["bm25"])
+        if os.path.exists(live.paths["manifest"]):
+            shutil.copy2(live.paths["manifest"], paths["manifest"])
+        if live.stores.get("docs") is not None:
+            live.stores["docs"].backup(paths["docs"])
+    try:
+        job.report("Syncing sources into the new version")
+        snap = build_snapshot(version, paths, force_refresh=force)
+        job.report("Running smoke query")
+        smoke_test_snapshot(snap)
+        with index_lock:
+            # Pick up answers approved into the live version while this one was building.
+            manifest = index_sync.load_manifest(paths["manifest"])
+            late = sync_approved(stores_collections(snap.stores), manifest, lexical=snap.stores.get("lexical"),
+                                 store=snap.stores.get("docs"))
+            index_sync.save_manifest(paths["manifest"], manifest)
+            save_lexical(snap.stores.get("lexical"))
+            if any(r["added"] or r["removed"] for r in late.values()):
+                export_for_readers(snap.stores, paths)
+            publish_index_version(version)
+            snapshots.swap(snap)
+    except Exception:
+        shutil.rmtree(paths["root"], ignore_errors=True)
+        raise
     reload_timetable_structured()
-    return "Indexes reloaded."
+    response_cache.invalidate()
+    result = f"Indexes reloaded ({version}). " + index_sync.format_report(snap.stores.get("index_report", {}))
+    job.report(result)
+    return result
+
+def admin_refresh_indexes(force=False):
+    refused = writer_only("Refreshing indexes")
+    if refused:
+        return refused
+    job = refresh_jobs.start("refresh_indexes", refresh_knowledge, force=force)
+    return f"Refresh job #{job.id} {job.status}. Use 'Check Refresh Status' to follow progress."
+
+def admin_refresh_status():
+    return admin_job_status("refresh_indexes", "Refresh")
+
+def admin_timetable_extract_status():
+    return admin_job_status("timetable_extract", "Timetable extraction")
+
+def admin_job_status(name, label):
+    job = refresh_jobs.get(name)
+    if job is None:
+        return f"No {label.lower()} has been started."
+    lines = [f"{label} job #{job.id}: {job.status}"] + [f"- {m}" for m in job.to_dict()["progress"]]
+    if job.error:
+        lines.append(f"Error: {job.error}")
+    return "\n".join(lines)
 
 def chat_submit(user_message, uid, history):
     if history is None: history = []
-    resp = campus_sathi_router(user_message, uid)
-    history.append((user_message, resp))
-    return history, history
+    history.append((user_message, ""))
+    resp = ""
+    for chunk in campus_sathi_router_stream(user_message, uid):
+        resp += chunk
+        history[-1] = (user_message, resp)
+        yield history, history
 
 def admin_upload_faq(file_obj):
     if not file_obj: return "No file"
@@ -504,80 +1374,90 @@ def safe_admin_approve(qid, ans):
         return "Error: Please provide both an Unanswered ID and an Approved Answer."
     return admin_approve_unanswered(int(qid), ans)
 
-with gr.Blocks(title="CampusSathi (Prod Demo)") as demo:
-    gr.Markdown("# CampusSathi — Multilingual College Assistant (Demo)")
-    with gr.Tabs():
-        with gr.TabItem("Chat"):
-            uid_input = gr.Textbox(label="Enter UID (optional)", placeholder="24MCI10030")
-            chatbot = gr.Chatbot(label="CampusSathi")
-            message = gr.Textbox(placeholder="Ask anything (fees, timetable, FAQ)...")
-            send_btn = gr.Button("Send")
-            clear_btn = gr.Button("Clear Chat")
-            state = gr.State([])
-            send_btn.click(chat_submit, [message, uid_input, state], [chatbot, state])
-            message.submit(chat_submit, [message, uid_input, state], [chatbot, state])
-            clear_btn.click(lambda: ([], []), None, [chatbot, state])
-
-        with gr.TabItem("Admin"):
-            gr.Markdown("### Admin Dashboard")
-            with gr.Row():
-                with gr.Column(scale=3):
-                    announcement_input = gr.Textbox(label="New Announcement", placeholder="e.g., Tomorrow is a holiday due to...")
-                    announcement_status = gr.Textbox(label="Status", interactive=False)
-                with gr.Column(scale=1):
-                    post_announcement_btn = gr.Button("Post/Update Announcement")
-                    clear_announcement_btn = gr.Button("Clear Announcement")
-            post_announcement_btn.click(set_active_announcement, inputs=[announcement_input], outputs=[announcement_status])
-            clear_announcement_btn.click(clear_active_announcement, inputs=[], outputs=[announcement_status])
+def build_demo():
+    import gradio as gr
+
+    with gr.Blocks(title="CampusSathi (Prod Demo)") as demo:
+        gr.Markdown("# CampusSathi — Multilingual College Assistant (Demo)")
+        with gr.Tabs():
+            with gr.TabItem("Chat"):
+                uid_input = gr.Textbox(label="Enter UID (optional)", placeholder="24MCI10030")
+                chatbot = gr.Chatbot(label="CampusSathi")
+                message = gr.Textbox(placeholder="Ask anything (fees, timetable, FAQ)...")
+                send_btn = gr.Button("Send")
+                clear_btn = gr.Button("Clear Chat")
+                state = gr.State([])
+                send_btn.click(chat_submit, [message, uid_input, state], [chatbot, state])
+                message.submit(chat_submit, [message, uid_input, state], [chatbot, state])
+                clear_btn.click(lambda: ([], []), None, [chatbot, state])
+
+            with gr.TabItem("Admin"):
+                gr.Markdown("### Admin Dashboard")
+                with gr.Row():
+                    with gr.Column(scale=3):
+                        announcement_input = gr.Textbox(label="New Announcement", placeholder="e.g., Tomorrow is a holiday due to...")
+                        announcement_status = gr.Textbox(label="Status", interactive=False)
+                    with gr.Column(scale=1):
+                        post_announcement_btn = gr.Button("Post/Update Announcement")
+                        clear_announcement_btn = gr.Button("Clear Announcement")
+                post_announcement_btn.click(set_active_announcement, inputs=[announcement_input], outputs=[announcement_status])
+                clear_announcement_btn.click(clear_active_announcement, inputs=[], outputs=[announcement_status])
             
-            gr.Markdown("---")
-            gr.Markdown("### Upload / Refresh Knowledge")
-            with gr.Row():
-                faq_file = gr.File(label="Upload faq.pdf", file_count="single", type="filepath")
-                tt_file = gr.File(label="Upload timetable.pdf", file_count="single", type="filepath")
-                struct_file = gr.File(label="Upload structured timetable JSON", file_count="single", type="filepath")
-            with gr.Row():
-                upload_faq_btn = gr.Button("Upload FAQ PDF")
-                upload_tt_btn = gr.Button("Upload Timetable PDF")
-                upload_struct_btn = gr.Button("Upload Structured JSON")
-            refresh_btn = gr.Button("Refresh Indexes (rebuild)")
-            with gr.Row():
-                faq_out = gr.Textbox(label="FAQ upload result", interactive=False)
-                tt_out = gr.Textbox(label="Timetable upload result", interactive=False)
-                struct_out = gr.Textbox(label="Structured upload result", interactive=False)
-            refresh_out = gr.Textbox(label="Refresh result", interactive=False)
-
-            upload_faq_btn.click(admin_upload_faq, inputs=[faq_file], outputs=[faq_out])
-            upload_tt_btn.click(admin_upload_tt, inputs=[tt_file], outputs=[tt_out])
-            upload_struct_btn.click(admin_upload_struct, inputs=[struct_file], outputs=[struct_out])
-            refresh_btn.click(lambda: admin_refresh_indexes(force=True), outputs=[refresh_out])
-
-            gr.Markdown("---")
-            pending_count_md = gr.Markdown()
-            gr.Markdown("### Pending Unanswered Queries for Evaluation")
-            pending_df = gr.Dataframe(headers=["id","uid","query","timestamp"])
-            load_pending_btn = gr.Button("Load Pending Queries")
-            load_pending_btn.click(load_pending_table, outputs=[pending_df])
-
-            gr.Markdown("### Approve an Unanswered Query")
-            approve_id = gr.Number(label="Unanswered ID")
-            approve_answer = gr.Textbox(label="Approved Answer (what the bot should reply)")
-            approve_btn = gr.Button("Approve & Add to KB")
-            approve_out = gr.Textbox(label="Approve result", interactive=False)
-            approve_btn.click(safe_admin_approve, inputs=[approve_id, approve_answer], outputs=[approve_out])
-
-    def update_admin_dashboard():
-        count = get_pending_count()
-        current_announcement = get_active_announcement() or "No active announcement."
-        return {
-            pending_count_md: gr.Markdown(f"**<center>⚠️ You have {count} pending queries to review.</center>**"),
-            announcement_status: gr.Textbox(value=current_announcement)
-        }
-
-    demo.load(update_admin_dashboard, outputs=[pending_count_md, announcement_status])
+                gr.Markdown("---")
+                gr.Markdown("### Upload / Refresh Knowledge")
+                with gr.Row():
+                    faq_file = gr.File(label="Upload faq.pdf", file_count="single", type="filepath")
+                    tt_file = gr.File(label="Upload timetable.pdf", file_count="single", type="filepath")
+                    struct_file = gr.File(label="Upload structured timetable JSON", file_count="single", type="filepath")
+                with gr.Row():
+                    upload_faq_btn = gr.Button("Upload FAQ PDF")
+                    upload_tt_btn = gr.Button("Upload Timetable PDF")
+                    upload_struct_btn = gr.Button("Upload Structured JSON")
+                refresh_btn = gr.Button("Refresh Indexes (rebuild)")
+                with gr.Row():
+                    faq_out = gr.Textbox(label="FAQ upload result", interactive=False)
+                    tt_out = gr.Textbox(label="Timetable upload result", interactive=False)
+                    struct_out = gr.Textbox(label="Structured upload result", interactive=False)
+                with gr.Row():
+                    refresh_status_btn = gr.Button("Check Refresh Status")
+                    extract_status_btn = gr.Button("Check Timetable Extraction")
+                refresh_out = gr.Textbox(label="Refresh result", interactive=False)
+
+                upload_faq_btn.click(admin_upload_faq, inputs=[faq_file], outputs=[faq_out])
+                upload_tt_btn.click(admin_upload_tt, inputs=[tt_file], outputs=[tt_out])
+                upload_struct_btn.click(admin_upload_struct, inputs=[struct_file], outputs=[struct_out])
+                refresh_btn.click(lambda: admin_refresh_indexes(force=True), outputs=[refresh_out])
+                refresh_status_btn.click(admin_refresh_status, outputs=[refresh_out])
+                extract_status_btn.click(admin_timetable_extract_status, outputs=[tt_out])
+
+                gr.Markdown("---")
+                pending_count_md = gr.Markdown()
+                gr.Markdown("### Pending Unanswered Queries for Evaluation")
+                pending_df = gr.Dataframe(headers=["id","uid","query","timestamp"])
+                load_pending_btn = gr.Button("Load Pending Queries")
+                load_pending_btn.click(load_pending_table, outputs=[pending_df])
+
+                gr.Markdown("### Approve an Unanswered Query")
+                approve_id = gr.Number(label="Unanswered ID")
+                approve_answer = gr.Textbox(label="Approved Answer (what the bot should reply)")
+                approve_btn = gr.Button("Approve & Add to KB")
+                approve_out = gr.Textbox(label="Approve result", interactive=False)
+                approve_btn.click(safe_admin_approve, inputs=[approve_id, approve_answer], outputs=[approve_out])
+
+        def update_admin_dashboard():
+            count = get_pending_count()
+            current_announcement = get_active_announcement() or "No active announcement."
+            return {
+                pending_count_md: gr.Markdown(f"**<center>⚠️ You have {count} pending queries to review.</center>**"),
+                announcement_status: gr.Textbox(value=current_announcement)
+            }
+
+        demo.load(update_admin_dashboard, outputs=[pending_count_md, announcement_status])
+    return demo
 
 if __name__ == "__main__":
     init_db()
     add_sample_students()
-    reload_timetable_structured()
-    demo.launch(server_name="0.0.0.0", server_port=7860)
\ No newline at end of file
+    warm_student_cache()
+    initialize_rag_chain()
+    build_demo().launch(server_name="0.0.0.0", server_port=7860)
\ No newline at end of file
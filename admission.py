@@ -0,0 +1,57 @@
+# admission.py
+# Admission control for Ollama-bound work: at most N generations at once, and
+# callers that cannot get a slot within the queue timeout are rejected.
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "15"))
+
+
+class Overloaded(RuntimeError):
+    """No LLM slot became free within the queue-wait timeout."""
+
+
+class AdmissionGate:
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENCY, queue_timeout=LLM_QUEUE_TIMEOUT):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._sem = None
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(["admitted", "rejected", "waiting", "in_flight"], 0)
+
+    def _semaphore(self):
+        # Created on first use so it binds to the server's running event loop.
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrent)
+        return self._sem
+
+    def _bump(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counters[name] += delta
+
+    @asynccontextmanager
+    async def slot(self):
+        sem = self._semaphore()
+        self._bump(waiting=1)
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._bump(waiting=-1, rejected=1)
+            raise Overloaded(f"LLM busy: no slot within {self.queue_timeout}s") from None
+        except BaseException:
+            self._bump(waiting=-1)
+            raise
+        self._bump(waiting=-1, admitted=1, in_flight=1)
+        try:
+            yield
+        finally:
+            sem.release()
+            self._bump(in_flight=-1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "max_concurrent": self.max_concurrent}
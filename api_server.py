@@ -1,12 +1,43 @@
 import os
+import hmac
+import json
+import asyncio
+import importlib
 import threading
-from fastapi import FastAPI
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
-# Reuse existing app logic
-import admin_rag
+# Reuse existing app logic. admin_rag (LangChain, Ollama client, DB setup) is
+# imported in the background so /health answers as soon as uvicorn is up.
+_rag_future = None
+_rag_lock = threading.Lock()
+
+# Shared secret for staff-only routes (sent as the X-Admin-Token header); unset disables them.
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+
+def _load_rag():
+    module = importlib.import_module("admin_rag")
+    module.init_db()
+    module.warm_student_cache()
+    module.initialize_rag_chain()
+    return module
+
+
+def rag_module_future():
+    global _rag_future
+    with _rag_lock:
+        if _rag_future is None:
+            _rag_future = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-import").submit(_load_rag)
+        return _rag_future
+
+
+async def get_rag():
+    return await asyncio.wrap_future(rag_module_future())
 
 
 class ChatRequest(BaseModel):
@@ -19,6 +50,51 @@ class ChatResponse(BaseModel):
     reply: str
 
 
+class StudentQuestion(BaseModel):
+    uid: str
+    message: str
+
+
+class StudentBatchRequest(BaseModel):
+    # Either explicit uid/message pairs, or one message for every student of a section
+    # (optionally only those with a given fees_status, e.g. "Pending").
+    items: list[StudentQuestion] = []
+    section: str | None = None
+    message: str | None = None
+    fees_status: str | None = None
+
+
+class StudentReply(BaseModel):
+    uid: str
+    reply: str | None
+
+
+class StudentBatchResponse(BaseModel):
+    results: list[StudentReply]
+
+
+def router_message(req: ChatRequest) -> str:
+    if req.language:
+        # Nudge LLM to reply in selected language
+        return f"Please answer in {req.language}. " + req.message
+    return req.message
+
+
+def overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="CampusSathi is busy right now. Please retry in a few seconds.",
+        headers={"Retry-After": "5"},
+    )
+
+
+def require_admin(token: str | None) -> None:
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="This endpoint is disabled: ADMIN_API_TOKEN is not set.")
+    if not token or not hmac.compare_digest(token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Missing or invalid X-Admin-Token header.")
+
+
 def build_app() -> FastAPI:
     app = FastAPI(title="CampusSathi API", version="1.0.0")
 
@@ -42,19 +118,102 @@ def build_app() -> FastAPI:
 
     @app.get("/status")
     def status():  # type: ignore[no-redef]
+        future = rag_module_future()
+        if not future.done():
+            return {"kb_ready": False, "readiness": {"state": "importing"}}
+        error = future.exception()
+        if error is not None:
+            # admin_rag failed to import or initialise; every other route answers 500 until restart.
+            return {"kb_ready": False,
+                    "readiness": {"state": "import_failed", "error": f"{type(error).__name__}: {error}"}}
+        admin_rag = future.result()
+        snap = admin_rag.current_snapshot()
         return {
-            "kb_ready": bool(admin_rag.rag_chain),
+            "kb_ready": bool(snap and snap.rag_chain),
+            "readiness": admin_rag.get_readiness(),
+            "knowledge": admin_rag.snapshots.stats(),
+            "intent_tiers": admin_rag.intent_classifier.stats(),
+            "response_cache": admin_rag.response_cache.stats(),
+            "log_writer": admin_rag.log_writer.stats(),
+            "student_cache": admin_rag.student_cache.stats(),
+            "llm_gate": admin_rag.llm_gate.stats(),
+            "rag_flights": admin_rag.rag_flights.stats(),
+            "intent_flights": admin_rag.intent_flights.stats(),
+            "embeddings": admin_rag.embedding_stats(),
+            "query_embeddings": admin_rag.query_embeddings.stats(),
         }
 
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():  # type: ignore[no-redef]
+        # Prometheus text format: per-stage/request histograms plus component counters.
+        import tracing
+        components = {}
+        future = rag_module_future()
+        if future.done() and future.exception() is None:
+            admin_rag = future.result()
+            components = {
+                "llm_gate": admin_rag.llm_gate.stats(),
+                "rag_flights": admin_rag.rag_flights.stats(),
+                "intent_flights": admin_rag.intent_flights.stats(),
+                "response_cache": admin_rag.response_cache.stats(),
+                "log_writer": admin_rag.log_writer.stats(),
+                "student_cache": admin_rag.student_cache.stats(),
+                "query_embeddings": admin_rag.query_embeddings.stats(),
+                "knowledge": admin_rag.snapshots.stats(),
+            }
+        return PlainTextResponse(tracing.render_metrics(components), media_type="text/plain; version=0.0.4")
+
     @app.post("/chat", response_model=ChatResponse)
-    def chat(req: ChatRequest):  # type: ignore[no-redef]
-        msg = req.message
-        if req.language:
-            # Nudge LLM to reply in selected language
-            msg = f"Please answer in {req.language}. " + msg
-        reply = admin_rag.campus_sathi_router(msg, req.uid)
+    async def chat(req: ChatRequest):  # type: ignore[no-redef]
+        admin_rag = await get_rag()
+        try:
+            reply = await admin_rag.campus_sathi_router_async(router_message(req), req.uid)
+        except admin_rag.Overloaded:
+            raise overloaded()
         return ChatResponse(reply=reply)
 
+    @app.post("/students/batch", response_model=StudentBatchResponse)
+    async def students_batch(req: StudentBatchRequest,  # type: ignore[no-redef]
+                             x_admin_token: str | None = Header(default=None)):
+        # Student-DB answers only (fees, HOD, section, ...): no intent LLM or RAG per row.
+        # Staff only: it answers for any uid or a whole section.
+        require_admin(x_admin_token)
+        admin_rag = await get_rag()
+        if req.section and not req.message:
+            raise HTTPException(status_code=422, detail="'message' is required with 'section'.")
+        if not req.section and not req.items:
+            raise HTTPException(status_code=422, detail="Send 'items' or a 'section' with a 'message'.")
+        if len(req.items) > admin_rag.STUDENT_BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413,
+                                detail=f"At most {admin_rag.STUDENT_BATCH_MAX_ITEMS} items per request.")
+        results = await asyncio.to_thread(
+            admin_rag.batch_personal_answers, [(i.uid, i.message) for i in req.items],
+            section=req.section, message=req.message, fees_status=req.fees_status,
+        )
+        return StudentBatchResponse(results=results)
+
+    @app.post("/chat/stream")
+    async def chat_stream(req: ChatRequest):  # type: ignore[no-redef]
+        admin_rag = await get_rag()
+        chunks = admin_rag.campus_sathi_router_astream(router_message(req), req.uid)
+        # Pull the first chunk before committing to a 200 so overload can still become a 503.
+        try:
+            first = await anext(chunks)
+        except StopAsyncIteration:
+            first = None
+        except admin_rag.Overloaded:
+            raise overloaded()
+
+        # NDJSON: one {"delta": ...} line per chunk, then {"done": true}.
+        async def events():
+            if first is not None:
+                yield json.dumps({"delta": first}, ensure_ascii=False) + "\n"
+                async for chunk in chunks:
+                    yield json.dumps({"delta": chunk}, ensure_ascii=False) + "\n"
+            yield json.dumps({"done": True}) + "\n"
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
     return app
 
 
@@ -62,9 +221,8 @@ app = build_app()
 
 
 if __name__ == "__main__":
-    # Ensure DB exists; warm RAG in background (lazy init)
-    admin_rag.init_db()
-    threading.Thread(target=admin_rag.initialize_rag_chain, daemon=True).start()
+    # DB setup, model loading and index warm-up all happen in the background
+    rag_module_future()
 
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "8000"))
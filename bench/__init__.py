@@ -0,0 +1 @@
+# bench: offline benchmark harness for the chat pipeline (see bench/run.py).
@@ -0,0 +1,76 @@
+# bench/compare.py
+# Compare a benchmark report against a saved baseline and flag regressions.
+#
+#   python -m bench.compare bench_results.json bench/baseline.json --tolerance 0.15
+import argparse
+import json
+import sys
+
+# (metric path, higher_is_better, minimum absolute change that counts)
+CHECKS = [
+    ("throughput_rps", True, 0.5),
+    ("latency.total.p50", False, 0.002),
+    ("latency.total.p95", False, 0.002),
+    ("latency.total.p99", False, 0.002),
+    ("latency.first_token.p95", False, 0.002),
+    ("memory.rss_peak_mb", False, 5.0),
+    ("startup.total_seconds", False, 0.5),
+]
+
+
+def _get(report, path):
+    value = report
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _checks(current, baseline):
+    checks = list(CHECKS)
+    stages = set(_get(current, "stages") or {}) & set(_get(baseline, "stages") or {})
+    checks += [(f"stages.{stage}.p95", False, 0.002) for stage in sorted(stages)]
+    return checks
+
+
+def compare(current, baseline, tolerance=0.15):
+    """Rows ``{"metric", "baseline", "current", "change", "regressed"}`` for metrics present in both."""
+    rows = []
+    for path, higher_is_better, min_delta in _checks(current, baseline):
+        base, cur = _get(baseline, path), _get(current, path)
+        if base is None or cur is None:
+            continue
+        change = (cur - base) / base if base else 0.0
+        worse = (base - cur) if higher_is_better else (cur - base)
+        regressed = worse > min_delta and worse > tolerance * abs(base)
+        rows.append({"metric": path, "baseline": base, "current": cur, "change": round(change, 4),
+                     "regressed": regressed})
+    return rows
+
+
+def format_rows(rows):
+    lines = [f"{'metric':<36} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for r in rows:
+        flag = "  REGRESSION" if r["regressed"] else ""
+        lines.append(f"{r['metric']:<36} {r['baseline']:>12.4f} {r['current']:>12.4f} {r['change']:>+8.1%}{flag}")
+    return "\n".join(lines)
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Compare a benchmark report with a baseline.")
+    parser.add_argument("current")
+    parser.add_argument("baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.tolerance)
+    print(format_rows(rows))
+    sys.exit(1 if any(r["regressed"] for r in rows) else 0)
+
+
+if __name__ == "__main__":
+    _main()
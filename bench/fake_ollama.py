@@ -0,0 +1,200 @@
+# bench/fake_ollama.py
+# Deterministic stand-in for the Ollama HTTP API (/api/generate, /api/chat,
+# /api/tags, /api/ps, /api/version) with configurable time-to-first-token,
+# token rate and parallelism, so the pipeline can be benchmarked offline.
+#
+#   python -m bench.fake_ollama --port 11500 --ttft 0.3 --tokens-per-sec 40
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FALLBACK = "Sorry, I don’t have this information right now. Please check with the college administration."
+INTENT_KEYWORDS = [
+    ("timetable_request", ("timetable", "schedule", "class", "lecture", "टाइम", "वेळापत्रक", "क्लास", "room")),
+    ("personal_query", ("fee", "fees", "hod", "section", "admin", "nationality", "फीस", "शुल्क")),
+]
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def classify(question):
+    q = question.lower()
+    for intent, words in INTENT_KEYWORDS:
+        if any(w in q for w in words):
+            return intent
+    return "general_faq"
+
+
+def answer_tokens(prompt, n_tokens):
+    """The reply as a token list: the fallback phrase when the question shares no
+    word with the prompt's context, otherwise ``n_tokens`` words seeded by the prompt."""
+    head, _, question = prompt.rpartition("Question:")
+    context = head.split("Context:", 1)[-1]
+    q_words = {w for w in _WORD_RE.findall(question.lower()) if len(w) > 3}
+    if q_words and not q_words & set(_WORD_RE.findall(context.lower())):
+        return [w + " " for w in FALLBACK.split()]
+    seed = hashlib.sha256(prompt.encode("utf-8")).digest()
+    words = [w for w in _WORD_RE.findall(context) if len(w) > 2] or ["campus", "college", "students"]
+    return [words[seed[i % len(seed)] * (i + 1) % len(words)] + " " for i in range(n_tokens)] + ["(Source: College FAQ)"]
+
+
+class FakeOllama:
+    """Threaded fake Ollama server; ``parallel`` bounds concurrent generations like OLLAMA_NUM_PARALLEL."""
+
+    def __init__(self, host="127.0.0.1", port=0, ttft=0.25, tokens_per_sec=40.0, answer_tokens=48,
+                 intent_latency=0.15, parallel=1):
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.intent_latency = intent_latency
+        self._slots = threading.BoundedSemaphore(parallel)
+        self.counters = {"generate": 0, "chat": 0, "loads": 0, "queued_seconds": 0.0}
+        self.loaded = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _reply(self, prompt):
+        """``(tokens, first_token_delay, per_token_delay)`` for a prompt."""
+        if "intent classifier" in prompt.lower():
+            _, _, question = prompt.rpartition("Human:")
+            return [classify(question)], self.intent_latency, 0.0
+        return answer_tokens(prompt, self.answer_tokens), self.ttft, 1.0 / self.tokens_per_sec
+
+    def _load(self, model, keep_alive):
+        with self._lock:
+            if model not in self.loaded:
+                self.counters["loads"] += 1
+            self.loaded[model] = keep_alive
+
+    def _generate(self, body, chat):
+        model = body.get("model", "fake")
+        self._load(model, body.get("keep_alive"))
+        if not chat and not body.get("prompt"):
+            # Empty prompt: Ollama only loads the model.
+            yield {"model": model, "created_at": _now(), "response": "", "done": True, "done_reason": "load"}
+            return
+        if chat:
+            prompt = "\n".join(f"{'Human' if m.get('role') == 'user' else 'System'}: {m.get('content', '')}"
+                               for m in body.get("messages", []))
+        else:
+            prompt = body.get("prompt", "")
+        queued = time.perf_counter()
+        with self._slots:
+            with self._lock:
+                self.counters["chat" if chat else "generate"] += 1
+                self.counters["queued_seconds"] += time.perf_counter() - queued
+            tokens, first_delay, token_delay = self._reply(prompt)
+            start = time.perf_counter()
+            time.sleep(first_delay)
+            for i, tok in enumerate(tokens):
+                if i:
+                    time.sleep(token_delay)
+                piece = {"message": {"role": "assistant", "content": tok}} if chat else {"response": tok}
+                yield {"model": model, "created_at": _now(), **piece, "done": False}
+            elapsed_ns = int((time.perf_counter() - start) * 1e9)
+            final = {"message": {"role": "assistant", "content": ""}} if chat else {"response": "", "context": []}
+            yield {"model": model, "created_at": _now(), **final, "done": True, "done_reason": "stop",
+                   "total_duration": elapsed_ns, "load_duration": 0, "prompt_eval_count": len(prompt.split()),
+                   "prompt_eval_duration": 0, "eval_count": len(tokens), "eval_duration": elapsed_ns}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json({"models": [{"name": "llama3.1:8b"}, {"name": "qwen:7b"}]})
+                elif self.path == "/api/ps":
+                    with fake._lock:
+                        loaded = list(fake.loaded)
+                    self._json({"models": [{"name": m, "model": m, "size": 5 * 2**30, "size_vram": 0,
+                                            "expires_at": _now(), "digest": "fake"} for m in loaded]})
+                elif self.path == "/api/version":
+                    self._json({"version": "0.0.0-fake"})
+                else:
+                    self._json({"status": "Ollama is running"})
+
+            def do_POST(self):
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self._json({"error": f"unknown endpoint {self.path}"}, status=404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                parts = fake._generate(body, chat=self.path == "/api/chat")
+                if not body.get("stream", True):
+                    parts = list(parts)
+                    final = parts[-1]
+                    key = "message" if "message" in final else "response"
+                    text = "".join(p["message"]["content"] if key == "message" else p["response"] for p in parts)
+                    self._json({**final, key: {"role": "assistant", "content": text} if key == "message" else text})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for part in parts:
+                    data = (json.dumps(part, ensure_ascii=False) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft", type=float, default=0.25, help="seconds before the first answer token")
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--answer-tokens", type=int, default=48)
+    parser.add_argument("--intent-latency", type=float, default=0.15)
+    parser.add_argument("--parallel", type=int, default=1, help="concurrent generations (OLLAMA_NUM_PARALLEL)")
+    args = parser.parse_args()
+    fake = FakeOllama(args.host, args.port, args.ttft, args.tokens_per_sec, args.answer_tokens,
+                      args.intent_latency, args.parallel)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    _main()
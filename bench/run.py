@@ -0,0 +1,306 @@
+# bench/run.py
+# Offline benchmark of the chat pipeline: builds an isolated work dir (copies of
+# the PDFs / structured timetable, a seeded campus.db), points the app at a fake
+# Ollama and the hash embedding backend, replays a synthetic workload with N
+# concurrent users through campus_sathi_router_async, and reports throughput,
+# per-stage p50/p95/p99 (from tracing) and memory. Nothing is downloaded.
+#
+#   python -m bench.run --requests 300 --concurrency 8     # report in bench/results/latest.json
+#   python -m bench.run --baseline bench/baseline.json        # exit 1 on regression
+#   python -m bench.run --save-baseline bench/baseline.json
+#
+# The indexes still need chromadb / langchain_community; without them the run
+# measures the DB/timetable paths and the degraded RAG answer, and says so.
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from bench import compare as compare_mod
+from bench import workload
+from bench.fake_ollama import FakeOllama
+from timetable_index import room_parts
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Run reports land here by default; the directory is git-ignored.
+RESULTS_DIR = os.path.join(REPO_ROOT, "bench", "results")
+FIXTURES = ("faq.pdf", "timetable.pdf", "timetable_structured.json")
+SAMPLE_SECTIONS = ["24MAM-1", "24MAM-2", "24MAM-4"]
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemorySampler:
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak = rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-rss", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+
+def percentiles(values):
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"count": len(values), "mean": round(float(arr.mean()), 5), "p50": round(float(p50), 5),
+            "p95": round(float(p95), 5), "p99": round(float(p99), 5), "max": round(float(arr.max()), 5)}
+
+
+def find_fixture(name, data_dirs):
+    for d in data_dirs:
+        path = os.path.join(d, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def prepare_workdir(workdir, data_dir):
+    data = os.path.join(workdir, "data")
+    os.makedirs(data, exist_ok=True)
+    copied = []
+    for name in FIXTURES:
+        src = find_fixture(name, [data_dir, os.path.join(data_dir, "data")])
+        if src:
+            shutil.copy2(src, os.path.join(data, name))
+            copied.append(name)
+    return copied
+
+
+def seed_students(rag, n, sections):
+    rows = [(f"BENCH{i:05d}", f"Bench Student {i}", sections[i % len(sections)], "Domestic", "Computer Applications",
+             "hod_ca@college.ac.in", "admin@college.ac.in", "Paid" if i % 3 else "Pending") for i in range(n)]
+    rag.db.executemany(
+        "INSERT OR REPLACE INTO students (uid,name,section,nationality,department,hod_contact,admin_contact,fees_status)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    rag.warm_student_cache()
+    return [r[0] for r in rows]
+
+
+def structured_rooms(structured):
+    """Room references as students type them: "226" and "E2-226" for "Lecture Hall -226_Block-E2"."""
+    rooms = set()
+    for days in structured.values():
+        for entries in days.values():
+            for e in entries:
+                number, block = room_parts(e.get("room", ""))
+                if number:
+                    rooms.add(number)
+                    if block:
+                        rooms.add(f"{block}-{number}")
+    return sorted(rooms)
+
+
+async def replay(rag, requests, concurrency, client_latencies):
+    queue = asyncio.Queue()
+    for req in requests:
+        queue.put_nowait(req)
+    errors = {}
+
+    async def user():
+        while True:
+            try:
+                req = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                await rag.campus_sathi_router_async(req["query"], req["uid"])
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            client_latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return errors
+
+
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="campussathi-bench-")
+    copied = prepare_workdir(workdir, args.data)
+    fake = FakeOllama(ttft=args.ttft, tokens_per_sec=args.tokens_per_sec, answer_tokens=args.answer_tokens,
+                      intent_latency=args.intent_latency, parallel=args.ollama_parallel).start()
+    os.environ["OLLAMA_BASE_URL"] = fake.url
+    os.environ["EMBED_BACKEND"] = args.embed_backend
+    os.environ.setdefault("SLOW_REQUEST_SECONDS", "1e9")
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+
+    rss_start = rss_mb()
+    with MemorySampler() as memory:
+        start = time.perf_counter()
+        rag = importlib.import_module("FINAL_RAG")
+        import_seconds = time.perf_counter() - start
+        import tracing
+
+        rag.init_db()
+        if "timetable_structured.json" not in copied and "timetable.pdf" in copied:
+            try:
+                rag.timetable_extract.run_extraction(rag.TIMETABLE_PDF_PATH, rag.TIMETABLE_JSON_PATH,
+                                                     progress=lambda *_: None)
+            except RuntimeError as e:
+                print(f"Structured timetable not available: {e}")
+        rag.reload_timetable_structured()
+        sections = sorted(rag.timetable_structured) or SAMPLE_SECTIONS
+        uids = seed_students(rag, args.students, sections)
+        # Fixture setup above is not part of startup: time the import plus the app's own warm-up.
+        start = time.perf_counter()
+        rag.initialize_rag_chain()
+        rag.wait_until_ready()
+        startup = rag.get_readiness()
+        startup_seconds = import_seconds + time.perf_counter() - start
+
+        requests = workload.generate(args.warmup + args.requests, args.seed, uids=uids,
+                                     rooms=structured_rooms(rag.timetable_structured))
+        traces = []
+        recording = threading.Event()
+
+        def on_finish(trace, seconds, outcome):
+            if recording.is_set():
+                with trace._lock:
+                    stages = dict(trace.stages)
+                traces.append({"seconds": seconds, "outcome": outcome, "first_token": trace.first_token,
+                               "intent": trace.attrs.get("intent", "unknown"), "stages": stages})
+
+        client_latencies = []
+
+        async def session():
+            # One event loop for both phases: the LLM admission gate binds to the loop it first runs on.
+            await replay(rag, requests[:args.warmup], args.concurrency, [])
+            recording.set()
+            rss = rss_mb()
+            start = time.perf_counter()
+            errors = await replay(rag, requests[args.warmup:], args.concurrency, client_latencies)
+            duration = time.perf_counter() - start
+            recording.clear()
+            return errors, duration, rss
+
+        tracing.listeners.append(on_finish)
+        try:
+            errors, duration, rss_before_load = asyncio.run(session())
+        finally:
+            tracing.listeners.remove(on_finish)
+    fake.stop()
+
+    stage_names = sorted({s for t in traces for s in t["stages"]})
+    intents = sorted({t["intent"] for t in traces})
+    outcomes = {}
+    for t in traces:
+        outcomes[t["outcome"]] = outcomes.get(t["outcome"], 0) + 1
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline", "out")},
+        "environment": {"python": platform.python_version(), "cpus": os.cpu_count(), "machine": platform.machine()},
+        "knowledge_state": startup.get("state"),
+        "knowledge_error": startup.get("error"),
+        "fixtures": copied,
+        "startup": {"import_seconds": round(import_seconds, 3), "total_seconds": round(startup_seconds, 3),
+                    "components": startup.get("components", {})},
+        "requests": len(client_latencies),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(client_latencies) / duration, 3) if duration else 0.0,
+        "latency": {
+            "total": percentiles(client_latencies),
+            "first_token": percentiles([t["first_token"] for t in traces if t["first_token"] is not None]),
+        },
+        "stages": {s: percentiles([t["stages"][s] for t in traces if s in t["stages"]]) for s in stage_names},
+        "by_intent": {i: percentiles([t["seconds"] for t in traces if t["intent"] == i]) for i in intents},
+        "outcomes": outcomes,
+        "fake_ollama": dict(fake.counters),
+        "memory": {"rss_start_mb": round(rss_start, 1), "rss_before_load_mb": round(rss_before_load, 1),
+                   "rss_peak_mb": round(memory.peak, 1), "rss_end_mb": round(rss_mb(), 1)},
+    }
+    if not args.keep_workdir and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def format_report(report):
+    lines = [
+        f"knowledge: {report['knowledge_state']}" + (f" ({report['knowledge_error']})" if report["knowledge_error"] else ""),
+        f"startup: {report['startup']['total_seconds']}s (import {report['startup']['import_seconds']}s)",
+        f"requests: {report['requests']} in {report['duration_s']}s -> {report['throughput_rps']} req/s, "
+        f"errors: {report['errors'] or 0}",
+        f"memory: peak {report['memory']['rss_peak_mb']} MB RSS",
+        f"{'':<22} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+    ]
+    rows = [("total", report["latency"]["total"]), ("first_token", report["latency"]["first_token"])]
+    rows += [(f"stage:{s}", p) for s, p in report["stages"].items()]
+    rows += [(f"intent:{i}", p) for i, p in report["by_intent"].items()]
+    for name, p in rows:
+        if p:
+            lines.append(f"{name:<22} {p['count']:>6} {p['p50'] * 1000:>9.1f} {p['p95'] * 1000:>9.1f} "
+                         f"{p['p99'] * 1000:>9.1f}")
+    lines.append("outcomes: " + ", ".join(f"{k}={v}" for k, v in sorted(report["outcomes"].items())))
+    return "\n".join(lines)
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Offline CampusSathi pipeline benchmark.")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=20, help="requests run first and not measured")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--ttft", type=float, default=0.25)
+    parser.add_argument("--tokens-per-sec", type=float, default=40.0)
+    parser.add_argument("--answer-tokens", type=int, default=48)
+    parser.add_argument("--intent-latency", type=float, default=0.15)
+    parser.add_argument("--ollama-parallel", type=int, default=1)
+    parser.add_argument("--embed-backend", default="hash", help="hash (offline) or a real backend, e.g. torch")
+    parser.add_argument("--data", default=REPO_ROOT, help="dir with faq.pdf / timetable.pdf / timetable_structured.json")
+    parser.add_argument("--workdir", help="reuse this work dir (kept afterwards)")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--out", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", help="compare against this report; exit 1 on regression")
+    parser.add_argument("--save-baseline", help="also write the report here")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    out = os.path.abspath(args.out)
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    save_baseline = os.path.abspath(args.save_baseline) if args.save_baseline else None
+
+    report = run(args)
+    print(format_report(report))
+    for path in filter(None, (out, save_baseline)):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            rows = compare_mod.compare(report, json.load(f), args.tolerance)
+        print(compare_mod.format_rows(rows))
+        if any(r["regressed"] for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,82 @@
+# bench/workload.py
+# Seeded synthetic chat workload: a mix of timetable, personal and FAQ queries
+# in English, Hindi, Marathi and Marwari, spread over student UIDs (plus guests).
+# Popular FAQ questions repeat, as they do in real traffic.
+#
+#   python -m bench.workload --requests 500 --seed 7 > workload.jsonl
+import argparse
+import json
+import random
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+DAYS_HI = ["सोमवार", "मंगलवार", "बुधवार", "गुरुवार", "शुक्रवार", "शनिवार"]
+DAYS_MR = ["सोमवार", "मंगळवार", "बुधवार", "गुरुवार", "शुक्रवार", "शनिवार"]
+
+TEMPLATES = {
+    "timetable_request": {
+        "en": ["What is my timetable for {day}?", "show my schedule for {day}", "what is my next class",
+               "which class do I have now", "my timetable for this week", "where is room {room}"],
+        "hi": ["मेरा {day_hi} का टाइम टेबल दिखाओ", "मेरी अगली क्लास कौन सी है", "इस हफ्ते का टाइम टेबल बताओ"],
+        "mr": ["माझे {day_mr} चे वेळापत्रक दाखवा", "माझा पुढचा क्लास कोणता आहे"],
+        "mwr": ["म्हारो {day_hi} रो टाइम टेबल बताओ"],
+    },
+    "personal_query": {
+        "en": ["what is my fee status", "what's my HOD contact", "what is my section", "show my admin contact",
+               "is my fee payment due"],
+        "hi": ["मेरी फीस का स्टेटस क्या है", "मेरे HOD का कॉन्टैक्ट बताओ", "मेरा सेक्शन क्या है"],
+        "mr": ["माझी फी भरली आहे का", "माझा सेक्शन कोणता आहे"],
+        "mwr": ["म्हारी फीस रो स्टेटस कांई है"],
+    },
+    "general_faq": {
+        "en": ["When is the library open?", "What is the minimum attendance requirement?",
+               "How do I apply for a hostel room?", "When do the mid-semester exams start?",
+               "Is there a bus facility for day scholars?", "How can I get a bonafide certificate?",
+               "What is the dress code on campus?", "Who won the cricket world cup?"],
+        "hi": ["लाइब्रेरी कब खुलती है?", "न्यूनतम उपस्थिति कितनी चाहिए?", "हॉस्टल के लिए आवेदन कैसे करें?",
+               "परीक्षा कब शुरू होगी?"],
+        "mr": ["ग्रंथालय कधी उघडते?", "वसतिगृहासाठी अर्ज कसा करायचा?"],
+        "mwr": ["लाइब्रेरी कद खुलै है?", "हॉस्टल सारू अरजी कियां करां?"],
+    },
+}
+DEFAULT_MIX = {"timetable_request": 0.35, "personal_query": 0.25, "general_faq": 0.4}
+DEFAULT_LANGUAGES = {"en": 0.55, "hi": 0.25, "mr": 0.12, "mwr": 0.08}
+
+
+def _pick(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def generate(n, seed=7, uids=(), rooms=(), mix=None, languages=None, guest_ratio=0.1, zipf=1.1):
+    """``n`` requests as dicts ``{"query", "uid", "intent", "lang"}``; same arguments, same list."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    languages = languages or DEFAULT_LANGUAGES
+    uids = list(uids) or [None]
+    rooms = list(rooms) or ["B-204"]
+    requests = []
+    for _ in range(n):
+        intent = _pick(rng, mix)
+        lang = _pick(rng, languages)
+        templates = TEMPLATES[intent].get(lang) or TEMPLATES[intent]["en"]
+        # Zipf-like popularity: the first templates of each list are asked most.
+        weights = [1 / (i + 1) ** zipf for i in range(len(templates))]
+        template = rng.choices(templates, weights=weights)[0]
+        d = rng.randrange(len(DAYS))
+        query = template.format(day=DAYS[d], day_hi=DAYS_HI[d], day_mr=DAYS_MR[d], room=rng.choice(rooms))
+        uid = None if rng.random() < guest_ratio else rng.choice(uids)
+        requests.append({"query": query, "uid": uid, "intent": intent, "lang": lang})
+    return requests
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Write a synthetic CampusSathi workload as JSON lines.")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--uids", default="24MCI10030,24MCI10050,24MCI10020", help="comma-separated student UIDs")
+    args = parser.parse_args()
+    for req in generate(args.requests, args.seed, uids=args.uids.split(",")):
+        print(json.dumps(req, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,180 @@
+# bm25_index.py
+# Pure-Python BM25 inverted index over the indexed chunks. It catches exact-token
+# queries (section codes like "24MAM-4", room numbers, faculty names) that dense
+# retrieval handles poorly, and is persisted as JSON next to the Chroma dirs.
+# Given a DocStore it keeps only IDs and postings, and reads chunk text from there.
+import json
+import math
+import os
+import threading
+import unicodedata
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Lexical hits count as confident when the best one reaches this fraction of the
+# query's reference score and beats the runner-up by BM25_CONFIDENT_MARGIN.
+BM25_CONFIDENT_RATIO = float(os.getenv("BM25_CONFIDENT_RATIO", "0.6"))
+BM25_CONFIDENT_MARGIN = float(os.getenv("BM25_CONFIDENT_MARGIN", "1.5"))
+
+_JOINERS = "-/"
+
+
+def tokenize(text):
+    """Lowercased word tokens; joined codes ("24mam-4", "b/204") are kept whole and also split."""
+    chars = []
+    for ch in (text or "").lower():
+        if ch in _JOINERS or unicodedata.category(ch)[0] in "LNM":
+            chars.append(ch)
+        else:
+            chars.append(" ")
+    tokens = []
+    for raw in "".join(chars).split():
+        word = raw.strip(_JOINERS)
+        if not word:
+            continue
+        tokens.append(word)
+        parts = [p for p in word.replace("/", "-").split("-") if p]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """Thread-safe BM25 index of ``id -> (text, metadata)``.
+
+    Only the documents are persisted (just their IDs with a ``store``); postings
+    are rebuilt on load.
+    """
+
+    def __init__(self, path=None, k1=BM25_K1, b=BM25_B, store=None):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.store = store
+        # id -> (text, metadata), or None when the text lives in ``store``.
+        self._docs = {}
+        self._terms = {}
+        self._lengths = {}
+        self._postings = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        index = cls(path, **kwargs)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                index.add_many((doc_id, text, meta) for doc_id, (text, meta) in data.get("docs", {}).items())
+                if index.store is not None and data.get("ids"):
+                    found = index.store.get_many(data["ids"])
+                    index.add_many((doc_id, text, meta) for doc_id, (text, meta) in found.items())
+            except Exception as e:
+                print(f"Error loading BM25 index {path}: {e}")
+        return index
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            if self.store is not None:
+                data = {"ids": sorted(self._docs)}
+            else:
+                data = {"docs": {doc_id: [text, meta] for doc_id, (text, meta) in self._docs.items()}}
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._docs
+
+    def ids(self):
+        with self._lock:
+            return set(self._docs)
+
+    def _add(self, doc_id, text, metadata):
+        if doc_id in self._docs:
+            self._remove(doc_id)
+        counts = {}
+        for tok in tokenize(text):
+            counts[tok] = counts.get(tok, 0) + 1
+        self._docs[doc_id] = None if self.store is not None else (text, metadata or {})
+        self._terms[doc_id] = tuple(counts)
+        self._lengths[doc_id] = sum(counts.values())
+        self._total_length += self._lengths[doc_id]
+        for tok, tf in counts.items():
+            self._postings.setdefault(tok, {})[doc_id] = tf
+
+    def _remove(self, doc_id):
+        del self._docs[doc_id]
+        self._total_length -= self._lengths.pop(doc_id)
+        for tok in self._terms.pop(doc_id):
+            posting = self._postings.get(tok)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[tok]
+
+    def add_many(self, items):
+        """Add or replace ``(id, text, metadata)`` items."""
+        with self._lock:
+            for doc_id, text, metadata in items:
+                self._add(doc_id, text, metadata)
+
+    def remove_many(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._docs:
+                    self._remove(doc_id)
+
+    def document(self, doc_id):
+        """``(text, metadata)`` for ``doc_id``, or None."""
+        if doc_id not in self._docs:
+            return None
+        if self.store is not None:
+            return self.store.get(doc_id)
+        return self._docs[doc_id]
+
+    def _idf(self, tok):
+        n = len(self._postings.get(tok, ()))
+        return math.log(1 + (len(self._docs) - n + 0.5) / (n + 0.5))
+
+    def search(self, query, k=5):
+        """Top ``k`` ``(id, score)`` pairs, plus the query's reference score.
+
+        The reference is what an average-length chunk containing every query term
+        once would score; terms absent from the index still count towards it.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not self._docs or not terms:
+                return [], 0.0
+            avgdl = self._total_length / len(self._docs) or 1.0
+            scores = {}
+            reference = 0.0
+            for tok in terms:
+                idf = self._idf(tok)
+                reference += idf
+                posting = self._postings.get(tok)
+                if not posting:
+                    continue
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        hits = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return hits, reference
+
+    @staticmethod
+    def confident(hits, reference, ratio=BM25_CONFIDENT_RATIO, margin=BM25_CONFIDENT_MARGIN):
+        """True when the top hit matches the query strongly and clearly beats the runner-up."""
+        if not hits or reference <= 0:
+            return False
+        top = hits[0][1]
+        if top < ratio * reference:
+            return False
+        return len(hits) == 1 or top >= margin * hits[1][1]
@@ -0,0 +1,145 @@
+# campus_db.py
+# Shared SQLite access for campus.db: a thread-safe pool of long-lived
+# connections in WAL mode, so request threads neither reconnect per query nor
+# block readers behind a writer.
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# Per-connection cache of compiled statements, keyed by SQL text.
+DB_STATEMENT_CACHE = 256
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    """Bounded pool of sqlite3 connections shared across threads.
+
+    Connections are opened lazily up to ``size``; callers beyond that wait up to
+    ``timeout`` seconds for one to be returned. A ``read_only`` pool opens the
+    file with ``mode=ro``, so it can neither create the file nor write to it.
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, read_only=False):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.read_only = read_only
+        self._reset()
+
+    def _reset(self):
+        # Connections must not cross fork(): a forked worker starts with an empty pool.
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        target = f"{pathlib.Path(self.path).resolve().as_uri()}?mode=ro" if self.read_only else self.path
+        conn = sqlite3.connect(
+            target,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE,
+            uri=self.read_only,
+        )
+        for pragma in _PRAGMAS:
+            # Switching the journal mode is a write; the writer has already set WAL.
+            if self.read_only and pragma.startswith("PRAGMA journal_mode"):
+                continue
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        if self._pid != os.getpid():
+            self._reset()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No database connection available after {self.timeout}s") from None
+
+    def _release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Don't hand a connection in an unknown state to the next caller.
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Connection whose work is committed on success and rolled back on error."""
+        with self.connection() as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def execute(self, sql, params=()):
+        with self.transaction() as conn:
+            cur = conn.execute(sql, params)
+            return cur.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        with self.transaction() as conn:
+            cur = conn.executemany(sql, seq_of_params)
+            return cur.rowcount
+
+    def fetchone(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._opened -= 1
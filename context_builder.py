@@ -0,0 +1,140 @@
+# context_builder.py
+# Context assembly between retrieval and generation. The retriever returns up to
+# 2*k overlapping 500-char chunks (the same FAQ text often arrives from both the
+# English and the Indic side); stuffing all of them into the llama3.1 prompt makes
+# prompt evaluation the slowest step on CPU Ollama. Here they are de-duplicated,
+# adjacent chunks of the same page are stitched back together, and the result is
+# packed in rank order into a token budget.
+import os
+from math import ceil
+
+from intent_classifier import normalize_query
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "700"))
+# Char-shingle Jaccard similarity above which two chunks count as the same text.
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+# Shortest shared tail/head (chars) that marks two chunks as neighbours from the splitter.
+CONTEXT_MIN_OVERLAP = 20
+_MAX_OVERLAP = 200
+_SHINGLE = 5
+SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text):
+    """Rough llama3 token count: ~4 characters per token for ASCII, ~2 for Devanagari."""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 2)
+
+
+class _Piece:
+    __slots__ = ("text", "source", "page", "rank", "normalized", "shingles")
+
+    def __init__(self, text, source, page, rank):
+        self.text = text
+        self.source = source
+        self.page = page
+        self.rank = rank
+        self._index()
+
+    def _index(self):
+        self.normalized = normalize_query(self.text)
+        n = self.normalized
+        self.shingles = {n[i:i + _SHINGLE] for i in range(max(len(n) - _SHINGLE + 1, 1))}
+
+    def set_text(self, text):
+        self.text = text
+        self._index()
+
+
+def _similar(a, b, threshold):
+    if a.normalized in b.normalized or b.normalized in a.normalized:
+        return True
+    union = len(a.shingles | b.shingles)
+    return bool(union) and len(a.shingles & b.shingles) / union >= threshold
+
+
+def _stitch(first, second, min_overlap):
+    """``first + second`` without their shared overlap, or None if ``second`` doesn't continue ``first``."""
+    for k in range(min(len(first), len(second), _MAX_OVERLAP), min_overlap - 1, -1):
+        if first.endswith(second[:k]):
+            return first + second[k:]
+    return None
+
+
+def _neighbours(a, b):
+    if a.source != b.source:
+        return False
+    if a.page is None or b.page is None:
+        return a.page == b.page
+    return abs(a.page - b.page) <= 1
+
+
+def _merge_adjacent(pieces, min_overlap):
+    merged = 0
+    changed = True
+    while changed:
+        changed = False
+        for a in pieces:
+            for b in pieces:
+                if a is b or not _neighbours(a, b):
+                    continue
+                text = _stitch(a.text, b.text, min_overlap)
+                if text is None:
+                    continue
+                a.set_text(text)
+                a.rank = min(a.rank, b.rank)
+                a.page = a.page if b.page is None else min(p for p in (a.page, b.page) if p is not None)
+                pieces.remove(b)
+                merged += 1
+                changed = True
+                break
+            if changed:
+                break
+    return merged
+
+
+def assemble(docs, budget=CONTEXT_TOKEN_BUDGET, dedup_threshold=CONTEXT_DEDUP_THRESHOLD,
+             min_overlap=CONTEXT_MIN_OVERLAP):
+    """Compact prompt context from ranked ``docs``; returns ``(context, report)``.
+
+    Retrieval order is the rank. A near-duplicate keeps the better rank and the
+    longer text; stitched neighbours keep the better rank of the two. Pieces are
+    then added best-first while they fit in ``budget`` tokens (the best one is
+    cut to fit if nothing else would be sent).
+    """
+    pieces = []
+    deduped = 0
+    for rank, doc in enumerate(docs):
+        text = (doc.page_content or "").strip()
+        if not text:
+            continue
+        meta = doc.metadata or {}
+        piece = _Piece(text, meta.get("source"), meta.get("page"), rank)
+        twin = next((p for p in pieces if _similar(p, piece, dedup_threshold)), None)
+        if twin is None:
+            pieces.append(piece)
+            continue
+        deduped += 1
+        if len(piece.text) > len(twin.text):
+            twin.set_text(piece.text)
+    merged = _merge_adjacent(pieces, min_overlap)
+
+    chosen, used_tokens, dropped = [], 0, 0
+    sep_tokens = estimate_tokens(SEPARATOR)
+    for piece in sorted(pieces, key=lambda p: p.rank):
+        cost = estimate_tokens(piece.text) + (sep_tokens if chosen else 0)
+        if used_tokens + cost > budget:
+            dropped += 1
+            continue
+        chosen.append(piece.text)
+        used_tokens += cost
+    if not chosen and pieces:
+        best = min(pieces, key=lambda p: p.rank).text
+        keep = len(best)
+        while keep and estimate_tokens(best[:keep]) > budget:
+            keep = keep * 3 // 4
+        chosen, used_tokens, dropped = [best[:keep]], estimate_tokens(best[:keep]), len(pieces) - 1
+    context = SEPARATOR.join(chosen)
+    report = {"retrieved": len(docs), "deduplicated": deduped, "merged": merged, "used": len(chosen),
+              "dropped_for_budget": dropped, "context_tokens": used_tokens, "budget": budget}
+    return context, report
@@ -0,0 +1,90 @@
+# doc_store.py
+# Content-addressed chunk store shared by the collections of one index version.
+# Chunk text and metadata live here once, keyed by chunk ID (a content hash),
+# and the Chroma collections hold only the per-model vectors for those IDs.
+import json
+import sqlite3
+
+from campus_db import ConnectionPool
+
+DOC_STORE_POOL_SIZE = 4
+# Stay well under SQLite's limit on bound parameters per statement.
+_BATCH = 500
+
+
+def _batches(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), _BATCH):
+        yield ids[i:i + _BATCH]
+
+
+class DocStore:
+    """``chunk ID -> (text, metadata)`` in a WAL-mode SQLite file, safe to share across threads.
+
+    Readers pass ``read_only=True``: the file is opened with ``mode=ro`` and the
+    schema is left to the writer that created it.
+    """
+
+    def __init__(self, path, pool_size=DOC_STORE_POOL_SIZE, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self.pool = ConnectionPool(path, size=pool_size, read_only=read_only)
+        if not read_only:
+            self.pool.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+
+    def __len__(self):
+        return self.pool.fetchone("SELECT COUNT(*) FROM chunks")[0]
+
+    def __contains__(self, doc_id):
+        return self.pool.fetchone("SELECT 1 FROM chunks WHERE id=?", (doc_id,)) is not None
+
+    def ids(self):
+        return {r[0] for r in self.pool.fetchall("SELECT id FROM chunks")}
+
+    def put_many(self, items):
+        """Store ``(id, text, metadata)`` items; IDs already present are left as they are."""
+        rows = [(doc_id, text or "", json.dumps(metadata or {}, ensure_ascii=False)) for doc_id, text, metadata in items]
+        if rows:
+            self.pool.executemany("INSERT OR IGNORE INTO chunks (id, text, metadata) VALUES (?, ?, ?)", rows)
+
+    def get_many(self, ids):
+        """``{id: (text, metadata)}`` for the IDs that are stored."""
+        found = {}
+        for batch in _batches(ids):
+            marks = ",".join("?" * len(batch))
+            for doc_id, text, metadata in self.pool.fetchall(
+                    f"SELECT id, text, metadata FROM chunks WHERE id IN ({marks})", batch):
+                found[doc_id] = (text, json.loads(metadata))
+        return found
+
+    def get(self, doc_id):
+        return self.get_many([doc_id]).get(doc_id)
+
+    def missing(self, ids):
+        ids = set(ids)
+        present = set()
+        for batch in _batches(ids):
+            marks = ",".join("?" * len(batch))
+            present.update(r[0] for r in self.pool.fetchall(f"SELECT id FROM chunks WHERE id IN ({marks})", batch))
+        return ids - present
+
+    def retain(self, keep_ids):
+        """Delete every chunk not in ``keep_ids``; returns how many were deleted."""
+        stale = self.ids() - set(keep_ids)
+        for batch in _batches(stale):
+            self.pool.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+        return len(stale)
+
+    def backup(self, path):
+        """Consistent copy of the store at ``path`` (for building a new index version)."""
+        dst = sqlite3.connect(path)
+        try:
+            with self.pool.connection() as src:
+                src.backup(dst)
+        finally:
+            dst.close()
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,249 @@
+# embedding_backends.py
+# Selectable inference backend for the sentence-transformer embedders:
+#   torch       fp32 PyTorch (the original setup)
+#   torch-int8  PyTorch with dynamic int8 quantization of the Linear layers
+#   onnx        ONNX Runtime export of the fp32 model
+#   onnx-int8   ONNX Runtime with a dynamically quantized int8 export
+#   hash        deterministic feature-hashing stand-in, no model download
+#               (offline benchmarks and smoke runs only; answers are not meaningful)
+# ONNX exports are written once under EMBED_MODEL_DIR and reused on later starts.
+#
+# Switching backends changes the vectors. The index manifest records the model
+# and backend each collection was embedded with, and the next index sync embeds
+# every chunk again when they differ. Run the parity check below before
+# switching to see how far the retrieval results move:
+#   python embedding_backends.py parity --backend onnx-int8 --k 5
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_MODEL_DIR = os.getenv("EMBED_MODEL_DIR", "./models")
+# arm64 | avx2 | avx512 | avx512_vnni, matching the serving CPUs.
+EMBED_ONNX_QCONFIG = os.getenv("EMBED_ONNX_QCONFIG", "avx2")
+EMBED_HASH_DIM = int(os.getenv("EMBED_HASH_DIM", "384"))
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# model name -> backend actually in use (a failed export falls back to torch).
+loaded_backends = {}
+
+
+def export_dir(model_name, cache_dir=EMBED_MODEL_DIR):
+    return os.path.join(cache_dir, model_name.replace("/", "__"), "onnx")
+
+
+def ensure_onnx_export(model_name, quantize=False, cache_dir=EMBED_MODEL_DIR, qconfig=EMBED_ONNX_QCONFIG):
+    """Export ``model_name`` to ONNX (and optionally int8) once; returns ``(model_dir, onnx_file)``."""
+    from sentence_transformers import SentenceTransformer
+    local = export_dir(model_name, cache_dir)
+    if not os.path.exists(os.path.join(local, "onnx", "model.onnx")):
+        print(f"Exporting {model_name} to ONNX in {local} ...")
+        SentenceTransformer(model_name, backend="onnx").save_pretrained(local)
+    if not quantize:
+        return local, "onnx/model.onnx"
+    file_name = f"onnx/model_qint8_{qconfig}.onnx"
+    if not os.path.exists(os.path.join(local, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        print(f"Quantizing {model_name} ONNX export to int8 ({qconfig}) ...")
+        export_dynamic_quantized_onnx_model(SentenceTransformer(local, backend="onnx"), qconfig, local)
+    return local, file_name
+
+
+class HashEmbeddings(Embeddings):
+    """Unit vectors from signed feature hashing of word tokens and their character trigrams.
+
+    Same text, same vector, in any process; similar wording lands close together.
+    """
+
+    def __init__(self, model_name="hash", dim=EMBED_HASH_DIM):
+        self.model_name = model_name
+        self.dim = dim
+
+    def _features(self, text):
+        from bm25_index import tokenize
+        for tok in tokenize(text):
+            yield tok
+            padded = f"#{tok}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def _load(model_name, backend, cache_dir):
+    if backend == "hash":
+        return HashEmbeddings(model_name)
+    from langchain_huggingface import HuggingFaceEmbeddings
+    if backend == "torch":
+        return HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "torch-int8":
+        import torch
+        embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        torch.quantization.quantize_dynamic(embeddings._client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return embeddings
+    if backend in ("onnx", "onnx-int8"):
+        local, file_name = ensure_onnx_export(model_name, quantize=backend == "onnx-int8", cache_dir=cache_dir)
+        return HuggingFaceEmbeddings(
+            model_name=local, model_kwargs={"backend": "onnx", "model_kwargs": {"file_name": file_name}})
+    raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(BACKENDS)} or hash)")
+
+
+def load_embeddings(model_name, backend=EMBED_BACKEND, cache_dir=EMBED_MODEL_DIR, fallback=True):
+    """HuggingFaceEmbeddings for ``model_name`` on ``backend``.
+
+    With ``fallback`` a backend that fails to load (missing optimum/onnxruntime,
+    unsupported architecture) falls back to fp32 torch instead of failing startup.
+    """
+    try:
+        embeddings = _load(model_name, backend, cache_dir)
+    except Exception as e:
+        if not fallback or backend == "torch":
+            raise
+        print(f"Embedding backend {backend} failed for {model_name} ({e}); falling back to torch")
+        backend = "torch"
+        embeddings = _load(model_name, backend, cache_dir)
+    loaded_backends[model_name] = backend
+    return embeddings
+
+
+# ---------- Parity check ----------
+def _normalize(vectors):
+    m = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def _top_k(queries, docs, k):
+    sims = queries @ docs.T
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+def recall_at_k(reference, candidate):
+    """Mean overlap of two top-k ID matrices, as a fraction of k."""
+    k = reference.shape[1]
+    return float(np.mean([len(set(r) & set(c)) / k for r, c in zip(reference, candidate)]))
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def parity_report(model_name, corpus, queries, backend, k=5, cache_dir=EMBED_MODEL_DIR):
+    """Compare ``backend`` against fp32 torch on ``corpus`` chunks and ``queries``.
+
+    ``recall_at_k`` re-embeds both sides with the candidate; ``mixed_recall_at_k``
+    is candidate queries against fp32 documents, i.e. switching without reindexing.
+    """
+    baseline = load_embeddings(model_name, "torch", cache_dir, fallback=False)
+    candidate = load_embeddings(model_name, backend, cache_dir, fallback=False)
+    k = min(k, len(corpus))
+
+    docs_ref, docs_ref_s = _timed(baseline.embed_documents, corpus)
+    docs_new, docs_new_s = _timed(candidate.embed_documents, corpus)
+    q_ref, q_ref_s = _timed(lambda qs: [baseline.embed_query(q) for q in qs], queries)
+    q_new, q_new_s = _timed(lambda qs: [candidate.embed_query(q) for q in qs], queries)
+    docs_ref, docs_new, q_ref, q_new = map(_normalize, (docs_ref, docs_new, q_ref, q_new))
+
+    reference = _top_k(q_ref, docs_ref, k)
+    return {
+        "model": model_name, "backend": backend, "k": k,
+        "corpus": len(corpus), "queries": len(queries),
+        "recall_at_k": round(recall_at_k(reference, _top_k(q_new, docs_new, k)), 4),
+        "mixed_recall_at_k": round(recall_at_k(reference, _top_k(q_new, docs_ref, k)), 4),
+        "query_ms_fp32": round(1000 * q_ref_s / len(queries), 2),
+        "query_ms": round(1000 * q_new_s / len(queries), 2),
+        "index_s_fp32": round(docs_ref_s, 2),
+        "index_s": round(docs_new_s, 2),
+    }
+
+
+def _indexed_chunks(paths, key, collection_name):
+    """Texts of the chunks in ``collection_name``: from the doc store, else (older indexes) from Chroma."""
+    import index_sync
+    ids = sorted(index_sync.manifest_ids(index_sync.load_manifest(paths["manifest"]), collection_name))
+    if ids and os.path.exists(paths["docs"]):
+        from doc_store import DocStore
+        store = DocStore(paths["docs"], read_only=True)
+        try:
+            found = store.get_many(ids)
+        finally:
+            store.close()
+        if found:
+            return [found[i][0] for i in ids if i in found and found[i][0]]
+    import chromadb
+    client = chromadb.PersistentClient(path=paths[key])
+    return [d for d in client.get_collection(collection_name).get(include=["documents"])["documents"] if d]
+
+
+def _logged_queries(db_path, limit):
+    import sqlite3
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT DISTINCT query FROM query_logs WHERE query != '' ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Export embedding backends and check them against fp32.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("export", "parity"):
+        p = sub.add_parser(name)
+        p.add_argument("--backend", choices=BACKENDS, default=EMBED_BACKEND)
+        p.add_argument("--model", choices=("eng", "indic", "all"), default="all")
+    parity = sub.choices["parity"]
+    parity.add_argument("--k", type=int, default=5)
+    parity.add_argument("--queries", type=int, default=200, help="max queries (from query_logs, else chunk openings)")
+    parity.add_argument("--corpus", type=int, default=0, help="max indexed chunks to use (0 = all)")
+    args = parser.parse_args()
+
+    import FINAL_RAG as rag
+    models = rag.EMBEDDING_MODELS if args.model == "all" else {args.model: rag.EMBEDDING_MODELS[args.model]}
+    if args.command == "export":
+        for name in models.values():
+            load_embeddings(name, args.backend, fallback=False)
+            print(f"{name}: {args.backend} ready")
+        return
+
+    _, paths = rag.current_index_version()
+    collections = {"eng": "English_Collection", "indic": "Indic_Collection"}
+    logged = _logged_queries(rag.DB_PATH, args.queries)
+    for key, name in models.items():
+        corpus = _indexed_chunks(paths, key, collections[key])
+        if args.corpus:
+            corpus = corpus[:args.corpus]
+        if not corpus:
+            print(f"{name}: no indexed chunks in {paths[key]}, skipping")
+            continue
+        queries = logged or [" ".join(c.split()[:12]) for c in corpus[:args.queries]]
+        report = parity_report(name, corpus, queries, args.backend, k=args.k)
+        print(" ".join(f"{field}={value}" for field, value in report.items()))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,129 @@
+# embedding_service.py
+# Micro-batching front for the embedding models: query embeddings requested by
+# concurrent threads/coroutines are gathered for a few ms and encoded in one
+# forward pass instead of one transformer call per request.
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "1") != "0"
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class EmbeddingBatcher(Embeddings):
+    """Wraps an ``Embeddings`` instance and batches its ``embed_query`` calls.
+
+    ``embed_documents`` (indexing) passes straight through; it is already batched.
+    Async callers use the base ``aembed_query``, which runs ``embed_query`` in an
+    executor thread and so joins the same batches.
+    Queries are encoded with ``embed_documents``, so models configured with
+    query-specific encode kwargs (``query_encode_kwargs``) are not batched.
+    """
+
+    def __init__(self, inner, name="embeddings", max_batch=EMBED_MAX_BATCH,
+                 max_wait_ms=EMBED_MAX_WAIT_MS, enabled=EMBED_BATCHING):
+        self.inner = inner
+        self.name = name
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.enabled = enabled and not getattr(inner, "query_encode_kwargs", None)
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._counters = dict.fromkeys(["requests", "batches", "failed"], 0)
+        self._size_hist = dict.fromkeys(BATCH_SIZE_BUCKETS + (float("inf"),), 0)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._encode_total = 0.0
+
+    def _ensure_worker(self):
+        if self._pid != os.getpid():
+            # Forked worker (serve_multi.py): start its own queue and thread.
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            self._lock = threading.Lock()
+            self._thread = None
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"embed-batcher-{self.name}", daemon=True)
+                self._thread.start()
+
+    def _submit(self, text) -> Future:
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future, time.monotonic()))
+        return future
+
+    def _collect(self):
+        """Block for the first query, then gather more until the batch is full or due."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            try:
+                vectors = self.inner.embed_documents([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                self._record(batch, started, failed=True)
+                continue
+            self._record(batch, started)
+            for (_, future, _), vec in zip(batch, vectors):
+                future.set_result(vec)
+
+    def _record(self, batch, started, failed=False):
+        now = time.monotonic()
+        bucket = next(b for b in self._size_hist if len(batch) <= b)
+        with self._lock:
+            self._counters["requests"] += len(batch)
+            self._counters["batches"] += 1
+            self._counters["failed"] += len(batch) if failed else 0
+            self._size_hist[bucket] += 1
+            self._encode_total += now - started
+            for _, _, queued_at in batch:
+                wait = started - queued_at
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+
+    def embed_query(self, text: str) -> List[float]:
+        if not self.enabled:
+            return self.inner.embed_query(text)
+        return self._submit(text).result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests, batches = self._counters["requests"], self._counters["batches"]
+            return {
+                **self._counters,
+                "enabled": self.enabled,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_size": round(requests / batches, 2) if batches else 0.0,
+                "batch_size_hist": {("+Inf" if b == float("inf") else str(b)): n for b, n in self._size_hist.items()},
+                "avg_queue_wait_ms": round(1000 * self._wait_total / requests, 3) if requests else 0.0,
+                "max_queue_wait_ms": round(1000 * self._wait_max, 3),
+                "avg_encode_ms": round(1000 * self._encode_total / batches, 3) if batches else 0.0,
+            }
@@ -0,0 +1,292 @@
+# index_sync.py
+# Incremental Chroma indexing: chunks get stable content-hash IDs, a manifest
+# records which IDs each source contributed to each collection, and a refresh
+# only embeds new chunks and deletes the ones that disappeared. With a DocStore
+# the chunk text and metadata go there once and Chroma keeps only the vectors.
+# The manifest also records the embedding model and backend of each collection;
+# when that changes, every chunk in the collection is embedded again.
+import hashlib
+import json
+import os
+
+ADD_BATCH_SIZE = 256
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_id(source_key, text):
+    return hashlib.sha256(f"{source_key}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading index manifest {path}: {e}")
+    return {"collections": {}}
+
+
+def save_manifest(path, manifest):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+
+def manifest_entry(manifest, collection_name, source_key):
+    return manifest.setdefault("collections", {}).setdefault(collection_name, {}).get(source_key)
+
+
+def is_current(manifest, collection_name, source_key, sha):
+    entry = manifest_entry(manifest, collection_name, source_key)
+    return bool(entry) and entry.get("sha256") == sha
+
+
+def embedding_changed(manifest, collection_name, fingerprint):
+    """Record ``fingerprint`` (model and backend) for the collection; True if it replaces another.
+
+    A manifest written before fingerprints were recorded is assumed to match.
+    """
+    recorded = manifest.setdefault("embeddings", {})
+    previous = recorded.get(collection_name)
+    recorded[collection_name] = fingerprint
+    return previous is not None and previous != fingerprint
+
+
+def reembed_collection(vs, store=None):
+    """Replace every vector in ``vs`` with one from its current embeddings; returns the count.
+
+    Text is read back from Chroma, or from ``store`` for chunks that keep only
+    their vector there. All vectors are computed before the collection is
+    touched, and it is then recreated empty, since another model may produce
+    vectors of another size.
+    """
+    data = vs.get(include=["documents", "metadatas"])
+    rows = list(zip(data["ids"], data["documents"], data["metadatas"]))
+    if store is not None:
+        store.put_many(row for row in rows if row[1] is not None)
+        found = store.get_many([doc_id for doc_id, _, _ in rows])
+        rows = [(doc_id, *found[doc_id]) for doc_id, _, _ in rows if doc_id in found]
+    else:
+        rows = [row for row in rows if row[1] is not None]
+    vectors = []
+    for i in range(0, len(rows), ADD_BATCH_SIZE):
+        vectors.extend(vs.embeddings.embed_documents([text for _, text, _ in rows[i:i + ADD_BATCH_SIZE]]))
+
+    old = vs._collection
+    vs._client.delete_collection(old.name)
+    vs._collection = vs._client.get_or_create_collection(name=old.name, embedding_function=None,
+                                                         metadata=old.metadata)
+    for i in range(0, len(rows), ADD_BATCH_SIZE):
+        batch = rows[i:i + ADD_BATCH_SIZE]
+        ids = [doc_id for doc_id, _, _ in batch]
+        if store is not None:
+            vs._collection.upsert(ids=ids, embeddings=vectors[i:i + ADD_BATCH_SIZE])
+        else:
+            vs._collection.upsert(ids=ids, embeddings=vectors[i:i + ADD_BATCH_SIZE],
+                                  documents=[text for _, text, _ in batch], metadatas=[meta for _, _, meta in batch])
+    return len(rows)
+
+
+def copy_collection(src, dst, batch_size=ADD_BATCH_SIZE):
+    """Copy every row of ``src`` (IDs, vectors, text, metadata) into ``dst``; returns the count.
+
+    Rows are read through ``src``'s client, so the copy sees what the live
+    process sees, unlike a file copy of a Chroma dir that is still open.
+    Nothing is re-embedded.
+    """
+    total = src._collection.count()
+    copied = 0
+    for offset in range(0, total, batch_size):
+        data = src._collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if not data["ids"]:
+            break
+        kwargs = {"ids": data["ids"], "embeddings": data["embeddings"]}
+        # Collections backed by a DocStore keep no text or metadata in Chroma.
+        if any(d is not None for d in data["documents"]):
+            kwargs["documents"] = data["documents"]
+        if any(m for m in data["metadatas"]):
+            kwargs["metadatas"] = data["metadatas"]
+        dst._collection.upsert(**kwargs)
+        copied += len(data["ids"])
+    return copied
+
+
+def existing_ids(vs, ids):
+    found = set()
+    ids = list(ids)
+    for i in range(0, len(ids), ADD_BATCH_SIZE):
+        found.update(vs.get(ids=ids[i:i + ADD_BATCH_SIZE], include=[])["ids"])
+    return found
+
+
+def add_chunks(vs, ids, docs, store=None):
+    """Embed ``docs`` into ``vs``; with ``store`` only IDs and vectors go to Chroma."""
+    if store is None:
+        vs.add_documents(docs, ids=ids)
+        return
+    store.put_many((i, doc.page_content, doc.metadata) for i, doc in zip(ids, docs))
+    vs._collection.upsert(ids=ids, embeddings=vs.embeddings.embed_documents([doc.page_content for doc in docs]))
+
+
+def sync_source(vs, collection_name, manifest, source_key, chunks, sha=None, verify=False, lexical=None,
+                store=None):
+    """Bring ``source_key``'s chunks in ``vs`` in line with ``chunks``.
+
+    ``chunks`` may be any iterable and is consumed once: new chunks are embedded
+    in batches of ADD_BATCH_SIZE as they arrive, so only their IDs are kept.
+    Returns ``{"added", "removed", "skipped"}`` counts. With ``verify`` the
+    collection is checked for IDs the manifest claims but that are missing.
+    ``lexical`` (a BM25Index) receives the same adds and deletes. Chunk text is
+    written to ``store`` when given; it is never deleted here, since other
+    collections may share it (see ``prune_store``).
+    """
+    entry = manifest_entry(manifest, collection_name, source_key) or {}
+    old_ids = set(entry.get("ids", []))
+    ids, seen = [], set()
+    pending, unverified = {}, {}
+    added = 0
+
+    def flush_pending():
+        nonlocal added
+        batch = list(pending)
+        add_chunks(vs, batch, [pending[i] for i in batch], store)
+        if lexical is not None:
+            lexical.add_many((i, pending[i].page_content, pending[i].metadata) for i in batch)
+        added += len(batch)
+        pending.clear()
+
+    def flush_unverified():
+        present = existing_ids(vs, unverified)
+        pending.update((i, doc) for i, doc in unverified.items() if i not in present)
+        if store is not None:
+            store.put_many((i, doc.page_content, doc.metadata) for i, doc in unverified.items() if i in present)
+        if lexical is not None:
+            lexical.add_many((i, doc.page_content, doc.metadata) for i, doc in unverified.items()
+                             if i in present and i not in lexical)
+        unverified.clear()
+
+    for doc in chunks:
+        i = chunk_id(source_key, doc.page_content)
+        if i in seen:
+            continue
+        seen.add(i)
+        ids.append(i)
+        if i not in old_ids:
+            pending[i] = doc
+        elif verify:
+            unverified[i] = doc
+        elif lexical is not None and i not in lexical:
+            lexical.add_many([(i, doc.page_content, doc.metadata)])
+        if len(unverified) >= ADD_BATCH_SIZE:
+            flush_unverified()
+        if len(pending) >= ADD_BATCH_SIZE:
+            flush_pending()
+    if unverified:
+        flush_unverified()
+    if pending:
+        flush_pending()
+
+    to_remove = sorted(old_ids - seen)
+    for i in range(0, len(to_remove), ADD_BATCH_SIZE):
+        vs.delete(ids=to_remove[i:i + ADD_BATCH_SIZE])
+    if lexical is not None:
+        lexical.remove_many(to_remove)
+    manifest["collections"][collection_name][source_key] = {"sha256": sha, "ids": ids}
+    return {"added": added, "removed": len(to_remove), "skipped": len(ids) - added}
+
+
+def skip_source(manifest, collection_name, source_key):
+    entry = manifest_entry(manifest, collection_name, source_key) or {}
+    return {"added": 0, "removed": 0, "skipped": len(entry.get("ids", []))}
+
+
+def drop_untracked(vs, collection_name, manifest, keep_sources=()):
+    """Delete chunks a pre-manifest build added with random IDs (first run only).
+
+    Chunks whose ``source`` metadata is in ``keep_sources`` are left alone.
+    """
+    if manifest.setdefault("collections", {}).get(collection_name):
+        return 0
+    try:
+        data = vs.get(include=["metadatas"])
+    except Exception as e:
+        print(f"Could not inspect {collection_name} for untracked chunks: {e}")
+        return 0
+    stale = [i for i, m in zip(data["ids"], data["metadatas"]) if (m or {}).get("source") not in keep_sources]
+    for i in range(0, len(stale), ADD_BATCH_SIZE):
+        vs.delete(ids=stale[i:i + ADD_BATCH_SIZE])
+    manifest["collections"].setdefault(collection_name, {})
+    return len(stale)
+
+
+def manifest_ids(manifest, collection_name=None):
+    """IDs the manifest lists for one collection, or for all of them."""
+    collections = manifest.get("collections", {})
+    names = [collection_name] if collection_name else list(collections)
+    ids = set()
+    for name in names:
+        for entry in collections.get(name, {}).values():
+            ids.update(entry.get("ids", []))
+    return ids
+
+
+def collection_ids(vs):
+    return set(vs.get(include=[])["ids"])
+
+
+def backfill_store(vs, store, ids=None):
+    """Copy chunks the collection indexed before the DocStore existed into ``store``.
+
+    That is every ID in the collection (``ids``, else all of them), including
+    legacy chunks the manifest does not track, such as approved answers kept by
+    ``drop_untracked``. Their text is read back from Chroma once; nothing is
+    re-embedded.
+    """
+    missing = sorted(store.missing(collection_ids(vs) if ids is None else ids))
+    for i in range(0, len(missing), ADD_BATCH_SIZE):
+        data = vs.get(ids=missing[i:i + ADD_BATCH_SIZE], include=["documents", "metadatas"])
+        store.put_many((doc_id, text, meta) for doc_id, text, meta in
+                       zip(data["ids"], data["documents"], data["metadatas"]) if text is not None)
+    return len(missing)
+
+
+def prune_store(manifest, store, keep_ids=()):
+    """Drop chunks no collection references any more: neither the manifest nor ``keep_ids``
+    (the IDs actually in the collections, which covers untracked legacy chunks)."""
+    return store.retain(manifest_ids(manifest) | set(keep_ids))
+
+
+def reconcile_lexical(vs, collection_name, manifest, lexical, store=None):
+    """Make ``lexical`` hold exactly the chunks the manifest lists for the collection.
+
+    Covers a missing or stale BM25 file (e.g. the first start after upgrading);
+    missing chunks are read from ``store`` (else back from Chroma), nothing is re-embedded.
+    """
+    expected = manifest_ids(manifest, collection_name)
+    have = lexical.ids()
+    lexical.remove_many(have - expected)
+    missing = sorted(expected - have)
+    for i in range(0, len(missing), ADD_BATCH_SIZE):
+        batch = missing[i:i + ADD_BATCH_SIZE]
+        if store is not None:
+            found = store.get_many(batch)
+            lexical.add_many((doc_id, text, meta) for doc_id, (text, meta) in found.items())
+        else:
+            data = vs.get(ids=batch, include=["documents", "metadatas"])
+            lexical.add_many(zip(data["ids"], data["documents"], data["metadatas"]))
+    return len(missing), len(have - expected)
+
+
+def format_report(report):
+    return "; ".join(
+        f"{name}: +{r['added']} -{r['removed']} ={r['skipped']}" for name, r in report.items()
+    )
@@ -0,0 +1,125 @@
+# ingestion.py
+# PDF ingestion for the indexes: pages are parsed and split in a process pool,
+# and the resulting chunks are cached on disk (JSONL) keyed by file hash and
+# splitter settings, so unchanged files are never re-parsed. Chunks are read
+# back lazily, so callers can stream them into embedding in batches.
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from langchain_core.documents import Document
+
+INGEST_CACHE_DIR = os.getenv("INGEST_CACHE_DIR", "./ingest_cache")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "8"))
+# Below this many pages the pool's startup cost outweighs the parallelism.
+INGEST_PARALLEL_MIN_PAGES = int(os.getenv("INGEST_PARALLEL_MIN_PAGES", "16"))
+# Bump when page parsing or chunk metadata changes, to invalidate old caches.
+INGEST_FORMAT = 1
+# Workers are spawned, not forked: ingestion runs from refresh threads while other
+# threads hold locks (DB pool, log writer, embedders) that a forked child would inherit.
+INGEST_MP_CONTEXT = os.getenv("INGEST_MP_CONTEXT", "spawn")
+
+
+def cache_key(sha, splitter_settings):
+    raw = json.dumps({"sha256": sha, "splitter": splitter_settings, "format": INGEST_FORMAT}, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def _cache_path(path, key, cache_dir):
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{key}.jsonl")
+
+
+def _parse_pages(path, start, stop, splitter_settings):
+    """Worker: text of pages [start, stop) split into ``(text, metadata)`` chunks.
+
+    Metadata matches what PyPDFLoader + split_documents produced before.
+    """
+    from pypdf import PdfReader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    reader = PdfReader(path)
+    splitter = RecursiveCharacterTextSplitter(**splitter_settings)
+    out = []
+    for i in range(start, stop):
+        page = Document(page_content=reader.pages[i].extract_text() or "", metadata={"source": path, "page": i})
+        out.extend((doc.page_content, doc.metadata) for doc in splitter.split_documents([page]))
+    return out
+
+
+def _page_count(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+class CachedChunks:
+    """Re-iterable view of a cached chunk file; each pass streams Documents from disk."""
+
+    def __init__(self, path, count):
+        self.path = path
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                yield Document(page_content=row["text"], metadata=row["metadata"])
+
+
+def cached_chunks(path, splitter_settings, sha=None, cache_dir=INGEST_CACHE_DIR, workers=INGEST_WORKERS):
+    """Chunks of the PDF at ``path``, parsed at most once per (file hash, splitter settings)."""
+    if sha is None:
+        from index_sync import file_sha256
+        sha = file_sha256(path)
+    key = cache_key(sha, splitter_settings)
+    target = _cache_path(path, key, cache_dir)
+    if os.path.exists(target):
+        with open(target, "r", encoding="utf-8") as f:
+            return CachedChunks(target, sum(1 for _ in f))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    pages = _page_count(path)
+    ranges = [(s, min(s + INGEST_PAGES_PER_TASK, pages)) for s in range(0, pages, INGEST_PAGES_PER_TASK)]
+    tmp = f"{target}.{os.getpid()}.tmp"
+    count = 0
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            if workers > 1 and pages >= INGEST_PARALLEL_MIN_PAGES:
+                with ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=multiprocessing.get_context(INGEST_MP_CONTEXT)) as pool:
+                    # map() yields in page order while later ranges are still parsing.
+                    results = pool.map(_parse_pages, *zip(*[(path, s, e, splitter_settings) for s, e in ranges]))
+                    for chunks in results:
+                        count += _write(f, chunks)
+            else:
+                for s, e in ranges:
+                    count += _write(f, _parse_pages(path, s, e, splitter_settings))
+        os.replace(tmp, target)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _prune(path, target, cache_dir)
+    print(f"Ingested {os.path.basename(path)}: {pages} pages -> {count} chunks")
+    return CachedChunks(target, count)
+
+
+def _write(f, chunks):
+    for text, metadata in chunks:
+        f.write(json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False) + "\n")
+    return len(chunks)
+
+
+def _prune(path, keep, cache_dir):
+    """Drop cached chunk files of older versions of the same file."""
+    prefix = f"{os.path.basename(path)}."
+    for name in os.listdir(cache_dir):
+        full = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and name.endswith(".jsonl") and full != keep:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
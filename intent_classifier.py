@@ -0,0 +1,239 @@
+# intent_classifier.py
+# Tiered intent classification for campus_sathi_router:
+#   tier 1 "rules": compiled multilingual keyword/regex scorer
+#   tier 2 "ngram": char-n-gram similarity against labelled example queries
+#   tier 3 "llm":   qwen:7b, only when the first two tiers are not confident
+# When two intents both match strong rules (e.g. "my timetable is wrong"), the
+# n-gram tier only breaks the tie for a near-verbatim example; otherwise the
+# LLM decides, since surface similarity favours the wrong one there.
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+INTENTS = ("timetable_request", "personal_query", "general_faq")
+DEFAULT_INTENT = "general_faq"
+
+# (pattern, weight) per intent. Patterns are matched against the normalized query.
+_RULES = {
+    "timetable_request": [
+        (r"\btime ?table\b|\bschedule\b|\broutine\b", 3.0),
+        (r"\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", 2.0),
+        (r"\b(today|tomorrow|tmrw|day after tomorrow)\b", 1.0),
+        (r"\bnext (class|lecture|period)\b|\b(lecture|period)s?\b", 2.0),
+        (r"\bwhich room\b|\bwhere is (my )?(class|lecture)\b|\broom \w+ now\b", 2.0),
+        (r"\b(somvar|mangalvar|budhvar|guruvar|shukravar|shanivar|ravivar)\b", 2.0),
+        (r"\b(aaj|kal|parso)\b.*\b(class|classes|lecture|period)\b", 2.0),
+        (r"समय ?सारणी|समय ?सारिणी|टाइम ?टेबल|वेळापत्रक|कक्षा|लेक्चर|पीरियड", 3.0),
+        (r"सोमवार|मंगलवार|मंगळवार|बुधवार|गुरुवार|शुक्रवार|शनिवार|रविवार", 2.0),
+        (r"आज|कल|उद्या|काल", 0.5),
+    ],
+    "personal_query": [
+        (r"\bfees?\b|\bpayment\b|\bdues?\b", 2.5),
+        (r"\bhod\b|\bhead of (the )?department\b", 3.0),
+        (r"\bnationality\b|\b(international|domestic) student\b", 3.0),
+        (r"\bmy (section|department|nationality|admin|hod|fees?|details|uid)\b", 2.0),
+        (r"\badmin (contact|email|office)\b|\badmission (contact|office)\b", 2.0),
+        (r"\b(email|contact|phone|number)\b", 0.5),
+        (r"\b(meri|mera|mere|maza|mazi|mharo|mhari)\b", 0.5),
+        (r"फीस|शुल्क|भुगतान|एचओडी|विभागाध्यक्ष|राष्ट्रीयता|सेक्शन|विभाग", 2.5),
+        (r"मेरी|मेरा|मेरे|माझी|माझा|म्हारो|म्हारी", 0.5),
+    ],
+    "general_faq": [
+        (r"\blibrary\b|\bhostel\b|\bcanteen\b|\bmess\b|\btransport\b|\bbus\b", 2.5),
+        (r"\bscholarship\b|\bholiday\b|\bplacement\b|\bexam(ination)?s?\b|\bsyllabus\b", 2.0),
+        (r"\badmission process\b|\bhow (to|do i|can i)\b|\bprocess\b|\bpolicy\b|\brules?\b", 1.5),
+        # Fee *amounts* are the same for everyone; a student's own fee status is personal.
+        (r"\b(admission|hostel|exam(ination)?|tuition|course|semester|bus|transport|mess|registration) fees?\b"
+         r"|\bfees? (structure|amount)\b", 4.0),
+        (r"\b(open|close|opens|closes|timings?|hours)\b", 1.0),
+        # Complaints / questions *about* the timetable are FAQ, not a timetable lookup.
+        (r"\b(mistake|wrong|error|incorrect|missing|not in|isn'?t in|not showing)\b", 4.5),
+        (r"\bwhy\b", 1.5),
+        (r"पुस्तकालय|लाइब्रेरी|छात्रावास|हॉस्टल|कैंटीन|छात्रवृत्ति|परीक्षा|छुट्टी|ग्रंथालय|वसतिगृह", 2.5),
+        (r"गलत|गलती|क्यों|नहीं है|चूक|का नाही", 3.0),
+    ],
+}
+
+# Labelled examples for the n-gram tier (kept in sync with the LLM prompt examples).
+_EXAMPLES = {
+    "timetable_request": [
+        "what is my schedule tomorrow", "show my timetable", "my classes on monday",
+        "timetable for friday", "what is my next class", "where is room 101 now",
+        "kal ka timetable", "aaj meri classes kya hai", "मेरा टाइम टेबल दिखाओ",
+        "कल की कक्षाएं", "माझे वेळापत्रक", "म्हारो टाइम टेबल",
+    ],
+    "personal_query": [
+        "fees due date", "hod email", "what is my fee status", "is my fee paid",
+        "my section", "hod contact", "admin contact", "am i international or domestic",
+        "meri fees kitni baki hai", "मेरी फीस की स्थिति", "एचओडी का नंबर", "माझी फी",
+    ],
+    "general_faq": [
+        "when is the library open", "the timetable has a mistake",
+        "why is my class not in the timetable", "hostel fees structure for new students",
+        "how to apply for scholarship", "exam dates", "canteen timings",
+        "admission process", "what is the admission fee", "my timetable is wrong",
+        "पुस्तकालय कब खुलता है", "छात्रवृत्ति के लिए आवेदन",
+        "library kab khulti hai", "ग्रंथालय वेळ",
+    ],
+}
+
+_SPACE_RE = re.compile(r"\s+")
+_KEEP_CHARS = {"'", "-"}
+
+
+def normalize_query(text: str) -> str:
+    # Keep letters, digits and combining marks (Devanagari matras are category M).
+    text = unicodedata.normalize("NFC", text or "").lower()
+    text = "".join(
+        ch if ch in _KEEP_CHARS or unicodedata.category(ch)[0] in "LNM" else " "
+        for ch in text
+    )
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _char_ngrams(text: str, n: int = 3) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(max(len(padded) - n + 1, 0)))
+
+
+def _cosine(a: Counter, a_norm: float, b: Counter, b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0) for k, v in a.items()) / (a_norm * b_norm)
+
+
+class IntentClassifier:
+    """Rule + n-gram intent classifier with an optional LLM fallback.
+
+    ``llm_classify`` is a ``str -> str`` callable returning one of ``INTENTS``
+    (``allm_classify`` is its coroutine counterpart for the async path); it is
+    only called when neither local tier is confident. Its errors fall back to
+    ``DEFAULT_INTENT``, except the exception types in ``reraise`` (e.g. the
+    router's Overloaded), which propagate. Counts of which tier decided each
+    query are available from ``stats()``.
+    """
+
+    def __init__(self, llm_classify=None, allm_classify=None, rule_min_score=2.0, rule_min_margin=1.5,
+                 ngram_min_sim=0.45, ngram_min_margin=0.08, ngram_tie_min_sim=0.85, reraise=()):
+        self.llm_classify = llm_classify
+        self.allm_classify = allm_classify
+        self.reraise = tuple(reraise)
+        self.rule_min_score = rule_min_score
+        self.rule_min_margin = rule_min_margin
+        self.ngram_min_sim = ngram_min_sim
+        self.ngram_min_margin = ngram_min_margin
+        self.ngram_tie_min_sim = ngram_tie_min_sim
+        self._rules = {
+            intent: [(re.compile(p), w) for p, w in rules]
+            for intent, rules in _RULES.items()
+        }
+        self._examples = []
+        for intent, examples in _EXAMPLES.items():
+            for ex in examples:
+                grams = _char_ngrams(normalize_query(ex))
+                self._examples.append((intent, grams, math.sqrt(sum(v * v for v in grams.values()))))
+        self._lock = threading.Lock()
+        self._tiers = Counter()
+        self._intents = Counter()
+
+    def rule_scores(self, normalized: str) -> dict:
+        return {
+            intent: sum(w for rx, w in rules if rx.search(normalized))
+            for intent, rules in self._rules.items()
+        }
+
+    def ngram_scores(self, normalized: str) -> dict:
+        grams = _char_ngrams(normalized)
+        norm = math.sqrt(sum(v * v for v in grams.values()))
+        best = dict.fromkeys(INTENTS, 0.0)
+        for intent, ex_grams, ex_norm in self._examples:
+            sim = _cosine(grams, norm, ex_grams, ex_norm)
+            if sim > best[intent]:
+                best[intent] = sim
+        return best
+
+    @staticmethod
+    def _top_two(scores: dict):
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked[0][0], ranked[0][1], ranked[1][1]
+
+    def classify_local(self, query: str):
+        """Return ``(intent, tier)`` from the local tiers, or ``(None, None)``."""
+        normalized = normalize_query(query)
+        if not normalized:
+            return DEFAULT_INTENT, "rules"
+        intent, top, second = self._top_two(self.rule_scores(normalized))
+        if top >= self.rule_min_score and top - second >= self.rule_min_margin:
+            return intent, "rules"
+        # Two intents with strong rule matches: a near-tie the n-gram tier may only
+        # settle with a near-verbatim example, else it goes to the LLM.
+        rules_tied = second >= self.rule_min_score
+        intent, top, second = self._top_two(self.ngram_scores(normalized))
+        min_sim = self.ngram_tie_min_sim if rules_tied else self.ngram_min_sim
+        if top >= min_sim and top - second >= self.ngram_min_margin:
+            return intent, "ngram"
+        return None, None
+
+    def classify_with_tier(self, query: str):
+        intent, tier = self.classify_local(query)
+        if intent is None:
+            intent, tier = self._classify_llm(query)
+        self._record(intent, tier)
+        return intent, tier
+
+    async def aclassify_with_tier(self, query: str):
+        intent, tier = self.classify_local(query)
+        if intent is None:
+            intent, tier = await self._aclassify_llm(query)
+        self._record(intent, tier)
+        return intent, tier
+
+    def classify(self, query: str) -> str:
+        return self.classify_with_tier(query)[0]
+
+    @staticmethod
+    def _parse_llm(response):
+        response = (response or "").strip()
+        return (response if response in INTENTS else DEFAULT_INTENT), "llm"
+
+    def _classify_llm(self, query: str):
+        if self.llm_classify is None:
+            return DEFAULT_INTENT, "default"
+        try:
+            return self._parse_llm(self.llm_classify(query))
+        except self.reraise:
+            raise
+        except Exception as e:
+            print(f"Intent classification failed: {e}")
+            return DEFAULT_INTENT, "llm_error"
+
+    async def _aclassify_llm(self, query: str):
+        if self.allm_classify is None:
+            return DEFAULT_INTENT, "default"
+        try:
+            return self._parse_llm(await self.allm_classify(query))
+        except self.reraise:
+            raise
+        except Exception as e:
+            print(f"Intent classification failed: {e!r}")
+            return DEFAULT_INTENT, "llm_error"
+
+    def _record(self, intent, tier):
+        with self._lock:
+            self._tiers[tier] += 1
+            self._intents[intent] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self._tiers.values())
+            llm_calls = self._tiers["llm"] + self._tiers["llm_error"]
+            return {
+                "total": total,
+                "by_tier": dict(self._tiers),
+                "by_intent": dict(self._intents),
+                "llm_skipped": total - llm_calls,
+            }
@@ -0,0 +1,158 @@
+# knowledge.py
+# Immutable knowledge snapshots swapped atomically under live traffic, plus a
+# tiny background job runner for the admin refresh.
+import itertools
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+
+@dataclass(frozen=True, eq=False)
+class KnowledgeSnapshot:
+    """Everything a request needs from the knowledge base, never mutated after build.
+
+    ``paths`` holds the Chroma directories and manifest this snapshot was built from.
+    """
+    version: str
+    paths: MappingProxyType
+    stores: MappingProxyType
+    rag_chain: object = None
+    created_at: float = field(default_factory=time.time)
+
+
+class SnapshotManager:
+    """Holds the current snapshot and retires old ones once in-flight requests drain.
+
+    ``on_retire(snapshot)`` runs exactly once per replaced snapshot, after its
+    last ``acquire()`` has exited.
+    """
+
+    def __init__(self, on_retire=None):
+        self.on_retire = on_retire
+        self._current = None
+        self._inflight = {}
+        self._retired = set()
+        self._lock = threading.Lock()
+
+    def current(self):
+        return self._current
+
+    @contextmanager
+    def acquire(self):
+        with self._lock:
+            snap = self._current
+            if snap is not None:
+                self._inflight[id(snap)] = self._inflight.get(id(snap), 0) + 1
+        try:
+            yield snap
+        finally:
+            if snap is not None:
+                self._release(snap)
+
+    def _release(self, snap):
+        with self._lock:
+            left = self._inflight[id(snap)] - 1
+            if left:
+                self._inflight[id(snap)] = left
+                return
+            del self._inflight[id(snap)]
+            if snap not in self._retired:
+                return
+            self._retired.discard(snap)
+        self._retire(snap)
+
+    def swap(self, snap):
+        with self._lock:
+            old, self._current = self._current, snap
+            if old is None or old is snap:
+                return old
+            if self._inflight.get(id(old)):
+                self._retired.add(old)
+                return old
+        self._retire(old)
+        return old
+
+    def _retire(self, snap):
+        if self.on_retire is None:
+            return
+        try:
+            self.on_retire(snap)
+        except Exception as e:
+            print(f"Error retiring knowledge snapshot {snap.version}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            cur = self._current
+            return {
+                "version": cur.version if cur else None,
+                "in_flight": self._inflight.get(id(cur), 0) if cur else 0,
+                "draining": sorted(s.version for s in self._retired),
+            }
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, name):
+        self.id = next(self._ids)
+        self.name = name
+        self.status = "queued"
+        self.progress = []
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def report(self, message):
+        print(f"[{self.name} #{self.id}] {message}")
+        self.progress.append((time.time(), message))
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id, "name": self.name, "status": self.status,
+            "progress": [m for _, m in self.progress], "result": self.result, "error": self.error,
+            "started_at": self.started_at, "finished_at": self.finished_at,
+        }
+
+
+class JobRunner:
+    """Runs one job per name at a time in a background thread."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, name, fn, *args, **kwargs):
+        """Start ``fn(job, *args, **kwargs)``, or return the job already running under ``name``."""
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is not None and job.status in ("queued", "running"):
+                return job
+            job = self._jobs[name] = Job(name)
+        threading.Thread(target=self._run, args=(job, fn, args, kwargs), name=f"job-{name}", daemon=True).start()
+        return job
+
+    def active(self, name):
+        """The job queued or running under ``name``, or None."""
+        with self._lock:
+            job = self._jobs.get(name)
+            return job if job is not None and job.status in ("queued", "running") else None
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "succeeded"
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, name):
+        return self._jobs.get(name)
@@ -0,0 +1,65 @@
+# llm_clients.py
+# Ollama generation clients. There is one OllamaLLM per model for the whole
+# process. Each holds pooled keep-alive HTTP connections (sync and async), and
+# every request carries keep_alive, so Ollama keeps the model and its prompt
+# cache resident between questions instead of unloading it after its default
+# 5 minutes. preload() loads models at startup; residency() reports what is
+# loaded (GET /api/ps).
+import os
+import threading
+
+import httpx
+import ollama
+from langchain_ollama import OllamaLLM
+
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "8"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def client_kwargs():
+    # No read timeout: generations are bounded by the router's own timeouts.
+    return {
+        "timeout": httpx.Timeout(None, connect=OLLAMA_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(max_connections=OLLAMA_POOL_SIZE, max_keepalive_connections=OLLAMA_POOL_SIZE,
+                               keepalive_expiry=300),
+    }
+
+
+def get_llm(model, base_url, **options):
+    """The process-wide OllamaLLM for ``model`` (and ``options``), created on first use."""
+    key = (model, base_url, tuple(sorted(options.items())))
+    with _lock:
+        if key not in _clients:
+            _clients[key] = OllamaLLM(model=model, base_url=base_url, keep_alive=OLLAMA_KEEP_ALIVE,
+                                      client_kwargs=client_kwargs(), **options)
+        return _clients[key]
+
+
+def _admin_client(base_url):
+    return ollama.Client(host=base_url, **client_kwargs())
+
+
+def preload(model, base_url, prompt=None):
+    """Load ``model`` into memory for OLLAMA_KEEP_ALIVE. With ``prompt`` it is also
+    evaluated once (one token generated), which fills Ollama's prompt cache with it."""
+    client = _admin_client(base_url)
+    client.generate(model=model, prompt="", keep_alive=OLLAMA_KEEP_ALIVE)
+    if prompt:
+        client.generate(model=model, prompt=prompt, keep_alive=OLLAMA_KEEP_ALIVE, options={"num_predict": 1})
+
+
+def residency(base_url):
+    """Models Ollama currently holds in memory, with their size, VRAM share and unload time."""
+    models = []
+    for m in _admin_client(base_url).ps().models:
+        models.append({
+            "name": m.name or m.model,
+            "size_mb": round((m.size or 0) / 2**20),
+            "vram_mb": round((m.size_vram or 0) / 2**20),
+            "expires_at": m.expires_at.isoformat() if m.expires_at else None,
+        })
+    return models
@@ -0,0 +1,161 @@
+# log_writer.py
+# Background writer for query_logs / unanswered_queries: rows are queued by the
+# request path and written by one thread in batched executemany transactions.
+import atexit
+import os
+import queue
+import threading
+import time
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+# "block": wait up to LOG_BLOCK_TIMEOUT for room, then drop; "drop": drop immediately when full.
+# Rows submitted with durable=True are never dropped: when they cannot be queued
+# they are written synchronously on the caller's thread instead.
+LOG_BACKPRESSURE = os.getenv("LOG_BACKPRESSURE", "drop")
+LOG_BLOCK_TIMEOUT = float(os.getenv("LOG_BLOCK_TIMEOUT", "0.05"))
+
+_STOP = object()
+
+
+class BatchedLogWriter:
+    """Queue-backed writer that batches ``(sql, params)`` rows into one transaction.
+
+    A batch is written when it reaches ``batch_size`` rows or ``flush_interval``
+    seconds after its first row, whichever comes first.
+    """
+
+    def __init__(self, pool, max_queue=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, policy=LOG_BACKPRESSURE,
+                 block_timeout=LOG_BLOCK_TIMEOUT):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.max_queue = max_queue
+        self._start()
+        atexit.register(self.close)
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._cond = threading.Condition()
+        self._counters = dict.fromkeys(
+            ["enqueued", "written", "dropped", "failed", "batches", "written_sync", "failed_sync"], 0)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql, params, durable=False) -> bool:
+        """Queue one row; returns False if it was dropped under backpressure.
+
+        A ``durable`` row that cannot be queued is written synchronously instead.
+        """
+        if self._pid != os.getpid():
+            # Forked worker: the parent's thread did not survive the fork.
+            self._start()
+        if self._closed:
+            return self._write_sync(sql, params) if durable else self._drop()
+        try:
+            if self.policy == "block":
+                self._queue.put((sql, params), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((sql, params))
+        except queue.Full:
+            return self._write_sync(sql, params) if durable else self._drop()
+        self._count("enqueued")
+        return True
+
+    def _drop(self):
+        self._count("dropped")
+        return False
+
+    def _write_sync(self, sql, params):
+        try:
+            with self.pool.transaction() as conn:
+                conn.execute(sql, params)
+        except Exception as e:
+            print(f"Log writer failed to write a durable row: {e}")
+            self._count("failed_sync")
+            return False
+        self._count("written_sync")
+        return True
+
+    def _count(self, name, n=1):
+        with self._cond:
+            self._counters[name] += n
+            self._cond.notify_all()
+
+    def _collect(self):
+        """Block for the first row, then gather more until the batch is full or due."""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write(self, batch):
+        # Group by statement, keeping arrival order within each statement.
+        grouped = {}
+        for sql, params in batch:
+            grouped.setdefault(sql, []).append(params)
+        try:
+            with self.pool.transaction() as conn:
+                for sql, rows in grouped.items():
+                    conn.executemany(sql, rows)
+        except Exception as e:
+            print(f"Log writer failed to write {len(batch)} rows: {e}")
+            self._count("failed", len(batch))
+            return
+        with self._cond:
+            self._counters["written"] += len(batch)
+            self._counters["batches"] += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def flush(self, timeout=5.0) -> bool:
+        """Wait until every row queued so far has been written (or failed)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            target = self._counters["enqueued"]
+            while self._counters["written"] + self._counters["failed"] < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Stop accepting rows, drain what is queued and stop the thread."""
+        if self._closed or self._pid != os.getpid():
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {**self._counters, "queue_depth": self._queue.qsize(), "policy": self.policy}
@@ -0,0 +1,135 @@
+# mmap_index.py
+# Read-only, memory-mapped export of the Chroma collections for multi-process
+# serving. The writer process exports every collection's IDs and vectors into a
+# numbered generation dir and then flips LATEST; reader processes np.load() the
+# vectors with mmap_mode="r", so all workers share one copy through the page
+# cache and never open Chroma (or its SQLite) themselves.
+import json
+import os
+import shutil
+
+import numpy as np
+
+MMAP_KEEP_GENERATIONS = int(os.getenv("MMAP_KEEP_GENERATIONS", "3"))
+_LATEST = "LATEST"
+_BATCH = 1024
+
+
+def _generations(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if name.startswith("g") and name[1:].isdigit())
+
+
+def latest_generation(root):
+    """Name of the generation readers should map, or None before the first export."""
+    try:
+        with open(os.path.join(root, _LATEST), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return name if name and os.path.isdir(os.path.join(root, name)) else None
+
+
+def _collection_vectors(vs):
+    ids, vectors = [], []
+    total = vs._collection.count()
+    for offset in range(0, total, _BATCH):
+        data = vs._collection.get(include=["embeddings"], limit=_BATCH, offset=offset)
+        ids.extend(data["ids"])
+        vectors.extend(np.asarray(e, dtype=np.float32) for e in data["embeddings"])
+    return ids, (np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32))
+
+
+def export_collections(collections, root, keep=MMAP_KEEP_GENERATIONS):
+    """Write ``{name: vectorstore}`` as a new generation under ``root``; returns its name.
+
+    Older generations beyond ``keep`` are deleted; readers that still map one
+    keep working, since unlinked files stay readable while mapped.
+    """
+    os.makedirs(root, exist_ok=True)
+    existing = _generations(root)
+    name = f"g{int(existing[-1][1:]) + 1 if existing else 1:06d}"
+    tmp = os.path.join(root, f".{name}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for collection_name, vs in collections.items():
+        if vs is None:
+            continue
+        ids, vectors = _collection_vectors(vs)
+        np.save(os.path.join(tmp, f"{collection_name}.npy"), vectors)
+        with open(os.path.join(tmp, f"{collection_name}.ids.json"), "w", encoding="utf-8") as f:
+            json.dump(ids, f)
+    os.replace(tmp, os.path.join(root, name))
+    pointer = os.path.join(root, _LATEST)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(pointer + ".tmp", pointer)
+    for old in _generations(root)[:-keep]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return name
+
+
+class MmapCollection:
+    """The subset of a chromadb Collection the retrievers use (count/query/get), over mapped vectors.
+
+    Distances are squared L2, as in Chroma's default space, so rankings match.
+    """
+
+    def __init__(self, vectors, ids):
+        self._vectors = vectors
+        self._ids = ids
+        self._rows = {doc_id: i for i, doc_id in enumerate(ids)}
+        self._sq_norms = np.einsum("ij,ij->i", vectors, vectors) if len(ids) else np.zeros(0, dtype=np.float32)
+
+    @classmethod
+    def load(cls, generation_dir, collection_name):
+        path = os.path.join(generation_dir, f"{collection_name}.npy")
+        if not os.path.exists(path):
+            return cls(np.zeros((0, 0), dtype=np.float32), [])
+        with open(os.path.join(generation_dir, f"{collection_name}.ids.json"), "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        return cls(np.load(path, mmap_mode="r"), ids)
+
+    def count(self):
+        return len(self._ids)
+
+    def query(self, query_embeddings, n_results=10, include=()):
+        out = {"ids": [], "distances": [], "embeddings": [] if "embeddings" in include else None}
+        for q in query_embeddings:
+            if not self._ids:
+                out["ids"].append([])
+                out["distances"].append([])
+                if out["embeddings"] is not None:
+                    out["embeddings"].append([])
+                continue
+            q = np.asarray(q, dtype=np.float32)
+            dist = self._sq_norms - 2.0 * (self._vectors @ q) + float(q @ q)
+            n = min(n_results, len(dist))
+            top = np.argpartition(dist, n - 1)[:n] if n else np.zeros(0, dtype=int)
+            top = top[np.argsort(dist[top])]
+            out["ids"].append([self._ids[i] for i in top])
+            out["distances"].append(dist[top].tolist())
+            if out["embeddings"] is not None:
+                out["embeddings"].append([np.asarray(self._vectors[i]) for i in top])
+        return out
+
+    def get(self, ids=None, include=()):
+        rows = [(doc_id, self._rows[doc_id]) for doc_id in (ids if ids is not None else self._ids)
+                if doc_id in self._rows]
+        out = {"ids": [doc_id for doc_id, _ in rows]}
+        if "embeddings" in include:
+            out["embeddings"] = [np.asarray(self._vectors[i]) for _, i in rows]
+        return out
+
+
+class MmapVectorStore:
+    """Read-only stand-in for a LangChain Chroma store: ``_collection`` plus its ``embeddings``."""
+
+    def __init__(self, collection, embeddings):
+        self._collection = collection
+        self.embeddings = embeddings
+
+    @classmethod
+    def load(cls, generation_dir, collection_name, embeddings):
+        return cls(MmapCollection.load(generation_dir, collection_name), embeddings)
@@ -0,0 +1,177 @@
+# response_cache.py
+# Semantic cache for general_faq answers: exact match on the normalized query,
+# then nearest-neighbour over the embeddings of cached queries. A semantic hit
+# must also ask for the same answer language (the API's "Please answer in X."
+# prefix), since a question worded alike in another language is close in
+# embedding space but needs a different answer.
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from intent_classifier import normalize_query
+
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+_LANGUAGE_HINT_RE = re.compile(r"^\s*please answer in ([^.]+)\.", re.IGNORECASE)
+
+
+def answer_language(query):
+    """The language a "Please answer in X." prefix asks for (lowercase), or None."""
+    m = _LANGUAGE_HINT_RE.match(query)
+    return m.group(1).strip().lower() if m else None
+
+
+class _Entry:
+    __slots__ = ("key", "response", "vector", "language", "expires_at", "size")
+
+    def __init__(self, key, response, vector, language, expires_at):
+        self.key = key
+        self.response = response
+        self.vector = vector
+        self.language = language
+        self.expires_at = expires_at
+        self.size = len(key.encode("utf-8")) + len(response.encode("utf-8")) + (vector.nbytes if vector is not None else 0)
+
+
+class SemanticResponseCache:
+    """LRU + TTL response cache with an embedding nearest-neighbour fallback.
+
+    ``embed_fn`` maps a query string to a vector; it is optional, and without it
+    only exact (normalized) matches hit. Memory is bounded by both
+    ``max_entries`` and an estimate of ``max_bytes``.
+    """
+
+    def __init__(self, embed_fn=None, threshold=RESPONSE_CACHE_THRESHOLD,
+                 max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 ttl=RESPONSE_CACHE_TTL):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._matrix = None
+        self._matrix_keys = []
+        self._matrix_languages = []
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ["exact_hits", "semantic_hits", "misses", "evictions", "expirations", "invalidations"], 0)
+
+    def _embed(self, text):
+        if self.embed_fn is None:
+            return None
+        try:
+            vec = np.asarray(self.embed_fn(text), dtype=np.float32)
+        except Exception as e:
+            print(f"Response cache embedding failed: {e}")
+            return None
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else None
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            self._matrix = None
+
+    def _purge_expired(self, now):
+        expired = [k for k, e in self._entries.items() if e.expires_at <= now]
+        for k in expired:
+            self._drop(k)
+        self._counters["expirations"] += len(expired)
+
+    def _nearest(self, vector, language):
+        if self._matrix is None:
+            rows = [(k, e.vector, e.language) for k, e in self._entries.items() if e.vector is not None]
+            self._matrix_keys = [k for k, _, _ in rows]
+            self._matrix_languages = np.array([lang for _, _, lang in rows], dtype=object)
+            self._matrix = np.vstack([v for _, v, _ in rows]) if rows else None
+        if self._matrix is None:
+            return None, 0.0
+        sims = np.where(self._matrix_languages == language, self._matrix @ vector, -np.inf)
+        idx = int(np.argmax(sims))
+        if sims[idx] == -np.inf:
+            return None, 0.0
+        return self._matrix_keys[idx], float(sims[idx])
+
+    def get(self, query):
+        """Return ``(response, kind)`` with kind ``"exact"``/``"semantic"``, or ``(None, None)``."""
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._counters["exact_hits"] += 1
+                return entry.response, "exact"
+            if entry is not None:
+                self._drop(key)
+                self._counters["expirations"] += 1
+            has_vectors = any(e.vector is not None for e in self._entries.values())
+        # Embed the query as typed so the vector is shared with retrieval's query-embedding LRU.
+        vector = self._embed(query) if has_vectors else None
+        with self._lock:
+            if vector is not None:
+                self._purge_expired(now)
+                near_key, sim = self._nearest(vector, answer_language(query))
+                if near_key is not None and sim >= self.threshold:
+                    self._entries.move_to_end(near_key)
+                    self._counters["semantic_hits"] += 1
+                    return self._entries[near_key].response, "semantic"
+            self._counters["misses"] += 1
+        return None, None
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def put(self, query, response, generation=None):
+        """Cache ``response``; pass the ``generation`` read before computing it so
+        answers produced from a since-invalidated knowledge base are discarded."""
+        key = normalize_query(query)
+        if not key or not response:
+            return
+        if generation is None:
+            generation = self._generation
+        vector = self._embed(query)
+        with self._lock:
+            if generation != self._generation:
+                # The knowledge base changed while this answer was being produced.
+                return
+            self._drop(key)
+            entry = _Entry(key, response, vector, answer_language(query), time.monotonic() + self.ttl)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._matrix = None
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._matrix = None
+            self._generation += 1
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["exact_hits"] + self._counters["semantic_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
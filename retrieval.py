@@ -0,0 +1,201 @@
+# retrieval.py
+# Dense retrieval over the English + Indic collections that embeds each query
+# once per model and filters on the Qwen vectors Chroma already stores, instead
+# of EnsembleRetriever + EmbeddingsFilter re-embedding the query and every hit,
+# and the hybrid retriever that fuses it with the BM25 index.
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from tracing import span
+
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024"))
+RRF_C = int(os.getenv("HYBRID_RRF_C", "60"))
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", "0.5"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.5"))
+# Answer from BM25 alone when its top hit is confident (exact codes, room numbers).
+HYBRID_SKIP_DENSE = os.getenv("HYBRID_SKIP_DENSE", "1") != "0"
+
+
+class QueryEmbeddingCache:
+    """LRU of query vectors keyed by ``(model_key, text)``."""
+
+    def __init__(self, max_entries=QUERY_EMBED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, model_key, embeddings, text):
+        key = (model_key, text)
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return vec
+            self.misses += 1
+        vec = embeddings.embed_query(text)
+        with self._lock:
+            self._data[key] = vec
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return vec
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+def rrf_scores(ranked_lists, weights, c=RRF_C):
+    """Weighted reciprocal-rank fusion of ranked ID lists -> ``{id: score}``."""
+    scores = {}
+    for ids, weight in zip(ranked_lists, weights):
+        for rank, doc_id in enumerate(ids, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (rank + c)
+    return scores
+
+
+def _as_matrix(vectors):
+    return np.asarray([np.asarray(v, dtype=np.float32) for v in vectors], dtype=np.float32)
+
+
+def _cosine(matrix, vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    denom = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    denom[denom == 0] = 1.0
+    return (matrix @ vector) / denom
+
+
+class SharedEmbeddingRetriever(BaseRetriever):
+    """Weighted reciprocal-rank fusion of the dense collections plus a Qwen similarity filter.
+
+    ``sources`` is a list of ``(model_key, vectorstore, embeddings, weight)``. The
+    first source must be the one whose vectors the filter uses (English / Qwen).
+    With a ``store`` (DocStore) hit text and metadata are read from it, since
+    the collections then hold only vectors.
+    """
+
+    sources: List[Any]
+    query_cache: Any
+    store: Any = None
+    k: int = 5
+    similarity_threshold: Optional[float] = 0.7
+
+    def _query(self, vs, vector, n):
+        count = vs._collection.count()
+        if not count:
+            return []
+        include = ["embeddings"] if self.store is not None else ["documents", "metadatas", "embeddings"]
+        res = vs._collection.query(query_embeddings=[vector], n_results=min(n, count), include=include)
+        ids = res["ids"][0]
+        embs = res.get("embeddings")
+        embs = embs[0] if embs is not None else [None] * len(ids)
+        if self.store is None:
+            return list(zip(ids, res["documents"][0], res["metadatas"][0], embs))
+        found = self.store.get_many(ids)
+        return [(i, *found[i], e) for i, e in zip(ids, embs) if i in found]
+
+    def filter_vectors(self, ids, hits_by_source):
+        """Filter-model vectors for ``ids``: from the filter collection's hits, else stored vectors."""
+        filter_key = self.sources[0][0]
+        vectors = {i: e for i, _, _, e in hits_by_source.get(filter_key, []) if e is not None}
+        missing = [i for i in ids if i not in vectors]
+        if missing:
+            got = self.sources[0][1]._collection.get(ids=missing, include=["embeddings"])
+            embs = got.get("embeddings")
+            if embs is not None:
+                vectors.update({i: e for i, e in zip(got["ids"], embs) if e is not None})
+        return vectors
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        query_vectors = {}
+        hits_by_source = {}
+        docs = {}
+        for model_key, vs, embeddings, _ in self.sources:
+            with span("query_embedding"):
+                vec = self.query_cache.embed(model_key, embeddings, query)
+            query_vectors[model_key] = vec
+            with span("vector_search"):
+                hits = self._query(vs, vec, self.k)
+            hits_by_source[model_key] = hits
+            for doc_id, text, meta, _ in hits:
+                docs.setdefault(doc_id, Document(page_content=text or "", metadata=meta or {}, id=doc_id))
+        scores = rrf_scores(
+            [[h[0] for h in hits_by_source[key]] for key, *_ in self.sources], [s[3] for s in self.sources])
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        if not ranked or self.similarity_threshold is None:
+            return [docs[i] for i in ranked]
+
+        filter_key, _, filter_embeddings, _ = self.sources[0]
+        with span("similarity_filter"):
+            vectors = self.filter_vectors(ranked, hits_by_source)
+            unvectored = [i for i in ranked if i not in vectors]
+            if unvectored:
+                # Chunks the filter collection doesn't hold (e.g. pre-manifest approvals): embed them directly.
+                vectors.update(zip(unvectored, filter_embeddings.embed_documents(
+                    [docs[i].page_content for i in unvectored])))
+            sims = _cosine(_as_matrix([vectors[i] for i in ranked]), query_vectors[filter_key])
+        kept = []
+        for doc_id, sim in zip(ranked, sims):
+            if sim >= self.similarity_threshold:
+                docs[doc_id].metadata = {**docs[doc_id].metadata, "query_similarity": float(sim)}
+                kept.append(docs[doc_id])
+        return kept
+
+
+class HybridRetriever(BaseRetriever):
+    """RRF fusion of the BM25 index and the dense retriever.
+
+    When ``skip_dense`` is set and the lexical top hit is confident, dense search
+    (and its query embeddings) is skipped entirely. Either side may be None.
+    """
+
+    lexical: Any = None
+    dense: Any = None
+    k: int = 5
+    lexical_weight: float = HYBRID_LEXICAL_WEIGHT
+    dense_weight: float = HYBRID_DENSE_WEIGHT
+    rrf_c: int = RRF_C
+    skip_dense: bool = HYBRID_SKIP_DENSE
+
+    def _lexical_docs(self, hits):
+        docs = []
+        for doc_id, score in hits:
+            found = self.lexical.document(doc_id)
+            if found is not None:
+                text, meta = found
+                docs.append(Document(page_content=text, metadata={**meta, "bm25_score": round(score, 4)}, id=doc_id))
+        return docs
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with span("retrieval"):
+            return self._retrieve(query, run_manager)
+
+    def _retrieve(self, query, run_manager):
+        lexical_docs = []
+        if self.lexical is not None and len(self.lexical):
+            with span("bm25"):
+                hits, reference = self.lexical.search(query, self.k)
+                lexical_docs = self._lexical_docs(hits)
+            if lexical_docs and (self.dense is None or (self.skip_dense and self.lexical.confident(hits, reference))):
+                return lexical_docs
+        if self.dense is None:
+            return lexical_docs
+        dense_docs = self.dense.invoke(query, config={"callbacks": run_manager.get_child()})
+        if not lexical_docs:
+            return dense_docs
+
+        docs = {d.id: d for d in lexical_docs}
+        docs.update({d.id: d for d in dense_docs})
+        scores = rrf_scores([[d.id for d in dense_docs], [d.id for d in lexical_docs]],
+                            [self.dense_weight, self.lexical_weight], c=self.rrf_c)
+        # Same bound as two fused top-k lists.
+        return [docs[i] for i in sorted(scores, key=scores.get, reverse=True)[:2 * self.k]]
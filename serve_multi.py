@@ -0,0 +1,113 @@
+# serve_multi.py
+# Pre-fork launcher: N API worker processes on one port, each a CAMPUS_ROLE=reader.
+# Models are loaded once in the parent and shared copy-on-write with the workers;
+# the vector indexes are memory-mapped from the writer's exports (mmap_index.py),
+# so extra workers cost little memory. Knowledge changes (approvals, refreshes,
+# uploads) go through a single writer process, e.g. the admin app:
+#
+#   CAMPUS_ROLE=writer python FINAL_RAG.py
+#   CAMPUS_WORKERS=4 PORT=8000 python serve_multi.py
+import os
+
+os.environ["CAMPUS_ROLE"] = "reader"
+# Tokenizer thread pools do not survive fork().
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+CAMPUS_WORKERS = int(os.getenv("CAMPUS_WORKERS", "2"))
+THREADS_PER_WORKER = int(os.getenv("THREADS_PER_WORKER", str(max(1, (os.cpu_count() or 1) // max(CAMPUS_WORKERS, 1)))))
+RESPAWN_DELAY = 1.0
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Load the embedding models in the parent so every worker shares their pages.
+
+    Nothing here may open the DB or start threads that the workers need: those are
+    created per process after the fork.
+    """
+    import admin_rag
+    start = time.perf_counter()
+    try:
+        admin_rag.get_embeddings()
+    except Exception as e:
+        # Workers retry on their own and serve DB/timetable answers meanwhile.
+        print(f"Preloading embedding models failed: {e}")
+    print(f"Preloaded models in {time.perf_counter() - start:.1f}s")
+
+
+def run_worker(sock):
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(THREADS_PER_WORKER)
+    import api_server
+    api_server.rag_module_future()
+    config = uvicorn.Config(api_server.app, log_level=os.getenv("LOG_LEVEL", "info"))
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock):
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(sock)
+        except BaseException as e:
+            print(f"Worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    print(f"Started worker {pid}")
+    return pid
+
+
+def main():
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    sock = bind_socket(host, port)
+    preload()
+    workers = {spawn(sock) for _ in range(CAMPUS_WORKERS)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"Serving on {host}:{port} with {CAMPUS_WORKERS} workers")
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited ({status}); restarting")
+            time.sleep(RESPAWN_DELAY)
+            workers.add(spawn(sock))
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# singleflight.py
+# Coalescing of identical in-flight work: while one caller (the leader) computes
+# a key, later callers with the same key share its result instead of starting
+# their own. Streams are shared chunk by chunk, so followers see the answer as
+# soon as the leader does. Works for threads (Gradio) and the event loop (API)
+# alike; coalescing is per process.
+import asyncio
+import threading
+
+import tracing
+
+
+class Flight:
+    """One in-flight computation: the chunks produced so far, then done (or an error)."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.followers = 0
+        self._cond = threading.Condition()
+        self._async_waiters = []
+
+    def _wake(self):
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+        self._async_waiters.clear()
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._wake()
+
+    def close(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._wake()
+
+    def follow(self):
+        """Every chunk from the first, blocking for new ones; re-raises the leader's error."""
+        seen = 0
+        while True:
+            with self._cond:
+                while seen == len(self.chunks) and not self.done:
+                    self._cond.wait()
+                pending, done, error = self.chunks[seen:], self.done, self.error
+            seen += len(pending)
+            yield from pending
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    async def afollow(self):
+        loop = asyncio.get_running_loop()
+        seen = 0
+        while True:
+            event = None
+            with self._cond:
+                pending, done, error = self.chunks[seen:], self.done, self.error
+                if not pending and not done:
+                    event = asyncio.Event()
+                    self._async_waiters.append((loop, event))
+            if event is not None:
+                await event.wait()
+                continue
+            seen += len(pending)
+            for chunk in pending:
+                yield chunk
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """Table of in-flight keys. ``stats()`` counts leaders (runs started) and coalesced callers."""
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(["leaders", "coalesced"], 0)
+
+    def _join(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self._counters["coalesced"] += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self._counters["leaders"] += 1
+            return flight, True
+
+    def _land(self, key, flight, error=None):
+        # Unlisted first, so callers arriving from now on start a fresh run.
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.close(error)
+
+    def _abandon(self, key, flight):
+        """Drop an unfinished flight nobody follows; False if it has followers."""
+        with self._lock:
+            if flight.followers:
+                return False
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            return True
+
+    def _drain(self, key, flight, source):
+        try:
+            for chunk in source:
+                flight.publish(chunk)
+        except Exception as e:
+            self._land(key, flight, e)
+            return
+        self._land(key, flight)
+
+    def stream(self, key, factory):
+        """Yield the chunks of ``factory()``, run once for all concurrent callers of ``key``."""
+        flight, leader = self._join(key)
+        if not leader:
+            tracing.annotate(coalesced=self.name)
+            yield from flight.follow()
+            return
+        source = factory()
+        try:
+            for chunk in source:
+                flight.publish(chunk)
+                yield chunk
+        except GeneratorExit:
+            # The leader's client went away: finish the run for its followers, if any.
+            if self._abandon(key, flight):
+                source.close()
+                flight.close()
+            else:
+                threading.Thread(target=self._drain, args=(key, flight, source),
+                                 name=f"{self.name}-flight", daemon=True).start()
+            raise
+        except BaseException as e:
+            self._land(key, flight, e)
+            raise
+        self._land(key, flight)
+
+    async def _produce(self, key, flight, factory):
+        try:
+            async for chunk in factory():
+                flight.publish(chunk)
+        except BaseException as e:
+            self._land(key, flight, e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        self._land(key, flight)
+
+    async def astream(self, key, factory):
+        """Async ``stream``: ``factory()`` is an async iterator, run as its own task so a
+        disconnecting leader does not cancel the answer its followers are waiting for."""
+        flight, leader = self._join(key)
+        if leader:
+            task = asyncio.get_running_loop().create_task(self._produce(key, flight, factory))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            tracing.annotate(coalesced=self.name)
+        async for chunk in flight.afollow():
+            yield chunk
+
+    def call(self, key, fn):
+        """``fn()``, shared among concurrent callers of ``key``."""
+        def run():
+            yield fn()
+        return list(self.stream(key, run))[0]
+
+    async def acall(self, key, afn):
+        async def run():
+            yield await afn()
+        return [result async for result in self.astream(key, run)][0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._flights)}
@@ -0,0 +1,151 @@
+# student_import.py
+# Bulk load of student rows into campus.db from CSV, JSON or JSON lines.
+# Rows are validated, de-duplicated by uid (the last row wins) and upserted in
+# chunked transactions, so tens of thousands of rows load in seconds and one bad
+# chunk never leaves a half-written table behind.
+#
+#   python student_import.py students.csv
+#   python student_import.py students.json --chunk-size 5000 --dry-run
+#
+# The running app caches student rows for STUDENT_CACHE_TTL seconds, so imported
+# changes show up in chat within that time; POST /students/batch reads the table
+# directly and sees them at once.
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+
+from campus_db import ConnectionPool
+
+FIELDS = ("uid", "name", "section", "nationality", "department", "hod_contact", "admin_contact", "fees_status")
+REQUIRED = ("uid", "name", "section")
+NATIONALITIES = {"domestic": "Domestic", "international": "International"}
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "2000"))
+MAX_REPORTED_ERRORS = 20
+
+_UID_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+_UPSERT = f"""
+    INSERT INTO students ({",".join(FIELDS)}) VALUES ({",".join("?" * len(FIELDS))})
+    ON CONFLICT(uid) DO UPDATE SET {", ".join(f"{f}=excluded.{f}" for f in FIELDS[1:])}
+"""
+
+
+class InputFormatError(ValueError):
+    """The input file as a whole cannot be read (bad format or missing columns)."""
+
+
+def read_records(path):
+    """Yield ``(line_or_index, dict)`` from a .csv, .json (list or {"students": [...]}) or .jsonl file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            header = {(h or "").strip().lower() for h in reader.fieldnames or []}
+            missing = [c for c in REQUIRED if c not in header]
+            if missing:
+                raise InputFormatError(f"CSV header is missing required columns: {', '.join(missing)}")
+            for record in reader:
+                yield reader.line_num, {(k or "").strip().lower(): v for k, v in record.items()}
+    elif ext in (".jsonl", ".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_num, json.loads(line)
+    elif ext == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("students")
+        if not isinstance(data, list):
+            raise InputFormatError('JSON must be a list of students or {"students": [...]}')
+        yield from enumerate(data, 1)
+    else:
+        raise InputFormatError(f"Unsupported file type {ext!r} (use .csv, .json or .jsonl)")
+
+
+def validate(record):
+    """A students row tuple, or raise ValueError with the reason."""
+    if not isinstance(record, dict):
+        raise ValueError("not an object")
+    row = {f: str(record.get(f) if record.get(f) is not None else "").strip() for f in FIELDS}
+    for f in REQUIRED:
+        if not row[f]:
+            raise ValueError(f"missing {f}")
+    if not _UID_RE.match(row["uid"]):
+        raise ValueError(f"invalid uid {row['uid']!r}")
+    if row["nationality"]:
+        nationality = NATIONALITIES.get(row["nationality"].lower())
+        if nationality is None:
+            raise ValueError(f"nationality must be Domestic or International, got {row['nationality']!r}")
+        row["nationality"] = nationality
+    for f in ("hod_contact", "admin_contact"):
+        if row[f] and "@" not in row[f] and not any(ch.isdigit() for ch in row[f]):
+            raise ValueError(f"{f} is neither an email nor a phone number")
+    return tuple(row[f] for f in FIELDS)
+
+
+def import_students(db, records, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False):
+    """Validate and upsert ``(position, record)`` pairs; returns a report dict."""
+    report = {"read": 0, "valid": 0, "invalid": 0, "duplicates": 0, "upserted": 0, "errors": []}
+    rows = {}
+    for position, record in records:
+        report["read"] += 1
+        try:
+            row = validate(record)
+        except ValueError as e:
+            report["invalid"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append(f"row {position}: {e}")
+            continue
+        if row[0] in rows:
+            report["duplicates"] += 1
+        rows[row[0]] = row
+    report["valid"] = len(rows)
+    if dry_run:
+        return report
+    batch = list(rows.values())
+    for start in range(0, len(batch), chunk_size):
+        chunk = batch[start:start + chunk_size]
+        with db.transaction() as conn:
+            conn.executemany(_UPSERT, chunk)
+        report["upserted"] += len(chunk)
+    return report
+
+
+def format_report(report):
+    lines = [f"Read {report['read']} rows: {report['valid']} valid students, {report['invalid']} invalid, "
+             f"{report['duplicates']} duplicate uids (last row kept); {report['upserted']} upserted."]
+    lines += [f"- {e}" for e in report["errors"]]
+    if report["invalid"] > len(report["errors"]):
+        lines.append(f"- ... and {report['invalid'] - len(report['errors'])} more")
+    return "\n".join(lines)
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Bulk import students into campus.db (upsert by uid).")
+    parser.add_argument("path", help=".csv, .json or .jsonl file")
+    parser.add_argument("--db", default="campus.db")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="rows per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    parser.add_argument("--strict", action="store_true", help="write nothing if any row is invalid")
+    args = parser.parse_args()
+    db = ConnectionPool(args.db, size=1)
+    if not args.dry_run and not db.fetchone("SELECT name FROM sqlite_master WHERE type='table' AND name='students'"):
+        sys.exit(f"{args.db} has no students table; start the app once to create the schema.")
+    try:
+        dry_run = args.dry_run or args.strict
+        report = import_students(db, read_records(args.path), args.chunk_size, dry_run=dry_run)
+        if args.strict and not args.dry_run and not report["invalid"]:
+            report = import_students(db, read_records(args.path), args.chunk_size)
+    except (InputFormatError, json.JSONDecodeError, OSError) as e:
+        sys.exit(f"Import failed: {e}")
+    finally:
+        db.close()
+    print(format_report(report))
+    sys.exit(1 if report["invalid"] and args.strict else 0)
+
+
+if __name__ == "__main__":
+    _main()
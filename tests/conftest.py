@@ -0,0 +1,5 @@
+# The modules under test are flat files at the repo root.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
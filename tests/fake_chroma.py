@@ -0,0 +1,88 @@
+# In-memory stand-ins for the parts of a LangChain Chroma store the index code uses.
+import hashlib
+
+
+class WordEmbeddings:
+    """Deterministic toy embeddings of ``dim`` floats; ``calls`` counts embedded texts."""
+
+    def __init__(self, dim=4, salt=""):
+        self.dim = dim
+        self.salt = salt
+        self.calls = 0
+
+    def _vector(self, text):
+        digest = hashlib.sha256(f"{self.salt}{text}".encode("utf-8")).digest()
+        return [b / 255 for b in digest[:self.dim]]
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+class FakeCollection:
+    """Rows of ``id -> (embedding, document, metadata)``; rejects vectors of another size, like Chroma."""
+
+    def __init__(self, name, metadata=None):
+        self.name = name
+        self.metadata = metadata
+        self.rows = {}
+        self.dim = None
+
+    def count(self):
+        return len(self.rows)
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        for n, doc_id in enumerate(ids):
+            if self.dim is None:
+                self.dim = len(embeddings[n])
+            elif len(embeddings[n]) != self.dim:
+                raise ValueError(f"Embedding dimension {len(embeddings[n])} does not match "
+                                 f"collection dimensionality {self.dim}")
+            self.rows[doc_id] = (list(embeddings[n]), documents[n] if documents else None,
+                                 metadatas[n] if metadatas else None)
+
+    def get(self, ids=None, include=(), limit=None, offset=0):
+        selected = [i for i in (ids if ids is not None else list(self.rows)) if i in self.rows]
+        if ids is None:
+            selected = selected[offset:offset + limit if limit else None]
+        out = {"ids": selected}
+        for field, n in (("embeddings", 0), ("documents", 1), ("metadatas", 2)):
+            if field in include:
+                out[field] = [self.rows[i][n] for i in selected]
+        return out
+
+    def delete(self, ids):
+        for i in ids:
+            self.rows.pop(i, None)
+
+
+class FakeClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, embedding_function=None, metadata=None):
+        return self.collections.setdefault(name, FakeCollection(name, metadata))
+
+    def delete_collection(self, name):
+        del self.collections[name]
+
+
+class FakeVectorStore:
+    def __init__(self, embeddings, name="Test_Collection"):
+        self.embeddings = embeddings
+        self._client = FakeClient()
+        self._collection = self._client.get_or_create_collection(name)
+
+    def add_documents(self, docs, ids):
+        texts = [d.page_content for d in docs]
+        self._collection.upsert(ids=ids, embeddings=self.embeddings.embed_documents(texts), documents=texts,
+                                metadatas=[d.metadata for d in docs])
+
+    def get(self, ids=None, include=()):
+        return self._collection.get(ids=ids, include=include)
+
+    def delete(self, ids):
+        self._collection.delete(ids)
@@ -0,0 +1,83 @@
+import pytest
+
+from bm25_index import BM25Index, tokenize
+from doc_store import DocStore
+
+CHUNKS = [
+    ("c1", "24MAM-4 Monday 9:55 Machine Learning Lab Multi_Lab-313 Dr. Rao", {"page": 1}),
+    ("c2", "25MCA-1 Monday 9:55 Web Programming Lecture Hall 226 Ms. Jain", {"page": 2}),
+    ("c3", "The library opens at 8am and closes at 10pm on weekdays.", {"page": 3}),
+    ("c4", "Hostel fees are paid at the accounts office before the semester.", {"page": 4}),
+]
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add_many(CHUNKS)
+    return index
+
+
+def test_tokenize_keeps_joined_codes_whole_and_split():
+    assert tokenize("Section 24MAM-4, room B/204.") == ["section", "24mam-4", "24mam", "4", "room", "b/204", "b", "204"]
+    assert tokenize("--  ") == []
+
+
+def test_exact_section_code_ranks_first(index):
+    hits, reference = index.search("24MAM-4 monday", k=3)
+    assert [doc_id for doc_id, _ in hits] == ["c1", "c2"]
+    assert BM25Index.confident(hits, reference)
+    # Terms the index has never seen still raise the bar for confidence.
+    hits, reference = index.search("24MAM-4 monday timetable please", k=3)
+    assert hits[0][0] == "c1" and not BM25Index.confident(hits, reference)
+
+
+def test_unrelated_query_has_no_hits(index):
+    hits, reference = index.search("scholarship deadline")
+    assert hits == [] and reference > 0
+    assert index.search("") == ([], 0.0)
+
+
+def test_confident_needs_a_clear_winner():
+    assert not BM25Index.confident([], 1.0)
+    assert not BM25Index.confident([("a", 1.0)], 10.0)
+    assert BM25Index.confident([("a", 9.0), ("b", 3.0)], 10.0)
+    assert not BM25Index.confident([("a", 9.0), ("b", 8.0)], 10.0)
+
+
+def test_replace_and_remove_update_postings(index):
+    index.add_many([("c3", "Canteen menu for the week", {"page": 3})])
+    assert index.search("library")[0] == []
+    assert index.search("canteen")[0][0][0] == "c3"
+    index.remove_many(["c3", "unknown"])
+    assert "c3" not in index and len(index) == 3
+    assert index.search("canteen")[0] == []
+    assert index.document("c3") is None
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    path = str(tmp_path / "bm25" / "English_Collection.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.ids() == index.ids()
+    assert loaded.document("c2") == ("25MCA-1 Monday 9:55 Web Programming Lecture Hall 226 Ms. Jain", {"page": 2})
+    assert loaded.search("226")[0] == index.search("226")[0]
+
+
+def test_with_a_store_only_ids_are_persisted(tmp_path):
+    store = DocStore(str(tmp_path / "docs.sqlite3"))
+    store.put_many(CHUNKS)
+    index = BM25Index(str(tmp_path / "bm25.json"), store=store)
+    index.add_many(CHUNKS)
+    index.save()
+    assert open(tmp_path / "bm25.json", encoding="utf-8").read().startswith('{"ids"')
+
+    loaded = BM25Index.load(str(tmp_path / "bm25.json"), store=store)
+    assert loaded.document("c4") == (CHUNKS[3][1], {"page": 4})
+    assert loaded.search("hostel fees")[0][0][0] == "c4"
+
+
+def test_load_of_a_corrupt_file_gives_an_empty_index(tmp_path):
+    path = tmp_path / "bm25.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert len(BM25Index.load(str(path))) == 0
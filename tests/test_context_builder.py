@@ -0,0 +1,64 @@
+from langchain_core.documents import Document
+
+from context_builder import CONTEXT_TOKEN_BUDGET, SEPARATOR, assemble, estimate_tokens
+
+FAQ = ("The central library is open from 8am to 10pm on weekdays and from 10am to 6pm on weekends. "
+       "Students must carry their ID card to borrow books; at most four books can be issued at a time.")
+
+
+def doc(text, source="faq.pdf", page=0):
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("पुस्तकालय") == 5
+
+
+def test_duplicate_from_the_other_collection_is_dropped():
+    context, report = assemble([doc(FAQ), doc("Hostel curfew is 10pm."), doc(FAQ + " ")])
+    assert context == FAQ + SEPARATOR + "Hostel curfew is 10pm."
+    assert report["deduplicated"] == 1 and report["used"] == 2
+
+
+def test_near_duplicate_keeps_the_longer_text_at_the_better_rank():
+    longer = FAQ + " Late returns are fined Rs 5 per day."
+    context, report = assemble([doc(FAQ), doc("Hostel curfew is 10pm."), doc(longer)])
+    assert context.split(SEPARATOR) == [longer, "Hostel curfew is 10pm."]
+    assert report["deduplicated"] == 1
+
+
+def test_overlapping_neighbours_are_stitched():
+    first, second = FAQ[:120], FAQ[90:]
+    context, report = assemble([doc(second, page=3), doc(first, page=3)])
+    assert context == FAQ
+    assert report["merged"] == 1
+
+
+def test_chunks_of_distant_pages_or_other_sources_are_not_stitched():
+    first, second = FAQ[:120], FAQ[90:]
+    _, report = assemble([doc(first, page=1), doc(second, page=5)])
+    assert report["merged"] == 0
+    _, report = assemble([doc(first), doc(second, source="timetable.pdf")])
+    assert report["merged"] == 0
+
+
+def test_budget_drops_lower_ranked_chunks():
+    docs = [doc(f"Chunk {n}: " + "word " * 40, page=n * 10) for n in range(5)]
+    context, report = assemble(docs, budget=120)
+    assert context.startswith("Chunk 0:")
+    assert report["context_tokens"] <= 120
+    assert report["used"] + report["dropped_for_budget"] == 5 and report["dropped_for_budget"] > 0
+
+
+def test_best_chunk_is_cut_when_nothing_fits():
+    context, report = assemble([doc(FAQ)], budget=10)
+    assert context and FAQ.startswith(context)
+    assert estimate_tokens(context) <= 10
+    assert report["used"] == 1
+
+
+def test_empty_input():
+    assert assemble([doc("   ")]) == ("", {"retrieved": 1, "deduplicated": 0, "merged": 0, "used": 0,
+                                          "dropped_for_budget": 0, "context_tokens": 0, "budget": CONTEXT_TOKEN_BUDGET})
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from doc_store import DocStore
+
+
+def test_read_only_store_reads_the_writers_chunks(tmp_path):
+    path = str(tmp_path / "docs.sqlite3")
+    writer = DocStore(path)
+    writer.put_many([("a", "alpha", {"page": 1}), ("b", "beta", None)])
+
+    reader = DocStore(path, read_only=True)
+    assert reader.get_many(["a", "b", "c"]) == {"a": ("alpha", {"page": 1}), "b": ("beta", {})}
+    assert reader.missing(["a", "c"]) == {"c"}
+    # A chunk the writer adds later is visible to the open reader.
+    writer.put_many([("c", "gamma", {})])
+    assert reader.get("c") == ("gamma", {})
+    with pytest.raises(sqlite3.OperationalError, match="readonly"):
+        reader.put_many([("d", "delta", {})])
+    reader.close()
+    writer.close()
+
+
+def test_read_only_store_never_creates_the_file_or_schema(tmp_path):
+    missing = tmp_path / "missing.sqlite3"
+    reader = DocStore(str(missing), read_only=True)
+    with pytest.raises(sqlite3.OperationalError):
+        len(reader)
+    assert not missing.exists()
+
+    empty = tmp_path / "empty.sqlite3"
+    sqlite3.connect(empty).close()
+    reader = DocStore(str(empty), read_only=True)
+    with pytest.raises(sqlite3.OperationalError, match="no such table"):
+        len(reader)
+    reader.close()
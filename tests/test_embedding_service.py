@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+from embedding_service import EmbeddingBatcher
+
+
+class RecordingEmbeddings:
+    """Records each ``embed_documents`` batch; the first call can be held on ``gate``."""
+
+    def __init__(self, hold_first=False, fail_on=None):
+        self.batches = []
+        self.query_calls = 0
+        self.started = threading.Event()
+        self.gate = threading.Event()
+        if not hold_first:
+            self.gate.set()
+        self.fail_on = fail_on
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        self.started.set()
+        self.gate.wait(5)
+        if self.fail_on and self.fail_on in texts:
+            raise RuntimeError("CUDA out of memory")
+        return [[float(len(t)), float(i)] for i, t in enumerate(texts)]
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return [float(len(text)), -1.0]
+
+
+def _in_threads(batcher, texts):
+    results, errors = {}, {}
+
+    def run(text):
+        try:
+            results[text] = batcher.embed_query(text)
+        except Exception as e:
+            errors[text] = e
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in texts]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def _wait_queued(batcher, n, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while batcher.stats()["queue_depth"] < n and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert batcher.stats()["queue_depth"] == n
+
+
+def _join(threads):
+    for t in threads:
+        t.join(5)
+
+
+def test_batches_close_at_max_batch_without_waiting():
+    inner = RecordingEmbeddings(hold_first=True)
+    batcher = EmbeddingBatcher(inner, max_batch=2, max_wait_ms=10_000, enabled=True)
+    # Two queries fill the first batch, so it is encoded (and held) right away.
+    first, results, _ = _in_threads(batcher, ["q0", "q00"])
+    assert inner.started.wait(5)
+    rest, more, _ = _in_threads(batcher, ["q1", "q22", "q333", "q4444"])
+    _wait_queued(batcher, 4)
+
+    started = time.monotonic()
+    inner.gate.set()
+    _join(first + rest)
+    # Full batches go out at once; only a partial batch would wait max_wait (10s).
+    assert time.monotonic() - started < 2
+    assert [len(b) for b in inner.batches] == [2, 2, 2]
+    results.update(more)
+    assert {t: v[0] for t, v in results.items()} == {
+        t: float(len(t)) for t in ["q0", "q00", "q1", "q22", "q333", "q4444"]}
+
+
+def test_partial_batch_closes_after_max_wait():
+    inner = RecordingEmbeddings()
+    batcher = EmbeddingBatcher(inner, max_batch=32, max_wait_ms=150, enabled=True)
+    started = time.monotonic()
+    threads, results, _ = _in_threads(batcher, ["a", "bb", "ccc"])
+    _join(threads)
+    elapsed = time.monotonic() - started
+    assert 0.1 <= elapsed < 2
+    assert [sorted(b) for b in inner.batches] == [["a", "bb", "ccc"]]
+    assert {t: v[0] for t, v in results.items()} == {"a": 1.0, "bb": 2.0, "ccc": 3.0}
+
+
+def test_encode_error_fails_the_whole_batch_and_the_worker_survives():
+    inner = RecordingEmbeddings(hold_first=True, fail_on="boom")
+    batcher = EmbeddingBatcher(inner, max_batch=8, max_wait_ms=1, enabled=True)
+    first, _, _ = _in_threads(batcher, ["warm"])
+    assert inner.started.wait(5)
+    rest, results, errors = _in_threads(batcher, ["boom", "ok"])
+    _wait_queued(batcher, 2)
+    inner.gate.set()
+    _join(first + rest)
+
+    assert results == {}
+    assert set(errors) == {"boom", "ok"}
+    assert all(isinstance(e, RuntimeError) and "out of memory" in str(e) for e in errors.values())
+    assert batcher.embed_query("after") == [5.0, 0.0]
+    assert batcher.stats()["failed"] == 2
+
+
+def test_stats_count_requests_batches_and_sizes():
+    inner = RecordingEmbeddings(hold_first=True)
+    batcher = EmbeddingBatcher(inner, max_batch=4, max_wait_ms=1, enabled=True)
+    first, _, _ = _in_threads(batcher, ["q0"])
+    assert inner.started.wait(5)
+    rest, _, _ = _in_threads(batcher, [f"q{i}" for i in range(1, 6)])
+    _wait_queued(batcher, 5)
+    inner.gate.set()
+    _join(first + rest)
+
+    stats = batcher.stats()
+    assert stats["requests"] == 6 and stats["batches"] == 3 and stats["failed"] == 0
+    assert stats["avg_batch_size"] == 2.0
+    assert stats["batch_size_hist"]["1"] == 2 and stats["batch_size_hist"]["4"] == 1
+    assert stats["max_queue_wait_ms"] >= stats["avg_queue_wait_ms"] > 0
+    assert stats["queue_depth"] == 0 and stats["enabled"] is True
+
+
+def test_async_queries_share_batches():
+    inner = RecordingEmbeddings()
+    batcher = EmbeddingBatcher(inner, max_batch=16, max_wait_ms=100, enabled=True)
+
+    async def main():
+        return await asyncio.gather(*(batcher.aembed_query(f"q{'x' * i}") for i in range(6)))
+
+    vectors = asyncio.run(main())
+    assert [v[0] for v in vectors] == [float(1 + i) for i in range(6)]
+    assert sum(len(b) for b in inner.batches) == 6
+    assert len(inner.batches) < 6
+    assert batcher.stats()["requests"] == 6
+
+
+def test_disabled_or_query_kwargs_pass_straight_through():
+    inner = RecordingEmbeddings()
+    assert EmbeddingBatcher(inner, enabled=False).embed_query("abc") == [3.0, -1.0]
+    inner.query_encode_kwargs = {"prompt_name": "query"}
+    batcher = EmbeddingBatcher(inner, enabled=True)
+    assert batcher.enabled is False
+    assert batcher.embed_query("abcd") == [4.0, -1.0]
+    assert inner.batches == [] and inner.query_calls == 2
+    assert batcher.embed_documents(["x", "yy"]) == [[1.0, 0.0], [2.0, 1.0]]
@@ -0,0 +1,221 @@
+import pytest
+from langchain_core.documents import Document
+
+import index_sync
+from bm25_index import BM25Index
+from doc_store import DocStore
+from fake_chroma import FakeVectorStore, WordEmbeddings
+
+
+def chunks(*texts, source="faq.pdf"):
+    return [Document(page_content=t, metadata={"source": source, "page": n}) for n, t in enumerate(texts)]
+
+
+def sync(vs, manifest, docs, **kwargs):
+    return index_sync.sync_source(vs, "Test_Collection", manifest, "faq.pdf", docs, sha="s1", **kwargs)
+
+
+def test_chunk_ids_are_stable_content_hashes():
+    assert index_sync.chunk_id("faq.pdf", "text") == index_sync.chunk_id("faq.pdf", "text")
+    assert index_sync.chunk_id("faq.pdf", "text") != index_sync.chunk_id("timetable.pdf", "text")
+    assert len(index_sync.chunk_id("faq.pdf", "text")) == 32
+
+
+def test_first_sync_adds_everything_and_resync_skips_it():
+    vs = FakeVectorStore(WordEmbeddings())
+    manifest = {"collections": {}}
+    assert sync(vs, manifest, chunks("a", "b", "b")) == {"added": 2, "removed": 0, "skipped": 0}
+    assert vs.embeddings.calls == 2
+    assert sync(vs, manifest, chunks("a", "b")) == {"added": 0, "removed": 0, "skipped": 2}
+    assert vs.embeddings.calls == 2
+    assert index_sync.is_current(manifest, "Test_Collection", "faq.pdf", "s1")
+    assert not index_sync.is_current(manifest, "Test_Collection", "faq.pdf", "s2")
+
+
+def test_changed_source_embeds_only_new_chunks_and_deletes_old_ones():
+    vs = FakeVectorStore(WordEmbeddings())
+    manifest = {"collections": {}}
+    sync(vs, manifest, chunks("a", "b", "c"))
+    assert sync(vs, manifest, chunks("a", "c", "d")) == {"added": 1, "removed": 1, "skipped": 2}
+    assert sorted(vs.get(include=["documents"])["documents"]) == ["a", "c", "d"]
+
+
+def test_large_sources_are_added_in_batches(monkeypatch):
+    monkeypatch.setattr(index_sync, "ADD_BATCH_SIZE", 3)
+    vs = FakeVectorStore(WordEmbeddings())
+    batches = []
+    add = vs.add_documents
+    monkeypatch.setattr(vs, "add_documents", lambda docs, ids: (batches.append(len(ids)), add(docs, ids)))
+    sync(vs, {"collections": {}}, (d for d in chunks(*"abcdefg")))
+    assert batches == [3, 3, 1]
+    assert vs._collection.count() == 7
+
+
+def test_verify_re_adds_chunks_missing_from_the_collection():
+    vs = FakeVectorStore(WordEmbeddings())
+    manifest = {"collections": {}}
+    sync(vs, manifest, chunks("a", "b"))
+    vs.delete([index_sync.chunk_id("faq.pdf", "a")])
+    assert sync(vs, manifest, chunks("a", "b"))["added"] == 0
+    assert sync(vs, manifest, chunks("a", "b"), verify=True) == {"added": 1, "removed": 0, "skipped": 1}
+    assert vs._collection.count() == 2
+
+
+def test_lexical_index_follows_adds_and_deletes():
+    vs = FakeVectorStore(WordEmbeddings())
+    lexical = BM25Index()
+    manifest = {"collections": {}}
+    sync(vs, manifest, chunks("library hours", "hostel fees"), lexical=lexical)
+    sync(vs, manifest, chunks("library hours", "canteen menu"), lexical=lexical)
+    assert lexical.ids() == index_sync.manifest_ids(manifest, "Test_Collection")
+    assert lexical.search("canteen")[0] and not lexical.search("hostel")[0]
+
+
+def test_reconcile_lexical_rebuilds_a_stale_index():
+    vs = FakeVectorStore(WordEmbeddings())
+    manifest = {"collections": {}}
+    sync(vs, manifest, chunks("library hours", "hostel fees"))
+    lexical = BM25Index()
+    lexical.add_many([("gone", "old chunk", {})])
+    assert index_sync.reconcile_lexical(vs, "Test_Collection", manifest, lexical) == (2, 1)
+    assert lexical.ids() == index_sync.manifest_ids(manifest)
+
+
+def test_drop_untracked_runs_once_and_keeps_listed_sources():
+    vs = FakeVectorStore(WordEmbeddings())
+    vs.add_documents(chunks("old") + chunks("approved", source="admin_approved"), ids=["r1", "r2"])
+    manifest = {"collections": {}}
+    assert index_sync.drop_untracked(vs, "Test_Collection", manifest, keep_sources=("admin_approved",)) == 1
+    assert vs.get()["ids"] == ["r2"]
+    sync(vs, manifest, chunks("new"))
+    assert index_sync.drop_untracked(vs, "Test_Collection", manifest) == 0
+
+
+def test_store_holds_text_and_prune_drops_unreferenced_chunks(tmp_path):
+    store = DocStore(str(tmp_path / "docs.sqlite3"))
+    vs = FakeVectorStore(WordEmbeddings())
+    manifest = {"collections": {}}
+    sync(vs, manifest, chunks("a", "b"), store=store)
+    assert vs.get(include=["documents"])["documents"] == [None, None]
+    assert len(store) == 2
+    sync(vs, manifest, chunks("a"), store=store)
+    assert len(store) == 2  # other collections may still use "b"
+    assert index_sync.prune_store(manifest, store) == 1
+    assert store.ids() == index_sync.manifest_ids(manifest)
+
+
+def test_manifest_round_trip(tmp_path):
+    path = str(tmp_path / "index_manifest.json")
+    assert index_sync.load_manifest(path) == {"collections": {}}
+    vs = FakeVectorStore(WordEmbeddings())
+    manifest = {"collections": {}}
+    sync(vs, manifest, chunks("a"))
+    index_sync.save_manifest(path, manifest)
+    assert index_sync.load_manifest(path) == manifest
+    assert index_sync.skip_source(manifest, "Test_Collection", "faq.pdf") == {"added": 0, "removed": 0, "skipped": 1}
+
+
+def test_embedding_fingerprint_is_recorded_and_compared():
+    manifest = {"collections": {}}
+    assert not index_sync.embedding_changed(manifest, "Test_Collection", "model@torch")
+    assert not index_sync.embedding_changed(manifest, "Test_Collection", "model@torch")
+    assert index_sync.embedding_changed(manifest, "Test_Collection", "model@onnx-int8")
+    assert manifest["embeddings"] == {"Test_Collection": "model@onnx-int8"}
+
+
+def test_reembed_replaces_every_vector():
+    vs = FakeVectorStore(WordEmbeddings(dim=4))
+    manifest = {"collections": {}}
+    sync(vs, manifest, chunks("hostel fees", "library hours"))
+    before = vs.get(include=["embeddings"])
+
+    vs.embeddings = WordEmbeddings(dim=8, salt="new model")
+    assert index_sync.reembed_collection(vs) == 2
+    after = vs.get(include=["embeddings", "documents", "metadatas"])
+    assert sorted(after["ids"]) == sorted(before["ids"])
+    assert all(len(e) == 8 for e in after["embeddings"])
+    assert sorted(after["documents"]) == ["hostel fees", "library hours"]
+    assert all(m["source"] == "faq.pdf" for m in after["metadatas"])
+    # Unchanged chunks are still skipped by the next sync.
+    assert sync(vs, manifest, chunks("hostel fees", "library hours")) == {"added": 0, "removed": 0, "skipped": 2}
+
+
+def test_reembed_reads_text_from_the_store(tmp_path):
+    store = DocStore(str(tmp_path / "docs.sqlite3"))
+    vs = FakeVectorStore(WordEmbeddings(dim=4))
+    sync(vs, {"collections": {}}, chunks("exam schedule", "bus timings"), store=store)
+    assert vs.get(include=["documents"])["documents"] == [None, None]
+
+    vs.embeddings = WordEmbeddings(dim=6)
+    assert index_sync.reembed_collection(vs, store=store) == 2
+    assert vs.embeddings.calls == 2
+    assert all(len(e) == 6 for e in vs.get(include=["embeddings"])["embeddings"])
+
+
+def test_reembed_leaves_collection_alone_when_embedding_fails():
+    class Broken(WordEmbeddings):
+        def embed_documents(self, texts):
+            raise RuntimeError("model not downloaded")
+
+    vs = FakeVectorStore(WordEmbeddings(dim=4))
+    sync(vs, {"collections": {}}, chunks("hostel fees"))
+    vs.embeddings = Broken()
+    with pytest.raises(RuntimeError):
+        index_sync.reembed_collection(vs)
+    assert vs._collection.count() == 1
+
+
+def test_legacy_approved_answers_reach_the_store(tmp_path):
+    store = DocStore(str(tmp_path / "docs.sqlite3"))
+    vs = FakeVectorStore(WordEmbeddings())
+    # A pre-manifest build: random IDs, text in Chroma.
+    vs.add_documents(chunks("old faq text") + chunks("Q: fee?\nA: 50k", source="admin_approved"),
+                     ids=["legacy-faq", "legacy-approved"])
+    manifest = {"collections": {}}
+    assert index_sync.drop_untracked(vs, "Test_Collection", manifest, keep_sources=("admin_approved",)) == 1
+    sync(vs, manifest, chunks("new faq text"), store=store)
+
+    ids = index_sync.collection_ids(vs)
+    assert index_sync.backfill_store(vs, store, ids) == 1
+    index_sync.prune_store(manifest, store, keep_ids=ids)
+    text, meta = store.get_many(["legacy-approved"])["legacy-approved"]
+    assert text == "Q: fee?\nA: 50k" and meta["source"] == "admin_approved"
+    assert len(store) == 2
+
+
+class _ChromaStore:
+    """Just the ``_collection`` of a LangChain Chroma store."""
+
+    def __init__(self, path, name):
+        import chromadb
+        self._collection = chromadb.PersistentClient(path=path).get_or_create_collection(name)
+
+
+def test_copied_chroma_version_opens_and_answers_queries(tmp_path):
+    chromadb = pytest.importorskip("chromadb")
+    emb = WordEmbeddings(dim=8)
+    live = _ChromaStore(str(tmp_path / "live"), "English_Collection")
+    texts = [f"faq chunk {n}" for n in range(300)]
+    live._collection.add(ids=[f"id{n}" for n in range(300)], embeddings=emb.embed_documents(texts),
+                         documents=texts, metadatas=[{"source": "faq.pdf", "page": n} for n in range(300)])
+    # Vectors only, as with a DocStore; the live client stays open throughout.
+    vectors_only = _ChromaStore(str(tmp_path / "live"), "Indic_Collection")
+    vectors_only._collection.add(ids=["v1", "v2"], embeddings=emb.embed_documents(["a", "b"]))
+    vectors_only._collection.add(ids=["legacy"], embeddings=emb.embed_documents(["c"]), documents=["c"],
+                                 metadatas=[{"source": "admin_approved"}])
+
+    copy = _ChromaStore(str(tmp_path / "copy"), "English_Collection")
+    assert index_sync.copy_collection(live, copy, batch_size=128) == 300
+    copied_vectors = _ChromaStore(str(tmp_path / "copy"), "Indic_Collection")
+    assert index_sync.copy_collection(vectors_only, copied_vectors) == 3
+
+    chromadb.api.client.SharedSystemClient.clear_system_cache()
+    reopened = chromadb.PersistentClient(path=str(tmp_path / "copy")).get_collection("English_Collection")
+    assert reopened.count() == 300
+    hit = reopened.query(query_embeddings=[emb.embed_query("faq chunk 42")], n_results=1,
+                         include=["documents", "metadatas", "distances"])
+    assert hit["ids"] == [["id42"]] and hit["documents"] == [["faq chunk 42"]]
+    assert hit["metadatas"] == [[{"source": "faq.pdf", "page": 42}]] and hit["distances"][0][0] < 1e-6
+    other = chromadb.PersistentClient(path=str(tmp_path / "copy")).get_collection("Indic_Collection")
+    rows = other.get(include=["documents"])
+    assert dict(zip(rows["ids"], rows["documents"])) == {"v1": None, "v2": None, "legacy": "c"}
@@ -0,0 +1,114 @@
+import json
+import os
+
+import pytest
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import ingestion
+from index_sync import chunk_id
+
+pypdf = pytest.importorskip("pypdf")
+
+SPLITTER_SETTINGS = {"chunk_size": 500, "chunk_overlap": 50}
+
+
+def make_pdf(path, pages):
+    """Minimal text PDF with one Helvetica text block per page (lines of ASCII)."""
+    objs = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+            3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for n, lines in enumerate(pages):
+        page_no, content_no = 4 + 2 * n, 5 + 2 * n
+        shown = " ".join("(%s) Tj T*" % line.replace("(", "\\(").replace(")", "\\)") for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {shown} ET".encode("latin-1")
+        objs[content_no] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objs[page_no] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                         b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_no)
+        kids.append(b"%d 0 R" % page_no)
+    objs[2] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(pages)
+    out, offsets = bytearray(b"%PDF-1.4\n"), {}
+    for num in sorted(objs):
+        offsets[num] = len(out)
+        out += b"%d 0 obj\n" % num + objs[num] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offsets[num] for num in sorted(objs))
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    path.write_bytes(bytes(out))
+    return str(path)
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    pages = [[f"Page {p} rule {i}: hostel gates close at 10 pm (fees due by the 5th)." for i in range(18)]
+             for p in range(4)]
+    pages[2] = []  # a blank page yields no chunks on either path
+    return make_pdf(tmp_path / "faq.pdf", pages)
+
+
+def _legacy_pages(path):
+    """The old loader step: one Document per page, as PyPDFLoader built them."""
+    reader = pypdf.PdfReader(path)
+    return [Document(page_content=page.extract_text() or "", metadata={"source": path, "page": i})
+            for i, page in enumerate(reader.pages)]
+
+
+def _rows(docs, source_key="faq.pdf"):
+    return [(chunk_id(source_key, d.page_content), d.page_content, d.metadata) for d in docs]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cached_chunks_match_the_old_splitter_path(pdf, tmp_path, monkeypatch, workers):
+    # One page per task, and the pool even for this small file, when workers > 1.
+    monkeypatch.setattr(ingestion, "INGEST_PAGES_PER_TASK", 1)
+    monkeypatch.setattr(ingestion, "INGEST_PARALLEL_MIN_PAGES", 1)
+    legacy = RecursiveCharacterTextSplitter(**SPLITTER_SETTINGS).split_documents(_legacy_pages(pdf))
+    assert len(legacy) > 4
+
+    chunks = ingestion.cached_chunks(pdf, SPLITTER_SETTINGS, sha="v1", cache_dir=str(tmp_path / "cache"),
+                                     workers=workers)
+    assert len(chunks) == len(legacy)
+    assert _rows(chunks) == _rows(legacy)
+    # A second pass streams the same rows back from the cache file.
+    assert _rows(chunks) == _rows(legacy)
+
+
+def test_cached_chunks_match_pypdfloader(pdf, tmp_path):
+    loaders = pytest.importorskip("langchain_community.document_loaders")
+    legacy = RecursiveCharacterTextSplitter(**SPLITTER_SETTINGS).split_documents(loaders.PyPDFLoader(pdf).load())
+    chunks = list(ingestion.cached_chunks(pdf, SPLITTER_SETTINGS, sha="v1", cache_dir=str(tmp_path / "cache")))
+    assert [(i, text) for i, text, _ in _rows(chunks)] == [(i, text) for i, text, _ in _rows(legacy)]
+    # Newer loaders add PDF-level keys; the keys ingestion writes must agree.
+    for new, old in zip(chunks, legacy):
+        assert new.metadata == {k: old.metadata[k] for k in new.metadata}
+
+
+def test_cache_is_reused_until_the_file_or_splitter_changes(pdf, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    first = ingestion.cached_chunks(pdf, SPLITTER_SETTINGS, sha="v1", cache_dir=cache_dir, workers=1)
+
+    def no_parse(*args):
+        raise AssertionError("cached file was re-parsed")
+
+    monkeypatch.setattr(ingestion, "_parse_pages", no_parse)
+    again = ingestion.cached_chunks(pdf, SPLITTER_SETTINGS, sha="v1", cache_dir=cache_dir, workers=1)
+    assert again.path == first.path and len(again) == len(first)
+    monkeypatch.undo()
+
+    smaller = ingestion.cached_chunks(pdf, {"chunk_size": 200, "chunk_overlap": 20}, sha="v1",
+                                      cache_dir=cache_dir, workers=1)
+    assert smaller.path != first.path and len(smaller) > len(first)
+    # Only the newest version of a file's chunks is kept.
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == [os.path.basename(smaller.path)]
+    with open(smaller.path, encoding="utf-8") as f:
+        assert all(len(json.loads(line)["text"]) <= 200 for line in f)
+
+
+def test_cache_key_changes_with_file_and_splitter_settings():
+    key = ingestion.cache_key("abc", SPLITTER_SETTINGS)
+    assert key == ingestion.cache_key("abc", dict(reversed(list(SPLITTER_SETTINGS.items()))))
+    assert key != ingestion.cache_key("abd", SPLITTER_SETTINGS)
+    assert key != ingestion.cache_key("abc", {**SPLITTER_SETTINGS, "chunk_size": 800})
+    assert key != ingestion.cache_key("abc", {**SPLITTER_SETTINGS, "chunk_overlap": 0})
+    assert key != ingestion.cache_key("abc", {**SPLITTER_SETTINGS, "separators": ["\n\n", "\n"]})
@@ -0,0 +1,109 @@
+import threading
+import time
+from types import MappingProxyType
+
+from knowledge import JobRunner, KnowledgeSnapshot, SnapshotManager
+
+
+def _snap(version):
+    return KnowledgeSnapshot(version, MappingProxyType({}), MappingProxyType({"eng": version}))
+
+
+def _wait_done(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.status in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return job
+
+
+def test_swap_while_a_request_holds_the_old_snapshot():
+    retired = []
+    mgr = SnapshotManager(on_retire=retired.append)
+    v1, v2 = _snap("v1"), _snap("v2")
+    mgr.swap(v1)
+
+    with mgr.acquire() as held:
+        assert mgr.swap(v2) is v1
+        # The in-flight request keeps reading v1; new requests see v2.
+        assert held is v1 and held.stores["eng"] == "v1"
+        with mgr.acquire() as fresh:
+            assert fresh is v2
+        assert retired == []
+        assert mgr.stats()["draining"] == ["v1"]
+
+    assert retired == [v1]
+    assert mgr.stats() == {"version": "v2", "in_flight": 0, "draining": []}
+
+
+def test_old_snapshot_retires_only_after_its_last_release():
+    retired = []
+    mgr = SnapshotManager(on_retire=retired.append)
+    v1 = _snap("v1")
+    mgr.swap(v1)
+
+    first = mgr.acquire()
+    second = mgr.acquire()
+    assert first.__enter__() is v1 and second.__enter__() is v1
+    mgr.swap(_snap("v2"))
+    first.__exit__(None, None, None)
+    assert retired == []
+    second.__exit__(None, None, None)
+    assert retired == [v1]
+
+    # Swapping out an idle snapshot retires it straight away, exactly once.
+    v2 = mgr.current()
+    mgr.swap(_snap("v3"))
+    assert retired == [v1, v2]
+
+
+def test_retire_errors_do_not_break_the_swap():
+    def boom(snap):
+        raise RuntimeError("cannot delete")
+
+    mgr = SnapshotManager(on_retire=boom)
+    mgr.swap(_snap("v1"))
+    v2 = _snap("v2")
+    mgr.swap(v2)
+    assert mgr.current() is v2
+
+
+def test_job_runner_reports_progress_and_result():
+    runner = JobRunner()
+
+    def work(job, n):
+        job.report("step 1")
+        return n * 2
+
+    job = _wait_done(runner.start("refresh", work, 21))
+    assert job.status == "succeeded"
+    d = job.to_dict()
+    assert d["result"] == 42 and d["progress"] == ["step 1"] and d["error"] is None
+    assert d["finished_at"] >= d["started_at"]
+    assert runner.active("refresh") is None
+
+
+def test_job_runner_reports_a_failed_job():
+    runner = JobRunner()
+
+    def work(job):
+        job.report("loading pdfs")
+        raise ValueError("bad pdf")
+
+    job = _wait_done(runner.start("refresh", work))
+    assert job.status == "failed"
+    assert job.error == "bad pdf"
+    assert runner.get("refresh").to_dict()["progress"] == ["loading pdfs"]
+    assert runner.active("refresh") is None
+
+
+def test_job_runner_runs_one_job_per_name():
+    runner = JobRunner()
+    gate = threading.Event()
+
+    first = runner.start("refresh", lambda job: gate.wait(5))
+    assert runner.start("refresh", lambda job: None) is first
+    assert runner.active("refresh") is first
+    gate.set()
+    _wait_done(first)
+    second = _wait_done(runner.start("refresh", lambda job: "again"))
+    assert second is not first and second.result == "again"
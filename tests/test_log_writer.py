@@ -0,0 +1,86 @@
+import contextlib
+import threading
+import time
+
+import pytest
+
+from campus_db import ConnectionPool
+from log_writer import BatchedLogWriter
+
+LOG_SQL = "INSERT INTO query_logs (query) VALUES (?)"
+UNANSWERED_SQL = "INSERT INTO unanswered_queries (query) VALUES (?)"
+
+
+class GatedPool:
+    """Pool wrapper that holds the background writer until ``gate`` is set."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.gate = threading.Event()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        if threading.current_thread().name == "log-writer":
+            self.gate.wait(5)
+        with self.pool.transaction() as conn:
+            yield conn
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "campus.db"), size=2)
+    pool.execute("CREATE TABLE query_logs (id INTEGER PRIMARY KEY, query TEXT)")
+    pool.execute("CREATE TABLE unanswered_queries (id INTEGER PRIMARY KEY, query TEXT)")
+    yield pool
+    pool.close()
+
+
+def _count(pool, table):
+    return pool.fetchone(f"SELECT COUNT(*) FROM {table}")[0]
+
+
+def test_rows_are_written_in_batches(pool):
+    writer = BatchedLogWriter(pool, max_queue=100, batch_size=10, flush_interval=0.05)
+    for i in range(25):
+        assert writer.submit(LOG_SQL, (f"q{i}",))
+    assert writer.flush()
+    writer.close()
+    assert _count(pool, "query_logs") == 25
+    stats = writer.stats()
+    assert stats["written"] == 25 and stats["dropped"] == 0
+
+
+@pytest.mark.parametrize("policy", ["drop", "block"])
+def test_full_queue_drops_query_logs_but_keeps_unanswered(pool, policy):
+    gated = GatedPool(pool)
+    writer = BatchedLogWriter(gated, max_queue=2, batch_size=1, flush_interval=0.01,
+                              policy=policy, block_timeout=0.01)
+    # The writer thread takes one row and stalls on the gate; two more fill the queue.
+    writer.submit(LOG_SQL, ("q0",))
+    deadline = time.monotonic() + 5
+    while writer.stats()["queue_depth"] and time.monotonic() < deadline:
+        time.sleep(0.005)
+    for i in range(1, 3):
+        assert writer.submit(LOG_SQL, (f"q{i}",))
+    assert not writer.submit(LOG_SQL, ("overflow",))
+    for i in range(5):
+        assert writer.submit(UNANSWERED_SQL, (f"u{i}",), durable=True)
+    # Durable rows were written on the caller's thread while the queue stayed full.
+    assert _count(pool, "unanswered_queries") == 5
+
+    gated.gate.set()
+    assert writer.flush()
+    writer.close()
+    assert _count(pool, "query_logs") == 3
+    stats = writer.stats()
+    assert stats["dropped"] == 1
+    assert stats["written_sync"] == 5
+
+
+def test_durable_rows_survive_a_closed_writer(pool):
+    writer = BatchedLogWriter(pool, max_queue=10)
+    writer.close()
+    assert not writer.submit(LOG_SQL, ("late",))
+    assert writer.submit(UNANSWERED_SQL, ("late",), durable=True)
+    assert _count(pool, "query_logs") == 0
+    assert _count(pool, "unanswered_queries") == 1
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+
+import mmap_index
+from fake_chroma import FakeVectorStore, WordEmbeddings
+from mmap_index import MmapCollection, MmapVectorStore, export_collections, latest_generation
+
+
+def _store(texts, name="English_Collection", salt=""):
+    vs = FakeVectorStore(WordEmbeddings(dim=8, salt=salt), name=name)
+    vs._collection.upsert(ids=[f"id-{t}" for t in texts], embeddings=vs.embeddings.embed_documents(texts))
+    return vs
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    # Force several pages per collection so the paging order is exercised.
+    monkeypatch.setattr(mmap_index, "_BATCH", 7)
+
+
+def test_export_maps_the_same_ids_and_vectors_in_order(tmp_path, small_batches):
+    eng = _store([f"chunk {i}" for i in range(30)])
+    indic = _store([f"chunk {i}" for i in range(30)], name="Indic_Collection", salt="indic")
+    root = str(tmp_path / "mmap")
+
+    generation = export_collections({"English_Collection": eng, "Indic_Collection": indic,
+                                     "Timetable_Collection": None}, root)
+    assert generation == "g000001" and latest_generation(root) == generation
+
+    gen_dir = os.path.join(root, generation)
+    for name, vs in (("English_Collection", eng), ("Indic_Collection", indic)):
+        source = vs._collection.get(include=["embeddings"])
+        mapped = MmapCollection.load(gen_dir, name)
+        assert isinstance(mapped._vectors, np.memmap)
+        assert mapped.count() == 30
+        assert mapped.get()["ids"] == source["ids"]
+        np.testing.assert_array_equal(mapped._vectors, np.asarray(source["embeddings"], dtype=np.float32))
+        picked = ["id-chunk 12", "id-chunk 3"]
+        got = mapped.get(ids=picked, include=["embeddings"])
+        assert got["ids"] == picked
+        expected = vs._collection.get(ids=picked, include=["embeddings"])["embeddings"]
+        np.testing.assert_array_equal(got["embeddings"], np.asarray(expected, dtype=np.float32))
+    assert MmapCollection.load(gen_dir, "Timetable_Collection").count() == 0
+
+
+def test_mapped_query_ranks_like_squared_l2(tmp_path):
+    eng = _store([f"chunk {i}" for i in range(20)])
+    gen_dir = os.path.join(str(tmp_path), export_collections({"English_Collection": eng}, str(tmp_path)))
+    vs = MmapVectorStore.load(gen_dir, "English_Collection", eng.embeddings)
+    q = eng.embeddings.embed_query("chunk 5")
+
+    out = vs._collection.query(query_embeddings=[q], n_results=3, include=[])
+    assert out["ids"][0][0] == "id-chunk 5"
+    assert out["distances"][0][0] == pytest.approx(0.0, abs=1e-6)
+    vectors = np.asarray(eng._collection.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+    expected = np.argsort(((vectors - np.asarray(q, dtype=np.float32)) ** 2).sum(axis=1))[:3]
+    assert out["ids"][0] == [f"id-chunk {i}" for i in expected]
+
+
+def test_new_generation_is_picked_up_and_old_mappings_stay_readable(tmp_path):
+    root = str(tmp_path / "mmap")
+    eng = _store(["alpha", "beta"])
+    first = export_collections({"English_Collection": eng}, root, keep=1)
+    reader = MmapCollection.load(os.path.join(root, first), "English_Collection")
+
+    # Nothing changed: a reader polling LATEST keeps its mapping.
+    assert latest_generation(root) == first
+
+    eng._collection.upsert(ids=["id-gamma"], embeddings=eng.embeddings.embed_documents(["gamma"]))
+    second = export_collections({"English_Collection": eng}, root, keep=1)
+    assert second == "g000002" and latest_generation(root) == second
+    # keep=1 pruned the first generation, but the existing mapping still reads.
+    assert not os.path.exists(os.path.join(root, first))
+    assert reader.get()["ids"] == ["id-alpha", "id-beta"]
+    assert float(np.asarray(reader._vectors).sum()) > 0
+
+    remapped = MmapCollection.load(os.path.join(root, latest_generation(root)), "English_Collection")
+    assert remapped.get()["ids"] == ["id-alpha", "id-beta", "id-gamma"]
+
+
+def test_no_generation_before_the_first_export(tmp_path):
+    assert latest_generation(str(tmp_path / "missing")) is None
+    (tmp_path / "LATEST").write_text("g000009")
+    assert latest_generation(str(tmp_path)) is None
@@ -0,0 +1,77 @@
+import re
+import time
+
+import numpy as np
+import pytest
+
+from response_cache import SemanticResponseCache, answer_language
+
+VOCAB = ["hostel", "fee", "library", "timings", "open", "what", "is", "the", "are"]
+
+
+def embed(text):
+    # Bag of words over a tiny vocabulary; the language prefix is ignored, as a
+    # multilingual model would mostly ignore it next to the question itself.
+    text = re.sub(r"^please answer in [^.]+\.", "", text.lower())
+    words = re.findall(r"\w+", text)
+    return np.array([words.count(w) for w in VOCAB], dtype=np.float32) + 1e-3
+
+
+@pytest.fixture
+def cache():
+    return SemanticResponseCache(embed_fn=embed, threshold=0.85)
+
+
+def test_exact_hit_ignores_case_and_punctuation(cache):
+    cache.put("What is the hostel fee?", "Rs 60,000 per year.")
+    assert cache.get("what is the HOSTEL fee") == ("Rs 60,000 per year.", "exact")
+
+
+def test_semantic_hit_for_close_wording(cache):
+    cache.put("what are the library timings", "8am to 10pm.")
+    assert cache.get("what are library timings") == ("8am to 10pm.", "semantic")
+
+
+def test_semantic_hit_requires_same_answer_language(cache):
+    cache.put("Please answer in Hindi. what is the hostel fee", "छात्रावास शुल्क 60,000 रुपये है।")
+    assert cache.get("what is the hostel fee") == (None, None)
+    assert cache.get("Please answer in English. what is hostel fee") == (None, None)
+    assert cache.get("please answer in hindi. what is hostel fee") == ("छात्रावास शुल्क 60,000 रुपये है।", "semantic")
+
+
+def test_answer_language():
+    assert answer_language("Please answer in Hindi. fees?") == "hindi"
+    assert answer_language("  please answer in Punjabi . fees?") == "punjabi"
+    assert answer_language("fees? Please answer in Hindi.") is None
+
+
+def test_miss_below_threshold(cache):
+    cache.put("hostel fee", "Rs 60,000.")
+    assert cache.get("library open") == (None, None)
+    assert cache.stats()["misses"] == 1
+
+
+def test_answers_from_before_an_invalidation_are_not_cached(cache):
+    generation = cache.generation
+    cache.invalidate()
+    cache.put("hostel fee", "stale answer", generation=generation)
+    assert cache.get("hostel fee") == (None, None)
+
+
+def test_entries_expire():
+    cache = SemanticResponseCache(embed_fn=embed, ttl=0.01)
+    cache.put("hostel fee", "Rs 60,000.")
+    time.sleep(0.02)
+    assert cache.get("hostel fee") == (None, None)
+    assert cache.stats()["expirations"] == 1
+
+
+def test_lru_eviction_by_entry_count():
+    cache = SemanticResponseCache(max_entries=2)
+    cache.put("a question", "1")
+    cache.put("b question", "2")
+    cache.get("a question")
+    cache.put("c question", "3")
+    assert cache.get("b question") == (None, None)
+    assert cache.get("a question") == ("1", "exact")
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    flights = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        started.set()
+        release.wait(2)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.call("k", compute)))
+    leader.start()
+    started.wait(2)
+    followers = [threading.Thread(target=lambda: results.append(flights.call("k", compute))) for _ in range(4)]
+    for t in followers:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(2)
+    assert results == ["answer"] * 5
+    assert runs == [1]
+    assert flights.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_sequential_calls_run_again():
+    flights = SingleFlight("test")
+    assert flights.call("k", lambda: 1) == 1
+    assert flights.call("k", lambda: 2) == 2
+    assert flights.stats()["leaders"] == 2
+
+
+def test_followers_see_every_chunk_of_a_stream():
+    flights = SingleFlight("test")
+    gate = threading.Event()
+
+    def tokens():
+        yield "a"
+        gate.wait(2)
+        yield "b"
+        yield "c"
+
+    leader = flights.stream("k", tokens)
+    assert next(leader) == "a"
+    followed = []
+    follower = threading.Thread(target=lambda: followed.extend(flights.stream("k", tokens)))
+    follower.start()
+    time.sleep(0.05)
+    gate.set()
+    assert list(leader) == ["b", "c"]
+    follower.join(2)
+    assert followed == ["a", "b", "c"]
+
+
+def test_leader_error_reaches_followers():
+    flights = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(2)
+        raise ValueError("ollama down")
+
+    errors = []
+
+    def call():
+        try:
+            flights.call("k", fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    started.wait(2)
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert errors == ["ollama down", "ollama down"]
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_abandoned_leader_without_followers_closes_its_source():
+    flights = SingleFlight("test")
+    closed = []
+
+    def tokens():
+        try:
+            yield "a"
+            yield "b"
+        finally:
+            closed.append(True)
+
+    stream = flights.stream("k", tokens)
+    assert next(stream) == "a"
+    stream.close()
+    assert closed == [True]
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_abandoned_leader_finishes_for_its_followers():
+    flights = SingleFlight("test")
+    gate = threading.Event()
+
+    def tokens():
+        yield "a"
+        gate.wait(2)
+        yield "b"
+
+    leader = flights.stream("k", tokens)
+    next(leader)
+    followed = []
+    follower = threading.Thread(target=lambda: followed.extend(flights.stream("k", tokens)))
+    follower.start()
+    time.sleep(0.05)
+    leader.close()
+    gate.set()
+    follower.join(2)
+    assert followed == ["a", "b"]
+
+
+def test_async_callers_share_one_run():
+    flights = SingleFlight("test")
+    runs = []
+
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flights.acall("k", compute) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert runs == [1]
+    assert flights.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_async_error_reaches_every_caller():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise TimeoutError("generation timed out")
+
+    async def main():
+        return await asyncio.gather(*(flights.acall("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, TimeoutError) for r in results)
+
+
+def test_cancelled_async_leader_does_not_cancel_the_run():
+    flights = SingleFlight("test")
+
+    async def tokens():
+        for t in ("a", "b", "c"):
+            await asyncio.sleep(0.02)
+            yield t
+
+    async def collect():
+        return [t async for t in flights.astream("k", tokens)]
+
+    async def main():
+        leader = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == ["a", "b", "c"]
@@ -0,0 +1,102 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import student_import
+from campus_db import ConnectionPool
+from student_import import InputFormatError, import_students, read_records, validate
+
+CSV = """UID,Name,Section,Nationality,Department,HOD_Contact,Admin_Contact,Fees_Status
+24MCA001,Asha Rao,24MCA-1,domestic,MCA,hod.mca@cu.in,admin@cu.in,Paid
+24MCA002,Ravi Kumar,24MCA-1,International,MCA,hod.mca@cu.in,+91 98765 43210,Pending
+24MCA003,,24MCA-1,Domestic,MCA,,,Paid
+24MCA001,Asha Rao,24MCA-2,Domestic,MCA,hod.mca@cu.in,admin@cu.in,Paid
+"""
+
+
+@pytest.fixture
+def db(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "campus.db"), size=1)
+    pool.execute("""
+        CREATE TABLE students (
+            uid TEXT PRIMARY KEY, name TEXT, section TEXT, nationality TEXT,
+            department TEXT, hod_contact TEXT, admin_contact TEXT, fees_status TEXT
+        )
+    """)
+    yield pool
+    pool.close()
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding="utf-8")
+    return str(path)
+
+
+def test_validate_normalizes_and_rejects():
+    row = validate({"uid": " 24MCA001 ", "name": "Asha", "section": "24MCA-1", "nationality": "domestic"})
+    assert row[:4] == ("24MCA001", "Asha", "24MCA-1", "Domestic")
+    for record, reason in [
+        ({"uid": "1", "name": "A"}, "missing section"),
+        ({"uid": "bad uid!", "name": "A", "section": "S"}, "invalid uid"),
+        ({"uid": "1", "name": "A", "section": "S", "nationality": "martian"}, "nationality"),
+        ({"uid": "1", "name": "A", "section": "S", "hod_contact": "ask the office"}, "hod_contact"),
+        (["not", "a", "dict"], "not an object"),
+    ]:
+        with pytest.raises(ValueError, match=reason):
+            validate(record)
+
+
+def test_csv_import_upserts_and_reports(tmp_path, db):
+    report = import_students(db, read_records(write(tmp_path, "students.csv", CSV)))
+    assert report["read"] == 4 and report["valid"] == 2 and report["invalid"] == 1
+    assert report["duplicates"] == 1 and report["upserted"] == 2
+    assert report["errors"] == ["row 4: missing name"]
+    assert db.fetchone("SELECT section FROM students WHERE uid='24MCA001'")[0] == "24MCA-2"  # last row wins
+
+    again = [(1, {"uid": "24MCA002", "name": "Ravi Kumar", "section": "24MCA-1", "fees_status": "Paid"})]
+    import_students(db, again)
+    assert db.fetchall("SELECT uid, fees_status FROM students ORDER BY uid") == [("24MCA001", "Paid"),
+                                                                                 ("24MCA002", "Paid")]
+
+
+def test_dry_run_writes_nothing(tmp_path, db):
+    report = import_students(db, read_records(write(tmp_path, "students.csv", CSV)), dry_run=True)
+    assert report["valid"] == 2 and report["upserted"] == 0
+    assert db.fetchone("SELECT COUNT(*) FROM students")[0] == 0
+
+
+def test_rows_are_written_in_chunks(tmp_path, db):
+    records = ((n, {"uid": f"U{n:05d}", "name": "S", "section": "A"}) for n in range(2500))
+    report = import_students(db, records, chunk_size=1000)
+    assert report["upserted"] == 2500
+    assert db.fetchone("SELECT COUNT(*) FROM students")[0] == 2500
+
+
+def test_json_and_jsonl_inputs(tmp_path):
+    students = [{"uid": "1", "name": "A", "section": "S"}, {"uid": "2", "name": "B", "section": "S"}]
+    as_json = write(tmp_path, "s.json", json.dumps({"students": students}))
+    as_jsonl = write(tmp_path, "s.jsonl", "\n".join(json.dumps(s) for s in students) + "\n\n")
+    assert [r for _, r in read_records(as_json)] == students
+    assert list(read_records(as_jsonl)) == [(1, students[0]), (2, students[1])]
+
+
+@pytest.mark.parametrize("name, content, message", [
+    ("s.csv", "uid,name\n1,A\n", "missing required columns: section"),
+    ("s.json", '{"rows": []}', "must be a list"),
+    ("s.xlsx", "", "Unsupported file type"),
+])
+def test_unreadable_inputs_raise_input_format_error(tmp_path, name, content, message):
+    with pytest.raises(InputFormatError, match=message):
+        list(read_records(write(tmp_path, name, content)))
+
+
+def test_cli_strict_writes_nothing_when_a_row_is_invalid(tmp_path, db):
+    path = write(tmp_path, "students.csv", CSV)
+    cli = [sys.executable, student_import.__file__, path, "--db", str(tmp_path / "campus.db"), "--strict"]
+    result = subprocess.run(cli, capture_output=True, text=True)
+    assert result.returncode == 1
+    assert "1 invalid" in result.stdout
+    assert db.fetchone("SELECT COUNT(*) FROM students")[0] == 0
@@ -0,0 +1,160 @@
+import json
+from types import SimpleNamespace
+
+import timetable_extract
+from timetable_extract import diff_timetables, extract_page, parse_cell, run_extraction, validate
+
+# Column x-ranges: the day column, then three period columns.
+DAY_COL = (0, 50)
+PERIOD_COLS = [(50, 100), (100, 150), (150, 200)]
+HEADER = ["Day", "9:00 - 9:50", "9:50 - 10:40", "10:40 - 11:30"]
+
+
+def _bbox(x0, x1, top=0):
+    return (x0, top, x1, top + 20)
+
+
+class FakeTable:
+    """The slice of pdfplumber's Table that extract_page reads: rows[].cells and extract()."""
+
+    def __init__(self, rows):
+        # rows: [[(x0, x1, text) or None, ...]]; None marks the continuation of a merged cell.
+        self.rows = [SimpleNamespace(cells=[_bbox(c[0], c[1]) if c else None for c in row]) for row in rows]
+        self._texts = [[c[2] if c else None for c in row] for row in rows]
+
+    def extract(self):
+        return self._texts
+
+
+class FakePage:
+    def __init__(self, heading, rows, page_number=1):
+        self.page_number = page_number
+        self._text = f"{heading}\nUniversity Institute of Computing\n"
+        self._tables = [FakeTable(rows)] if rows else []
+
+    def extract_text(self):
+        return self._text
+
+    def find_tables(self):
+        return self._tables
+
+
+def _header_row():
+    cols = [DAY_COL] + PERIOD_COLS
+    return [(x0, x1, text) for (x0, x1), text in zip(cols, HEADER)]
+
+
+def _page():
+    (p1, p2, p3) = PERIOD_COLS
+    return FakePage("24MCA-1 (Semester 3)", [
+        _header_row(),
+        # A two-period lab merged across periods 1-2 (the covered cell is None).
+        [(*DAY_COL, "Mon"), (p1[0], p2[1], "Lab-313_Block-E1\nDatabase Lab\nDr. Meena Sharma_E12345"), None,
+         (*p3, "Lunch")],
+        # Parallel lab groups on two rows; the day cell is merged down, so it is None.
+        [(*DAY_COL, "Tue"), (*p1, "Multi_Lab-313_Block-E1 A\nPython Lab\nMr. Arjun Rao_E2231"),
+         (*p2, "D2-201\nOperating Systems\nMs. Priya Nair"), (*p3, "")],
+        [None, (*p1, "Multi_Lab-314_Block-E1 B\nPython Lab\nMs. Kavya Iyer_AB7")],
+    ])
+
+
+def test_parse_cell_splits_room_subject_and_faculty():
+    entry = parse_cell("D2-201\nData Structures and\nAlgorithms\nDr. Meena Sharma_E12345")
+    assert entry == {"room": "D2-201", "group": "", "subject": "Data Structures and Algorithms",
+                     "faculty": "Dr. Meena Sharma"}
+
+
+def test_parse_cell_reads_lab_groups_and_drops_employee_ids():
+    entry = parse_cell("Multi_Lab-313_Block-E1 A, B\nPython Lab\nMr. Arjun Rao_E2231 Ms. Kavya Iyer_AB7")
+    assert entry["room"] == "Multi_Lab-313_Block-E1"
+    assert entry["group"] == "A, B"
+    assert entry["faculty"] == "Mr. Arjun Rao Ms. Kavya Iyer"
+
+
+def test_parse_cell_skips_empty_and_lunch_cells():
+    assert parse_cell(None) is None
+    assert parse_cell("  \n ") is None
+    assert parse_cell("LUNCH") is None
+    assert parse_cell("Library") == {"room": "", "group": "", "subject": "Library", "faculty": ""}
+
+
+def test_extract_page_spans_merged_multi_period_cells():
+    section, days, warnings = extract_page(_page())
+    assert section == "24MCA-1" and warnings == []
+    assert days["Monday"] == [{
+        "room": "Lab-313_Block-E1", "group": "", "subject": "Database Lab", "faculty": "Dr. Meena Sharma",
+        "time": "9:00 - 10:40", "periods": [1, 2],
+    }]
+
+
+def test_extract_page_keeps_parallel_group_rows_under_the_same_day():
+    _, days, _ = extract_page(_page())
+    tuesday = days["Tuesday"]
+    assert [(e["subject"], e["periods"], e["room"]) for e in tuesday] == [
+        ("Python Lab (Group A)", [1], "Multi_Lab-313_Block-E1"),
+        ("Python Lab (Group B)", [1], "Multi_Lab-314_Block-E1"),
+        ("Operating Systems", [2], "D2-201"),
+    ]
+    assert [e["faculty"] for e in tuesday[:2]] == ["Mr. Arjun Rao", "Ms. Kavya Iyer"]
+
+
+def test_extract_page_without_a_grid_is_reported():
+    section, days, warnings = extract_page(FakePage("Notice board", [], page_number=4))
+    assert section is None and days == {}
+    assert warnings == ["page 4: no section header or timetable grid found"]
+
+
+def test_validate_allows_parallel_groups_but_flags_section_overlaps():
+    _, days, _ = extract_page(_page())
+    errors, warnings = validate({"24MCA-1": days}, known_sections=["24MCA-1", "24MCA-2"])
+    assert errors == []
+    assert warnings == ["sections with students but no timetable: 24MCA-2"]
+
+    days["Tuesday"].append({"room": "D2-105", "group": "", "subject": "Seminar", "faculty": "",
+                            "time": "9:00 - 9:50", "periods": [1]})
+    _, warnings = validate({"24MCA-1": days})
+    assert any("period 1" in w and "Seminar" in w for w in warnings)
+
+
+def test_validate_errors_block_publishing(tmp_path, monkeypatch):
+    assert validate({})[0] == ["no sections extracted"]
+    assert validate({"24MCA-1": {"Monday": []}})[0] == ["24MCA-1: no entries"]
+
+    json_path = tmp_path / "timetable_structured.json"
+    json_path.write_text(json.dumps({"24MCA-1": {"Monday": [{"time": "9:00 - 9:50", "subject": "Old"}]}}))
+    monkeypatch.setattr(timetable_extract, "extract_timetable",
+                        lambda pdf: ({"24MCA-1": {"Monday": []}}, []))
+    report = run_extraction("timetable.pdf", str(json_path), progress=lambda msg: None)
+    assert report["errors"] == ["24MCA-1: no entries"]
+    assert report["published"] is False
+    assert json.loads(json_path.read_text())["24MCA-1"]["Monday"][0]["subject"] == "Old"
+    assert not (tmp_path / "timetable_structured.prev.json").exists()
+
+
+def test_clean_extraction_is_published_and_keeps_the_previous_version(tmp_path, monkeypatch):
+    _, days, _ = extract_page(_page())
+    json_path = tmp_path / "timetable_structured.json"
+    json_path.write_text(json.dumps({"24MCA-1": {}}))
+    monkeypatch.setattr(timetable_extract, "extract_timetable", lambda pdf: ({"24MCA-1": days}, []))
+    report = run_extraction("timetable.pdf", str(json_path), progress=lambda msg: None)
+    assert report["published"] is True and report["entries"] == 4
+    assert json.loads(json_path.read_text())["24MCA-1"]["Monday"][0]["subject"] == "Database Lab"
+    assert json.loads((tmp_path / "timetable_structured.prev.json").read_text()) == {"24MCA-1": {}}
+
+
+def test_diff_reports_sections_and_per_day_entry_changes():
+    _, days, _ = extract_page(_page())
+    old = {"24MCA-1": json.loads(json.dumps(days)), "23MCA-2": {"Friday": []}}
+    new = {"24MCA-1": json.loads(json.dumps(days)), "24MCA-3": {"Monday": []}}
+    new["24MCA-1"]["Tuesday"][2] = {**new["24MCA-1"]["Tuesday"][2], "room": "D2-202"}
+    new["24MCA-1"]["Wednesday"] = [{"time": "9:00 - 9:50", "subject": "Cloud Computing", "room": "D1-101"}]
+
+    assert diff_timetables(old, new) == {
+        "added_sections": ["24MCA-3"],
+        "removed_sections": ["23MCA-2"],
+        "changed_sections": {"24MCA-1": {
+            "Tuesday": {"added": 1, "removed": 1},
+            "Wednesday": {"added": 1, "removed": 0},
+        }},
+    }
+    assert diff_timetables(new, new) == {"added_sections": [], "removed_sections": [], "changed_sections": {}}
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import pytest
+
+from timetable_index import TimetableIndex, parse_timetable_query, parse_slot_time, room_parts
+
+# Room strings as timetable_extract produces them from timetable.pdf.
+STRUCTURED = {
+    "24MAM-4": {
+        "Monday": [
+            {"time": "9:55 - 10:40", "subject": "Machine Learning Lab", "faculty": "Dr. Rao",
+             "room": "Multi_Lab-313_Block-E1"},
+            {"time": "10:40 - 11:25", "subject": "Algorithms", "faculty": "Dr. Sen", "room": "Lect-Hall-211_Block-E1"},
+        ],
+    },
+    "25MCA-1": {
+        "Monday": [
+            {"time": "9:55 - 10:40", "subject": "Web Programming", "faculty": "Ms. Jain",
+             "room": "Lecture Hall -226_Block-E2"},
+            {"time": "11:25 - 12:10", "subject": "IoT", "faculty": "Mr. Das", "room": "Lecture Hall -224_Block-E2A"},
+            {"time": "12:10 - 12:55", "subject": "DBMS", "faculty": "Mr. Das", "room": "Lect-Hall-224_Block-E1"},
+        ],
+    },
+}
+MONDAY_10 = datetime(2026, 10, 19, 10, 0)
+
+
+@pytest.fixture
+def index():
+    return TimetableIndex.from_structured(STRUCTURED)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Lect-Hall-211_Block-E1", ("211", "E1")),
+    ("Lecture Hall -224_Block-E2A", ("224", "E2A")),
+    ("Hardware Lab -209_Block-E1", ("209", "E1")),
+    ("E1-313", ("313", "E1")),
+    ("B-204", ("204", "B")),
+    ("226", ("226", None)),
+])
+def test_room_parts(text, expected):
+    assert room_parts(text) == expected
+
+
+@pytest.mark.parametrize("query, room", [
+    ("where is room 226 now", "226"),
+    ("room 211", "211"),
+    ("room E1-313", "E1-313"),
+    ("room 313 block e1", "313 BLOCK E1"),
+    ("कमरा 226", "226"),
+])
+def test_room_queries_parse(query, room):
+    tq = parse_timetable_query(query)
+    assert tq.kind == "room" and tq.room == room
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("where is room 226 now", "Web Programming"),
+    ("room 211", "free right now. Next: Algorithms"),
+    ("room 313", "Machine Learning Lab"),
+    ("room E1-313", "Machine Learning Lab"),
+    ("room E2-224", "Next: IoT"),
+])
+def test_render_room_matches_extracted_names(index, query, expected):
+    assert expected in index.render_room(parse_timetable_query(query).room, now=MONDAY_10)
+
+
+def test_room_in_two_blocks_asks_for_block(index):
+    assert "exists in blocks E1, E2" in index.render_room("224", now=MONDAY_10)
+
+
+def test_unknown_room(index):
+    assert "not in the structured timetable" in index.render_room("E3-313", now=MONDAY_10)
+
+
+def test_section_lookup_is_normalized(index):
+    assert index.has_section("24mam 4")
+    assert "Algorithms" in index.render_day("24MAM–4", "monday", "Asha")
+
+
+def test_next_and_now(index):
+    assert "Algorithms today" in index.render_next("24MAM-4", "Asha", now=datetime(2026, 10, 19, 10, 30))
+    assert "Machine Learning Lab" in index.render_now("24MAM-4", "Asha", now=MONDAY_10)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("9:00-10:00", (540, 600)),
+    ("2-3 PM", (840, 900)),
+    ("11-12 PM", (660, 720)),
+    ("09.50 am – 10.40 am", (590, 640)),
+    ("TBA", None),
+])
+def test_parse_slot_time(text, expected):
+    assert parse_slot_time(text) == expected
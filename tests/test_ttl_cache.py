@@ -0,0 +1,42 @@
+import time
+
+from ttl_cache import MISSING, TTLCache
+
+
+def test_miss_is_distinct_from_a_cached_none():
+    cache = TTLCache()
+    assert cache.get("unknown") is MISSING
+    cache.set("uid-1", None)
+    assert cache.get("uid-1") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(ttl=0.02)
+    cache.set("a", 1)
+    cache.set_many([("b", 2), ("c", 3)])
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    time.sleep(0.03)
+    assert cache.get("a") is MISSING and cache.get("b") is MISSING
+    assert cache.stats()["entries"] == 1
+
+
+def test_oldest_entries_are_evicted_past_max_entries():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 10)  # replacing a key never evicts
+    cache.set("c", 3)
+    assert cache.get("a") is MISSING and cache.get("b") == 2 and cache.get("c") == 3
+    cache.set_many([("d", 4), ("e", 5), ("f", 6)])
+    assert [cache.get(k) for k in "def"] == [MISSING, 5, 6]
+
+
+def test_delete_and_clear():
+    cache = TTLCache()
+    cache.set_many([("a", 1), ("b", 2)])
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.get("a") is MISSING and cache.get("b") == 2
+    cache.clear()
+    assert cache.stats()["entries"] == 0
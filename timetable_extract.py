@@ -0,0 +1,243 @@
+# timetable_extract.py
+# Extracts timetable.pdf (one page per section, a day x period grid) into the
+# section -> day -> entries JSON that timetable_index compiles, with a
+# validation report and a diff against the previously published JSON.
+# Needs pdfplumber for the table geometry; without it nothing is published.
+import argparse
+import json
+import os
+import re
+
+from timetable_index import DAYS, canonical_day, parse_slot_time
+
+_SECTION_RE = re.compile(r"^\s*(\d{2}[A-Z]{2,6}-\d{1,3})\b")
+_PERIOD_RE = re.compile(r"(\d{1,2}[:.]\d{2})\s*-\s*(\d{1,2}[:.]\d{2})")
+# Trailing lab group on the room line: "Multi_Lab-313_Block-E1 A, B".
+_GROUP_RE = re.compile(r"\s+([A-Z](?:\s*,\s*[A-Z])*)$")
+_FACULTY_RE = re.compile(r"^(Mr|Ms|Mrs|Dr|Prof|Er)\.?\s")
+_EMPLOYEE_ID_RE = re.compile(r"_[A-Z]{1,2}\d+\b")
+_SKIP_CELLS = {"lunch", "break", "recess"}
+
+
+def _day_of(label):
+    label = (label or "").strip().lower()
+    return canonical_day(label) or next((d for d in DAYS if label and d.lower().startswith(label[:2])), None)
+
+
+def parse_cell(text):
+    """``{"room", "group", "subject", "faculty"}`` from a grid cell, or None for empty/lunch cells."""
+    lines = [line.strip() for line in (text or "").splitlines() if line.strip()]
+    if not lines or lines[0].lower() in _SKIP_CELLS:
+        return None
+    room, group = (lines[0], "") if len(lines) > 1 else ("", "")
+    m = _GROUP_RE.search(room)
+    if m:
+        room, group = room[:m.start()].strip(), re.sub(r"\s*,\s*", ", ", m.group(1))
+    rest = lines[1:] if room else lines
+    split = next((i for i, line in enumerate(rest) if _FACULTY_RE.match(line)), len(rest))
+    return {
+        "room": room,
+        "group": group,
+        "subject": " ".join(rest[:split]),
+        "faculty": _EMPLOYEE_ID_RE.sub("", " ".join(rest[split:])).strip(),
+    }
+
+
+def _periods(header_cells, header_texts):
+    """``[(x_center, start, end)]`` per period column of the header row."""
+    periods = []
+    for bbox, text in zip(header_cells, header_texts):
+        m = _PERIOD_RE.search(text or "")
+        if bbox and m:
+            periods.append(((bbox[0] + bbox[2]) / 2, m.group(1), m.group(2)))
+    return periods
+
+
+def extract_page(page):
+    """``(section, {day: [entry, ...]}, warnings)`` for one PDF page."""
+    warnings = []
+    text = page.extract_text() or ""
+    first = next((line for line in text.splitlines() if line.strip()), "")
+    m = _SECTION_RE.match(first)
+    section = m.group(1) if m else None
+    tables = page.find_tables()
+    if not section or not tables:
+        return None, {}, [f"page {page.page_number}: no section header or timetable grid found"]
+    table = max(tables, key=lambda t: len(t.rows))
+    texts = table.extract()
+    periods = _periods(table.rows[0].cells, texts[0])
+    if not periods:
+        return section, {}, [f"page {page.page_number} ({section}): no period/time header row"]
+
+    days = {}
+    day = None
+    for row, row_texts in zip(table.rows[1:], texts[1:]):
+        if row.cells[0] is not None:
+            day = _day_of(row_texts[0])
+        if day is None:
+            continue
+        for bbox, cell_text in zip(row.cells[1:], row_texts[1:]):
+            entry = parse_cell(cell_text) if bbox else None
+            if entry is None:
+                continue
+            # Merged cells span several periods; the cell's x-range says which.
+            covered = [i for i, (x, _, _) in enumerate(periods) if bbox[0] <= x <= bbox[2]]
+            if not covered:
+                warnings.append(f"{section} {day}: cell outside the period columns: {entry['subject']!r}")
+                continue
+            entry["time"] = f"{periods[covered[0]][1]} - {periods[covered[-1]][2]}"
+            entry["periods"] = [i + 1 for i in covered]
+            if entry["group"]:
+                entry["subject"] = f"{entry['subject']} (Group {entry['group']})"
+            days.setdefault(day, []).append(entry)
+    for entries in days.values():
+        entries.sort(key=lambda e: (e["periods"][0], e["group"]))
+    return section, days, warnings
+
+
+def extract_timetable(pdf_path):
+    """``(data, warnings)`` for the whole PDF; raises RuntimeError without pdfplumber."""
+    try:
+        import pdfplumber
+    except ImportError:
+        raise RuntimeError("pdfplumber is not installed; cannot extract timetable tables") from None
+    data, warnings = {}, []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            section, days, page_warnings = extract_page(page)
+            warnings += page_warnings
+            if not section:
+                continue
+            if section in data:
+                warnings.append(f"{section}: appears on more than one page; entries merged")
+                for day, entries in days.items():
+                    data[section].setdefault(day, []).extend(entries)
+            else:
+                data[section] = days
+    return data, warnings
+
+
+def validate(data, known_sections=()):
+    """``(errors, warnings)``; any error means the extraction must not be published."""
+    errors, warnings = [], []
+    if not data:
+        errors.append("no sections extracted")
+    for section, days in data.items():
+        if not any(days.values()):
+            errors.append(f"{section}: no entries")
+        for day, entries in days.items():
+            for e in entries:
+                if parse_slot_time(e.get("time")) is None:
+                    warnings.append(f"{section} {day}: unparseable time {e.get('time')!r}")
+                if not e.get("subject"):
+                    warnings.append(f"{section} {day} {e.get('time')}: missing subject")
+                if not e.get("room"):
+                    warnings.append(f"{section} {day} {e.get('time')}: missing room")
+            # Parallel lab groups (A / B) may share a period; the whole section may not.
+            by_period = {}
+            for e in entries:
+                groups = frozenset(g.strip() for g in e.get("group", "").split(",") if g.strip())
+                for p in e.get("periods", []):
+                    for other_groups, other in by_period.get(p, []):
+                        if not groups or not other_groups or groups & other_groups:
+                            warnings.append(f"{section} {day} period {p}: {other!r} overlaps {e.get('subject')!r}")
+                    by_period.setdefault(p, []).append((groups, e.get("subject")))
+    missing = sorted({s for s in known_sections if s} - set(data))
+    if missing:
+        warnings.append(f"sections with students but no timetable: {', '.join(missing)}")
+    return errors, warnings
+
+
+def _entry_key(e):
+    return (e.get("time", ""), e.get("subject", ""), e.get("faculty", ""), e.get("room", ""))
+
+
+def diff_timetables(old, new):
+    """Sections added/removed, and per changed section the entries added/removed per day."""
+    old, new = old or {}, new or {}
+    changed = {}
+    for section in sorted(set(old) & set(new)):
+        days = {}
+        for day in sorted(set(old[section]) | set(new[section]), key=lambda d: DAYS.index(d) if d in DAYS else 7):
+            before = {_entry_key(e) for e in old[section].get(day, [])}
+            after = {_entry_key(e) for e in new[section].get(day, [])}
+            if before != after:
+                days[day] = {"added": len(after - before), "removed": len(before - after)}
+        if days:
+            changed[section] = days
+    return {"added_sections": sorted(set(new) - set(old)), "removed_sections": sorted(set(old) - set(new)),
+            "changed_sections": changed}
+
+
+def format_report(report):
+    lines = [f"Sections: {report['sections']}, entries: {report['entries']}, published: {report['published']}"]
+    lines += [f"ERROR: {e}" for e in report["errors"]]
+    lines += [f"warning: {w}" for w in report["warnings"]]
+    diff = report.get("diff")
+    if diff:
+        if diff["added_sections"]:
+            lines.append("New sections: " + ", ".join(diff["added_sections"]))
+        if diff["removed_sections"]:
+            lines.append("Removed sections: " + ", ".join(diff["removed_sections"]))
+        for section, days in diff["changed_sections"].items():
+            lines.append(f"Changed {section}: " + "; ".join(
+                f"{d} +{c['added']} -{c['removed']}" for d, c in days.items()))
+        if not any(diff.values()):
+            lines.append("No changes against the previous timetable.")
+    return "\n".join(lines)
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading previous structured timetable {path}: {e}")
+        return {}
+
+
+def publish(data, json_path):
+    """Atomically replace ``json_path``, keeping the previous version as ``*.prev.json``."""
+    if os.path.exists(json_path):
+        os.replace(json_path, json_path[:-5] + ".prev.json" if json_path.endswith(".json") else json_path + ".prev")
+    tmp = f"{json_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, json_path)
+
+
+def run_extraction(pdf_path, json_path, known_sections=(), dry_run=False, progress=print):
+    """Extract, validate, diff and (unless there are errors or ``dry_run``) publish."""
+    progress(f"Extracting tables from {os.path.basename(pdf_path)}")
+    data, warnings = extract_timetable(pdf_path)
+    errors, more_warnings = validate(data, known_sections)
+    report = {
+        "sections": len(data),
+        "entries": sum(len(entries) for days in data.values() for entries in days.values()),
+        "errors": errors,
+        "warnings": warnings + more_warnings,
+        "diff": diff_timetables(_load_json(json_path), data),
+        "published": False,
+    }
+    progress(f"Extracted {report['sections']} sections, {report['entries']} entries, "
+             f"{len(errors)} errors, {len(report['warnings'])} warnings")
+    if not errors and not dry_run:
+        publish(data, json_path)
+        report["published"] = True
+        progress(f"Published {json_path}")
+    return report
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Extract timetable.pdf into structured timetable JSON.")
+    parser.add_argument("pdf")
+    parser.add_argument("json", nargs="?", default=os.path.join("data", "timetable_structured.json"))
+    parser.add_argument("--dry-run", action="store_true", help="report and diff only, do not publish")
+    args = parser.parse_args()
+    print(format_report(run_extraction(args.pdf, args.json, dry_run=args.dry_run)))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,311 @@
+# timetable_index.py
+# Compiled form of timetable_structured.json: sections, days and time slots are
+# normalized once on reload and the per-section/day replies are prerendered, so
+# timetable lookups are dict hits that never touch the LLM or the embedder.
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+WEEK_DAYS = DAYS[:5]
+
+# Alias -> canonical day: English (full/short), Hindi, Marathi and romanized Hindi.
+DAY_ALIASES = {
+    **{d.lower(): d for d in DAYS},
+    "mon": "Monday", "tue": "Tuesday", "tues": "Tuesday", "wed": "Wednesday", "thu": "Thursday",
+    "thur": "Thursday", "thurs": "Thursday", "fri": "Friday", "sat": "Saturday", "sun": "Sunday",
+    "सोमवार": "Monday", "मंगलवार": "Tuesday", "मंगळवार": "Tuesday", "बुधवार": "Wednesday",
+    "गुरुवार": "Thursday", "बृहस्पतिवार": "Thursday", "शुक्रवार": "Friday", "शनिवार": "Saturday",
+    "रविवार": "Sunday",
+    "somvar": "Monday", "somwar": "Monday", "mangalvar": "Tuesday", "mangalwar": "Tuesday",
+    "budhvar": "Wednesday", "budhwar": "Wednesday", "guruvar": "Thursday", "guruwar": "Thursday",
+    "brihaspativar": "Thursday", "shukravar": "Friday", "shukrawar": "Friday",
+    "shanivar": "Saturday", "shaniwar": "Saturday", "ravivar": "Sunday", "raviwar": "Sunday",
+}
+# Alias -> offset from today. "kal"/"कल" can mean either direction; for a timetable it is tomorrow.
+RELATIVE_DAYS = {
+    "today": 0, "aaj": 0, "आज": 0,
+    "tomorrow": 1, "tmrw": 1, "kal": 1, "कल": 1, "उद्या": 1,
+    "parso": 2, "परसों": 2,
+}
+
+_WORD_RE = re.compile(r"[^\s.,!?;:()\"']+")
+_DAY_AFTER_RE = re.compile(r"\bday after tomorrow\b")
+_NEXT_RE = re.compile(r"\bnext (class|lecture|period)\b|\bagl[ie] (class|lecture|period)\b|अगली (कक्षा|क्लास|लेक्चर)|पुढील (तास|लेक्चर)")
+_NOW_RE = re.compile(
+    r"\b(current|ongoing) (class|lecture|period)\b|\b(class|lecture|period) (right )?now\b"
+    r"|\bwhere is my (class|lecture)\b|\babhi\b.*\b(class|lecture)\b|अभी .*(कक्षा|क्लास|लेक्चर)")
+# "room 226", "room E1-313", "room b204", "room 313 block e1", "कमरा 226".
+_ROOM_RE = re.compile(
+    r"(?:\broom|कमरा)\s*(?:no\.?|number|नंबर)?\s*"
+    r"((?:[a-z]{1,2}\d?\s?[-/]\s?|[a-z]{1,2}\s?)?\d{2,4}[a-z]?(?:\s*(?:in\s+)?block[\s-]*[a-z]\d*[a-z]?)?)\b")
+_BLOCK_RE = re.compile(r"BLOCK[\s_-]*([A-Z]\d*[A-Z]?)\b")
+_ROOM_NUMBER_RE = re.compile(r"(?<!\d)\d{2,4}(?!\d)")
+_BLOCK_PREFIX_RE = re.compile(r"(?:^|[^A-Z0-9])([A-Z]{1,2}\d?)\s*[-/]?\s*$")
+_TIME_RE = re.compile(
+    r"(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?\s*(?:-|–|—|to)\s*(\d{1,2})(?:[:.](\d{2}))?\s*(am|pm)?", re.I)
+
+
+def normalize_code(text):
+    """Lookup key for sections and rooms: "24mam 4", "24MAM–4" and "24MAM-4" all -> "24MAM4"."""
+    return "".join(ch for ch in str(text or "").upper() if ch.isalnum())
+
+
+def room_parts(text):
+    """``(number, block)`` of a room name or query: "Lect-Hall-211_Block-E1" -> ("211", "E1"),
+    "E1-313" -> ("313", "E1"), "B-204" -> ("204", "B"), "226" -> ("226", None)."""
+    s = str(text or "").upper()
+    block = None
+    m = _BLOCK_RE.search(s)
+    if m:
+        block = m.group(1)
+        s = s[:m.start()] + " " + s[m.end():]
+    numbers = list(_ROOM_NUMBER_RE.finditer(s))
+    if not numbers:
+        return None, block
+    number = numbers[-1]
+    if block is None:
+        prefix = _BLOCK_PREFIX_RE.search(s[:number.start()])
+        if prefix:
+            block = prefix.group(1)
+    return number.group(0), block
+
+
+def _block_family(block):
+    # "E2A"/"E2B" are lab groups inside block E2.
+    m = re.match(r"[A-Z]\d*", block or "")
+    return m.group(0) if m else None
+
+
+def canonical_day(name):
+    return DAY_ALIASES.get(str(name or "").strip().lower())
+
+
+def _minutes(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem.lower() == "pm" else 0)
+    elif 1 <= hour <= 7:
+        hour += 12
+    return hour * 60 + minute
+
+
+def parse_slot_time(text):
+    """``(start, end)`` minutes since midnight for "9:00-10:00", "2-3 PM", "09.50 am – 10.40 am"; else None.
+
+    Bare hours 1-7 are afternoon classes (college day runs roughly 8:00-19:00).
+    """
+    m = _TIME_RE.search(str(text or ""))
+    if not m:
+        return None
+    h1, m1, mer1, h2, m2, mer2 = m.groups()
+    # "2-3 PM" shares the meridiem; "11-12 PM" starts in the morning.
+    start = _minutes(h1, m1, mer1 or mer2)
+    end = _minutes(h2, m2, mer2)
+    if start >= end and not mer1 and mer2:
+        start = _minutes(h1, m1, "am")
+    if not (0 <= start < end <= 24 * 60):
+        return None
+    return start, end
+
+
+@dataclass(frozen=True)
+class Slot:
+    day: str
+    start: object  # minutes since midnight, or None if the time string could not be parsed
+    end: object
+    time: str
+    subject: str
+    faculty: str
+    room: str
+
+    def line(self):
+        return f"{self.time} | {self.subject} | {self.faculty} | {self.room}"
+
+
+@dataclass(frozen=True)
+class TimetableQuery:
+    kind: str  # "day" | "week" | "next" | "now" | "room"
+    day: object = None
+    room: object = None
+
+
+def resolve_day(query, now=None):
+    """Canonical day named in ``query`` (weekday names first, then today/tomorrow/...), or None."""
+    q = str(query or "").lower()
+    words = _WORD_RE.findall(q)
+    for w in words:
+        if w in DAY_ALIASES and (len(w) > 3 or w in ("mon", "tue", "wed", "thu", "fri", "sat", "sun")):
+            return DAY_ALIASES[w]
+    offset = 2 if _DAY_AFTER_RE.search(q) else next((RELATIVE_DAYS[w] for w in words if w in RELATIVE_DAYS), None)
+    if offset is None:
+        return None
+    return DAYS[((now or datetime.now()) + timedelta(days=offset)).weekday()]
+
+
+def parse_timetable_query(query, now=None):
+    q = str(query or "").lower()
+    room = _ROOM_RE.search(q)
+    if room:
+        return TimetableQuery("room", room=room.group(1).strip().upper())
+    if _NEXT_RE.search(q):
+        return TimetableQuery("next")
+    if _NOW_RE.search(q):
+        return TimetableQuery("now")
+    day = resolve_day(q, now)
+    return TimetableQuery("day" if day else "week", day=day)
+
+
+class TimetableIndex:
+    """Immutable once built; ``reload_timetable_structured`` swaps in a new one."""
+
+    def __init__(self, sections, rooms, rendered_days, rendered_weeks):
+        self._sections = sections
+        self._rooms = rooms
+        self._rendered_days = rendered_days
+        self._rendered_weeks = rendered_weeks
+        # Room number -> [(block, room key)]: extracted names such as "Lect-Hall-211_Block-E1"
+        # are found by "room 211" or "room E1-211".
+        self._room_numbers = {}
+        for key, slots in rooms.items():
+            number, block = room_parts(slots[0][0].room)
+            if number:
+                self._room_numbers.setdefault(number, []).append((block, key))
+
+    @classmethod
+    def from_structured(cls, data):
+        """Compile ``{section: {day: [{"time", "subject", "faculty", "room"}, ...]}}``."""
+        sections, rooms, rendered_days, rendered_weeks = {}, {}, {}, {}
+        for raw_section, schedule in (data or {}).items():
+            if not isinstance(schedule, dict):
+                continue
+            key = normalize_code(raw_section)
+            days = {}
+            for raw_day, entries in schedule.items():
+                day = canonical_day(raw_day)
+                if day is None or not isinstance(entries, list):
+                    continue
+                for e in entries:
+                    if not isinstance(e, dict):
+                        continue
+                    time_text = str(e.get("time", ""))
+                    span = parse_slot_time(time_text)
+                    slot = Slot(day, span[0] if span else None, span[1] if span else None, time_text,
+                                str(e.get("subject", "")), str(e.get("faculty", "")), str(e.get("room", "")))
+                    days.setdefault(day, []).append(slot)
+                    if slot.room:
+                        rooms.setdefault(normalize_code(slot.room), []).append((slot, str(raw_section)))
+            # Source order is kept for unparseable times; otherwise slots are sorted by start time.
+            days = {d: tuple(sorted(s, key=lambda x: x.start if x.start is not None else -1))
+                    if all(x.start is not None for x in s) else tuple(s) for d, s in days.items()}
+            sections[key] = {"name": str(raw_section), "days": days}
+            for day, slots in days.items():
+                lines = "".join(f"- {s.line()}\n" for s in slots)
+                rendered_days[(key, day)] = (
+                    f" — Timetable for {raw_section} ({day}):\n{lines}\n(Source: Structured Timetable)")
+            week = f" — Timetable for {raw_section} (Mon–Fri):\n\n"
+            for day in WEEK_DAYS:
+                if day in days:
+                    week += f"▶️ {day}:\n" + "".join(f"   - {s.line()}\n" for s in days[day]) + "\n"
+            rendered_weeks[key] = week + "(Source: Structured Timetable)"
+        rooms = {r: tuple(sorted(v, key=lambda x: (DAYS.index(x[0].day), x[0].start or 0))) for r, v in rooms.items()}
+        return cls(sections, rooms, rendered_days, rendered_weeks)
+
+    def __len__(self):
+        return len(self._sections)
+
+    def has_section(self, section):
+        return normalize_code(section) in self._sections
+
+    def stats(self) -> dict:
+        return {"sections": len(self._sections), "rooms": len(self._rooms),
+                "slots": sum(len(s) for sec in self._sections.values() for s in sec["days"].values())}
+
+    def render_day(self, section, day, name):
+        rendered = self._rendered_days.get((normalize_code(section), canonical_day(day)))
+        if rendered is None:
+            return f"⚠️ No entries for {canonical_day(day) or str(day).capitalize()} in structured timetable."
+        return f"📅 {name}{rendered}"
+
+    def render_week(self, section, name):
+        return f"📅 {name}{self._rendered_weeks[normalize_code(section)]}"
+
+    def _upcoming(self, days, now):
+        """Slots from ``now`` on: the rest of today, then the following six days."""
+        minute = now.hour * 60 + now.minute
+        for offset in range(7):
+            day = DAYS[(now.weekday() + offset) % 7]
+            for slot in days.get(day, ()):
+                if slot.start is not None and (offset or slot.start >= minute):
+                    yield offset, slot
+
+    def render_next(self, section, name, now=None):
+        now = now or datetime.now()
+        sec = self._sections[normalize_code(section)]
+        for offset, s in self._upcoming(sec["days"], now):
+            when = "today" if offset == 0 else ("tomorrow" if offset == 1 else f"on {s.day}")
+            return (f"⏭️ {name}, your next class ({sec['name']}) is {s.subject} {when} at {s.time} "
+                    f"in {s.room} with {s.faculty}.\n\n(Source: Structured Timetable)")
+        return f"⚠️ No upcoming classes found for {sec['name']} in structured timetable."
+
+    def render_now(self, section, name, now=None):
+        now = now or datetime.now()
+        sec = self._sections[normalize_code(section)]
+        minute = now.hour * 60 + now.minute
+        for s in sec["days"].get(DAYS[now.weekday()], ()):
+            if s.start is not None and s.start <= minute < s.end:
+                return (f"🕘 {name}, right now ({sec['name']}, {s.day}) you have {s.subject} in {s.room} "
+                        f"({s.time}) with {s.faculty}.\n\n(Source: Structured Timetable)")
+        return f"🕘 {name}, you have no class right now.\n\n" + self.render_next(section, name, now)
+
+    def _room_keys(self, room):
+        """Keys of the rooms ``room`` names: an exact name, else its number (within its block, if given)."""
+        key = normalize_code(room)
+        if key in self._rooms:
+            return [key]
+        number, block = room_parts(room)
+        candidates = self._room_numbers.get(number, [])
+        if block:
+            candidates = [c for c in candidates if c[0] and c[0].startswith(block)]
+        return [k for _, k in candidates]
+
+    def render_room(self, room, now=None):
+        now = now or datetime.now()
+        keys = self._room_keys(room)
+        if not keys:
+            return f"⚠️ Room {room} is not in the structured timetable."
+        blocks = sorted({_block_family(room_parts(self._rooms[k][0][0].room)[1]) or "?" for k in keys})
+        if len(blocks) > 1:
+            number = room_parts(room)[0]
+            return (f"⚠️ Room {number} exists in blocks {', '.join(blocks)}. "
+                    f"Please ask e.g. \"room {blocks[0]}-{number}\".")
+        slots = sorted((entry for k in keys for entry in self._rooms[k]),
+                       key=lambda x: (DAYS.index(x[0].day), x[0].start or 0))
+        today = DAYS[now.weekday()]
+        minute = now.hour * 60 + now.minute
+        later = []
+        for s, section in slots:
+            if s.day != today or s.start is None:
+                continue
+            if s.start <= minute < s.end:
+                return (f"🚪 Room {s.room} right now ({today}, {s.time}): {s.subject} for {section} "
+                        f"with {s.faculty}.\n\n(Source: Structured Timetable)")
+            if s.start > minute:
+                later.append((s, section))
+        if later:
+            s, section = later[0]
+            return (f"🚪 Room {s.room} is free right now. Next: {s.subject} for {section} at {s.time}."
+                    f"\n\n(Source: Structured Timetable)")
+        return f"🚪 Room {slots[0][0].room} is free for the rest of {today}.\n\n(Source: Structured Timetable)"
+
+    def answer(self, section, name, tq, now=None):
+        """Reply for a parsed query about ``section``, or None if the section isn't compiled."""
+        if not self.has_section(section):
+            return None
+        if tq.kind == "next":
+            return self.render_next(section, name, now)
+        if tq.kind == "now":
+            return self.render_now(section, name, now)
+        if tq.day:
+            return self.render_day(section, tq.day, name)
+        return self.render_week(section, name)
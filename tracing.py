@@ -0,0 +1,248 @@
+# tracing.py
+# Per-stage latency for the chat pipeline. Each request opens a Trace and
+# span("stage") blocks below it add their time to it; the trace travels through
+# threads and tasks in a contextvar. Finished traces feed Prometheus-format
+# counters/histograms (served at /metrics), and slow ones are logged with their
+# stage breakdown. Recording is a dict update and a bisect, cheap enough to leave on.
+import contextvars
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACING = os.getenv("TRACING", "1") != "0"
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "5"))
+METRICS_PREFIX = "campussathi"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (128, 256, 384, 512, 768, 1024, 1536, 2048, 3072, 4096, 8192)
+
+_current = contextvars.ContextVar("campussathi_trace", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_labels(key)} {_number(v)}" for key, v in sorted(self._values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (non-cumulative, last is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        for key, (counts, total, count) in series:
+            running = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                lines.append(f"{self.name}_bucket{_labels(key, [('le', _number(le))])} {running}")
+            lines.append(f"{self.name}_sum{_labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+requests_total = Counter(f"{METRICS_PREFIX}_requests_total", "Chat requests by route, intent and outcome.")
+slow_requests_total = Counter(f"{METRICS_PREFIX}_slow_requests_total",
+                              f"Chat requests slower than SLOW_REQUEST_SECONDS ({SLOW_REQUEST_SECONDS}s).")
+request_seconds = Histogram(f"{METRICS_PREFIX}_request_seconds", "End-to-end chat request latency.")
+stage_seconds = Histogram(f"{METRICS_PREFIX}_stage_seconds", "Time spent per pipeline stage.")
+first_token_seconds = Histogram(f"{METRICS_PREFIX}_time_to_first_token_seconds",
+                                "Time from request start to the first streamed answer token.")
+prompt_tokens = Histogram(f"{METRICS_PREFIX}_prompt_tokens",
+                          "RAG prompt size in tokens: source=estimate before the call, source=ollama as evaluated.",
+                          buckets=TOKEN_BUCKETS)
+METRICS = [requests_total, slow_requests_total, request_seconds, stage_seconds, first_token_seconds, prompt_tokens]
+# Called as fn(trace, seconds, outcome) for every finished request (e.g. the benchmark harness).
+listeners = []
+
+
+class Trace:
+    """Stage timings of one request; safe to update from worker threads."""
+
+    def __init__(self, route, attrs):
+        self.route = route
+        self.attrs = dict(attrs)
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.first_token = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+
+def current():
+    return _current.get()
+
+
+def record(stage, seconds):
+    """Add ``seconds`` to ``stage`` for the current request (and the stage histogram)."""
+    if not TRACING:
+        return
+    stage_seconds.observe(seconds, stage=stage)
+    trace = _current.get()
+    if trace is not None and not trace.finished:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def begin(route, **attrs):
+    """Start tracing a request in the current context; pair with ``finish``."""
+    trace = Trace(route, attrs)
+    if TRACING:
+        _current.set(trace)
+    return trace
+
+
+def annotate(**attrs):
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+def first_token():
+    trace = _current.get()
+    if trace is not None and trace.first_token is None:
+        trace.first_token = time.perf_counter() - trace.start
+
+
+def finish(trace, outcome=None):
+    """Close ``trace``: update the request metrics and log it if it was slow."""
+    if trace.finished:
+        return
+    trace.finished = True
+    if _current.get() is trace:
+        _current.set(None)
+    if not TRACING:
+        return
+    total = time.perf_counter() - trace.start
+    outcome = outcome or trace.attrs.get("outcome", "ok")
+    requests_total.inc(route=trace.route, intent=trace.attrs.get("intent", "unknown"), outcome=outcome)
+    request_seconds.observe(total, route=trace.route)
+    if trace.first_token is not None:
+        first_token_seconds.observe(trace.first_token, route=trace.route)
+    for listener in listeners:
+        listener(trace, total, outcome)
+    if total >= SLOW_REQUEST_SECONDS:
+        slow_requests_total.inc(route=trace.route)
+        with trace._lock:
+            stages = {k: round(v, 3) for k, v in sorted(trace.stages.items(), key=lambda kv: -kv[1])}
+        print("Slow request:", json.dumps({
+            "route": trace.route, "seconds": round(total, 3), "outcome": outcome,
+            "first_token": round(trace.first_token, 3) if trace.first_token is not None else None,
+            "stages": stages, **trace.attrs,
+        }, ensure_ascii=False))
+
+
+class StageCallbackHandler(BaseCallbackHandler):
+    """Records LLM calls inside a chain run as the ``generation`` stage of the current request."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._starts = {}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def _done(self, run_id):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            record("generation", time.perf_counter() - start)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._done(run_id)
+        # Ollama reports the evaluated prompt size on the final chunk (excluding any prefix it had cached).
+        info = (response.generations[0][0].generation_info or {}) if response.generations and response.generations[0] else {}
+        if info.get("prompt_eval_count") is not None:
+            prompt_tokens.observe(info["prompt_eval_count"], source="ollama")
+            annotate(prompt_tokens=info["prompt_eval_count"], answer_tokens=info.get("eval_count"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._done(run_id)
+
+
+def chain_config():
+    """RunnableConfig that times the chain's LLM calls, or {} when tracing is off."""
+    return {"callbacks": [StageCallbackHandler()]} if TRACING else {}
+
+
+def stats_gauges(component, stats):
+    """Numeric fields of a component's ``stats()`` dict as gauge lines."""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{METRICS_PREFIX}_{component}_{key}"
+        lines += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+    return lines
+
+
+def render_metrics(components=None):
+    """Prometheus text exposition of the trace metrics plus ``{component: stats}`` gauges."""
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for component, stats in (components or {}).items():
+        lines += stats_gauges(component, stats)
+    return "\n".join(lines) + "\n"
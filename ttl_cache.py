@@ -0,0 +1,63 @@
+# ttl_cache.py
+# Small thread-safe key/value cache with per-entry expiry, used for hot DB rows.
+import threading
+import time
+
+MISSING = object()
+
+
+class TTLCache:
+    """Process-local cache; ``ttl=None`` keeps entries until they are replaced or deleted.
+
+    ``None`` is a valid cached value, so lookups return ``MISSING`` on a miss.
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _expiry(self):
+        return time.monotonic() + self.ttl if self.ttl is not None else None
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._hits += 1
+                    return value
+                del self._data[key]
+            self._misses += 1
+            return MISSING
+
+    def set(self, key, value):
+        with self._lock:
+            if self.max_entries and key not in self._data and len(self._data) >= self.max_entries:
+                # Dicts keep insertion order, so this evicts the oldest entry.
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (value, self._expiry())
+
+    def set_many(self, items):
+        expires_at = self._expiry()
+        with self._lock:
+            for key, value in items:
+                self._data[key] = (value, expires_at)
+            while self.max_entries and len(self._data) > self.max_entries:
+                self._data.pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self._hits, "misses": self._misses}